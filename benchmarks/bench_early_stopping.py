@@ -0,0 +1,99 @@
+"""
+Wall-clock and holdout-accuracy benchmark of ModelTrainer with and without
+early stopping on a time-based holdout.
+
+Every mode holds out the same last weeks and reports AUC (purchase heads)
+and MAE (quantity heads) for both horizons on them, so the accuracy cost of
+stopping early sits next to the time it saves:
+
+    full_rounds     every configured round, holdout only scored
+    early_stopping  stopped on the holdout, no refit
+    refit           stopped on the holdout, then refitted on all weeks
+
+Each mode trains in a fresh subprocess:
+
+    python benchmarks/bench_early_stopping.py --customers 400 --products 150 --weeks 30 --trees 500
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MODES = ("full_rounds", "early_stopping", "refit")
+
+
+def run_mode(args):
+    from src.features.engineer import FeatureEngineer
+    from src.models.trainer import ModelTrainer
+    from tests.test_engineer import make_transactions
+    from tests.test_predictor import make_config, make_metadata
+
+    raw_train, raw_test = make_transactions(n_customers=args.customers, n_products=args.products,
+                                            n_weeks=args.weeks, seed=0)
+    customer, sku = make_metadata(raw_train, raw_test)
+    engineer = FeatureEngineer(engine="vectorized")
+    train, test, feature_cols = engineer.engineer_features(raw_train, raw_test)
+    train, test, cat_cols = engineer.preprocess_metadata(train, test, customer, sku, feature_cols)
+    train = engineer.generate_targets(train)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config = make_config(tmp)
+        config['model'].update(seeds=list(range(args.seeds)), n_estimators=args.trees)
+        config['catboost']['iterations'] = args.trees
+        config['training'].update(threads_per_job=None)
+        config['validation'].update(
+            holdout_weeks=args.holdout_weeks,
+            early_stopping_rounds=None if args.mode == "full_rounds" else args.patience,
+            refit=args.mode == "refit",
+        )
+        trainer = ModelTrainer(config)
+        start = time.perf_counter()
+        trainer.train_hybrid_ensemble(train, feature_cols + cat_cols, cat_cols)
+        elapsed = time.perf_counter() - start
+
+    report = trainer.validation_report
+    print(json.dumps({
+        "mode": args.mode,
+        "rows": len(train),
+        "seconds": round(elapsed, 3),
+        "holdout_fit_seconds": report['holdout_fit_seconds'],
+        "refit_seconds": report['refit_seconds'],
+        "holdout": {
+            name: {k: v if v is None else round(v, 4) for k, v in scores.items() if k != 'max_rounds'}
+            for name, scores in report['models'].items()
+        },
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--customers", type=int, default=400)
+    parser.add_argument("--products", type=int, default=150)
+    parser.add_argument("--weeks", type=int, default=30)
+    parser.add_argument("--seeds", type=int, default=2)
+    parser.add_argument("--trees", type=int, default=500)
+    parser.add_argument("--holdout-weeks", type=int, default=4)
+    parser.add_argument("--patience", type=int, default=50)
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args)
+        return
+
+    for mode in MODES:
+        cmd = [sys.executable, __file__, "--mode", mode] + [
+            f"--{k.replace('_', '-')}={getattr(args, k)}"
+            for k in ("customers", "products", "weeks", "seeds", "trees", "holdout_weeks", "patience")
+        ]
+        out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+        print(out.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Allocations of the training inputs built from pandas slices versus one
+FeatureMatrix.
+
+`frames` takes `train[features]` and the two positive-row slices and
+converts each to the float64 array LightGBM makes of a mixed-dtype frame;
+`matrix` is what ModelTrainer builds: one float32 array ordered so that the
+positive rows are views of it. Peak and retained bytes are traced with
+tracemalloc, which sees every NumPy buffer:
+
+    python benchmarks/bench_feature_matrix.py --customers 400 --products 150 --weeks 30
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def frames(train, features, cat_cols):
+    inputs = {
+        'all': train[features],
+        'pos_1w': train.loc[train["target_buy_1w"] == 1, features],
+        'pos_2w': train.loc[train["target_buy_2w"] == 1, features],
+    }
+    return {key: (frame, frame.to_numpy(dtype=np.float64)) for key, frame in inputs.items()}
+
+
+def matrix(train, features, cat_cols):
+    from src.models.matrix import FeatureMatrix
+    from src.models.trainer import row_blocks
+    buy_1w, buy_2w = train["target_buy_1w"].to_numpy(), train["target_buy_2w"].to_numpy()
+    order = np.argsort(row_blocks(buy_1w, buy_2w), kind='stable')
+    X = FeatureMatrix.from_frame(train, features, cat_cols, order)
+    return {'all': X, 'pos_1w': X.rows(buy_1w[order] == 1), 'pos_2w': X.rows(buy_2w[order] == 1)}
+
+
+def traced(fn, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn(*args)
+    seconds = time.perf_counter() - start
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return {'seconds': round(seconds, 4), 'peak_mb': round(peak / 2**20, 2), 'retained_mb': round(retained / 2**20, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--customers", type=int, default=400)
+    parser.add_argument("--products", type=int, default=150)
+    parser.add_argument("--weeks", type=int, default=30)
+    args = parser.parse_args()
+
+    from src.features.engineer import FeatureEngineer
+    from tests.test_engineer import make_transactions
+    from tests.test_predictor import make_metadata
+
+    raw_train, raw_test = make_transactions(n_customers=args.customers, n_products=args.products,
+                                            n_weeks=args.weeks, seed=0)
+    customer, sku = make_metadata(raw_train, raw_test)
+    engineer = FeatureEngineer(engine="vectorized")
+    train, test, feature_cols = engineer.engineer_features(raw_train, raw_test)
+    train, test, cat_cols = engineer.preprocess_metadata(train, test, customer, sku, feature_cols)
+    train = engineer.generate_targets(train)
+    features = feature_cols + cat_cols
+
+    for mode, fn in (("frames", frames), ("matrix", matrix)):
+        print(json.dumps({"mode": mode, "rows": len(train), "features": len(features),
+                          **traced(fn, train, features, cat_cols)}))
+
+
+if __name__ == "__main__":
+    main()
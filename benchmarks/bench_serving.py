@@ -0,0 +1,165 @@
+"""
+Throughput and memory of the pre-forking API server (src/serve.py) as the
+number of workers grows.
+
+Trains a small ensemble on synthetic data, publishes it with its feature and
+candidate indexes under a temporary directory, then for each worker count
+starts `python -m src.serve` there and drives /predict from `--clients`
+client processes over keep-alive connections for `--seconds`. Reports
+aggregate requests/s and each worker's RSS and PSS: RSS counts the pages a
+worker shares with its parent in full, PSS splits them between the sharers,
+so summed PSS is what the server really costs. The prediction cache is off,
+so every request runs the ensemble. With `--reload`, `POST /reload` is sent
+halfway through each run and failed requests are counted:
+
+    python benchmarks/bench_serving.py --workers 1 2 4 --clients 8 --seconds 10 --trees 300 --reload
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import yaml
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src.monitoring.memory import process_memory_mb  # noqa: E402
+
+
+def publish(tmp, args):
+    """Trains and publishes a synthetic ensemble and its indexes; returns request payloads."""
+    from src.features.candidates import CandidateIndex
+    from src.features.index import FeatureIndex
+    from src.models.registry import ModelRegistry
+    from tests.test_predictor import build_pipeline, make_config
+
+    config = make_config(tmp)
+    config['model'].update(n_estimators=args.trees)
+    config['catboost']['iterations'] = args.trees
+    pipe = build_pipeline(config, n_customers=args.customers, n_products=args.products, n_weeks=20)
+    ModelRegistry.for_config(config).save(pipe['models'], config, encoders=pipe['encoder'].to_dict())
+    index = FeatureIndex.build(pipe['test'], pipe['features'], pipe['cat_cols'], pipe['store'])
+    index.save(config['paths']['feature_index'])
+    candidates_path = os.path.join(tmp, 'models', 'candidate_index.pkl')
+    CandidateIndex.build(pipe['raw_train'], index, pipe['store'], pipe['customer'], pipe['sku'],
+                         pipe['encoder']).save(candidates_path)
+
+    # src.api reads config/config.yaml from the working directory
+    with open(os.path.join(ROOT, 'config', 'config.yaml')) as f:
+        served = yaml.safe_load(f)
+    served['paths'].update(model_dir=config['paths']['model_dir'], feature_index=config['paths']['feature_index'],
+                           candidate_index=candidates_path)
+    served['serving']['cache']['enabled'] = False
+    os.makedirs(os.path.join(tmp, 'config'), exist_ok=True)
+    with open(os.path.join(tmp, 'config', 'config.yaml'), 'w') as f:
+        yaml.safe_dump(served, f)
+    return [{"customer_id": int(c), "product_unit_variant_id": int(p)}
+            for c, p in index.keys]
+
+
+def request(conn, method, path, body=None):
+    conn.request(method, path, body=None if body is None else json.dumps(body),
+                 headers={"Content-Type": "application/json"})
+    response = conn.getresponse()
+    return response.status, response.read()
+
+
+def client(port, payloads, until, offset):
+    """Posts /predict in a loop until the deadline; returns (ok, failed)."""
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    ok = failed = 0
+    i = offset
+    while time.time() < until:
+        try:
+            status, _ = request(conn, "POST", "/predict", payloads[i % len(payloads)])
+        except (OSError, http.client.HTTPException):
+            status = None
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        ok, failed = (ok + 1, failed) if status == 200 else (ok, failed + 1)
+        i += 1
+    conn.close()
+    return ok, failed
+
+
+def wait_ready(port, timeout_s=120):
+    deadline = time.time() + timeout_s
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            status, body = request(conn, "GET", "/")
+            if status == 200 and json.loads(body)["model_loaded"]:
+                return
+        except OSError:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f"Server on port {port} did not come up")
+
+
+def children(pid):
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(p) for p in f.read().split()]
+
+
+def run(tmp, payloads, workers, args):
+    server = subprocess.Popen(
+        [sys.executable, "-m", "src.serve", "--host", "127.0.0.1", "--port", str(args.port), "--workers", str(workers)],
+        cwd=tmp, env={**os.environ, "PYTHONPATH": ROOT}, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_ready(args.port)
+        until = time.time() + args.seconds
+        with multiprocessing.Pool(args.clients) as pool:
+            results = pool.starmap_async(client, [(args.port, payloads, until, i * 97) for i in range(args.clients)])
+            if args.reload:
+                time.sleep(args.seconds / 2)
+                conn = http.client.HTTPConnection("127.0.0.1", args.port, timeout=30)
+                request(conn, "POST", "/reload")
+                conn.close()
+            results = results.get()
+        # Memory after serving, once every worker has touched what it reads
+        memory = [process_memory_mb(pid) for pid in children(server.pid)]
+        parent = process_memory_mb(server.pid)
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+
+    ok = sum(r[0] for r in results)
+    pss = [m['pss_mb'] for m in memory]
+    return {
+        "workers": workers,
+        "requests_per_s": round(ok / args.seconds, 1),
+        "failed": sum(r[1] for r in results),
+        "parent_rss_mb": parent['rss_mb'],
+        "worker_rss_mb": [m['rss_mb'] for m in memory],
+        "worker_pss_mb": pss,
+        "total_pss_mb": None if None in pss else round(sum(pss) + (parent['pss_mb'] or 0), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--customers", type=int, default=200)
+    parser.add_argument("--products", type=int, default=60)
+    parser.add_argument("--trees", type=int, default=300)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--reload", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        payloads = publish(tmp, args)
+        for workers in args.workers:
+            print(json.dumps(run(tmp, payloads, workers, args)))
+
+
+if __name__ == "__main__":
+    main()
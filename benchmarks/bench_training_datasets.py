@@ -0,0 +1,78 @@
+"""
+Wall-clock and peak-memory benchmark of ModelTrainer with and without
+shared lgb.Dataset / catboost.Pool objects.
+
+Each mode trains in a fresh subprocess so peak RSS is not polluted by the
+other run:
+
+    python benchmarks/bench_training_datasets.py --customers 400 --products 150 --weeks 30
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def run_mode(args):
+    from src.features.engineer import FeatureEngineer
+    from src.models.trainer import ModelTrainer
+    from tests.test_engineer import make_transactions
+    from tests.test_predictor import make_config, make_metadata
+
+    raw_train, raw_test = make_transactions(n_customers=args.customers, n_products=args.products,
+                                            n_weeks=args.weeks, seed=0)
+    customer, sku = make_metadata(raw_train, raw_test)
+    engineer = FeatureEngineer(engine="vectorized")
+    train, test, feature_cols = engineer.engineer_features(raw_train, raw_test)
+    train, test, cat_cols = engineer.preprocess_metadata(train, test, customer, sku, feature_cols)
+    train = engineer.generate_targets(train)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config = make_config(tmp)
+        config['model'].update(seeds=list(range(args.seeds)), n_estimators=args.trees)
+        config['catboost']['iterations'] = args.trees
+        config['training'].update(threads_per_job=None, reuse_datasets=args.mode == "reuse")
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        start = time.perf_counter()
+        ModelTrainer(config).train_hybrid_ensemble(train, feature_cols + cat_cols, cat_cols)
+        elapsed = time.perf_counter() - start
+
+    print(json.dumps({
+        "mode": args.mode,
+        "rows": len(train),
+        "seconds": round(elapsed, 3),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "rss_before_train_mb": round(rss_before / 1024, 1),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--customers", type=int, default=400)
+    parser.add_argument("--products", type=int, default=150)
+    parser.add_argument("--weeks", type=int, default=30)
+    parser.add_argument("--seeds", type=int, default=5)
+    parser.add_argument("--trees", type=int, default=50)
+    parser.add_argument("--mode", choices=["per_fit", "reuse"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args)
+        return
+
+    for mode in ("per_fit", "reuse"):
+        cmd = [sys.executable, __file__, "--mode", mode] + [
+            f"--{k}={getattr(args, k)}" for k in ("customers", "products", "weeks", "seeds", "trees")
+        ]
+        out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+        print(out.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    main()
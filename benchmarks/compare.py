@@ -0,0 +1,58 @@
+"""
+Compares two benchmark result files stage by stage:
+
+    python benchmarks/compare.py baseline.json candidate.json --threshold 0.2
+
+Exits with status 1 when any stage's wall time or peak RSS grew by more than
+`--threshold` (a fraction), so it can gate CI.
+"""
+import argparse
+import json
+import sys
+
+METRICS = ["wall_s", "cpu_s", "peak_rss_mb"]
+
+
+def compare(baseline, candidate, threshold):
+    """
+    Returns:
+        tuple: (printable lines, list of (stage, metric) regressions)
+    """
+    lines = [f"{'stage':<11} {'metric':<12} {'baseline':>11} {'candidate':>11} {'change':>8}"]
+    regressions = []
+    for stage, base in baseline['stages'].items():
+        cand = candidate['stages'].get(stage)
+        if cand is None:
+            continue
+        for metric in METRICS:
+            before, after = base[metric], cand[metric]
+            change = (after - before) / before if before else 0.0
+            flag = ""
+            if metric != "cpu_s" and change > threshold:
+                regressions.append((stage, metric))
+                flag = "  REGRESSION"
+            lines.append(f"{stage:<11} {metric:<12} {before:>11.2f} {after:>11.2f} {change:>+8.1%}{flag}")
+    return lines, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+    if baseline.get('size') != candidate.get('size'):
+        print(f"warning: data sizes differ ({baseline.get('size')} vs {candidate.get('size')})")
+
+    lines, regressions = compare(baseline, candidate, args.threshold)
+    print("\n".join(lines))
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+import time
+from src.monitoring.memory import peak_rss_mb, reset_peak_rss, rss_mb
+
+
+def measure(fn, rows=None):
+    """
+    Runs `fn()` and records its wall time, CPU time (all threads), peak RSS
+    and RSS growth.
+    Args:
+        fn (callable): The stage to run.
+        rows (int | callable): Rows processed, or a function of the result
+            returning them, used for throughput.
+    Returns:
+        tuple: (result of fn, metrics dict)
+    """
+    exact_peak = reset_peak_rss()
+    rss_before = rss_mb()
+    wall, cpu = time.perf_counter(), time.process_time()
+    result = fn()
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+
+    n_rows = rows(result) if callable(rows) else rows
+    metrics = {
+        "wall_s": round(wall, 4),
+        "cpu_s": round(cpu, 4),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "peak_rss_exact": exact_peak,
+        "rss_before_mb": round(rss_before, 1),
+        "rss_after_mb": round(rss_mb(), 1),
+    }
+    if n_rows is not None:
+        metrics["rows"] = int(n_rows)
+        metrics["rows_per_s"] = round(n_rows / wall, 1) if wall > 0 else None
+    return result, metrics
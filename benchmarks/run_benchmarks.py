@@ -0,0 +1,211 @@
+"""
+Times and memory-profiles each pipeline stage on synthetic data and saves
+the results as JSON so runs can be compared over time.
+
+Runs offline on CPU. Model sizes come from config/config.yaml with the
+reductions in BENCH_OVERRIDES, plus any `--set section.key=value`:
+
+    python benchmarks/run_benchmarks.py --scale small
+    python benchmarks/run_benchmarks.py --scale medium --set model.n_estimators=200 --stages load,features
+    python benchmarks/compare.py benchmarks/results/a.json benchmarks/results/b.json
+"""
+import argparse
+import copy
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+
+import yaml
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.measure import measure  # noqa: E402
+from benchmarks.synthetic import SCALES, write_csvs  # noqa: E402
+
+STAGES = ["load", "features", "preprocess", "train", "predict"]
+
+# Keeps a benchmark run in minutes on a laptop CPU; the stage code paths are the real ones
+BENCH_OVERRIDES = {
+    'model.seeds': [42, 202],
+    'model.n_estimators': 50,
+    'catboost.iterations': 50,
+    'data_cache.enabled': False,
+    'checkpoints.enabled': False,
+}
+
+
+def apply_overrides(config, overrides):
+    """Sets dotted `section.key` entries of a nested config dict."""
+    config = copy.deepcopy(config)
+    for dotted, value in overrides.items():
+        node = config
+        *parents, leaf = dotted.split('.')
+        for key in parents:
+            node = node.setdefault(key, {})
+        node[leaf] = value
+    return config
+
+
+def parse_set(values):
+    """Parses `--set section.key=value` arguments, reading values as YAML."""
+    overrides = {}
+    for item in values:
+        key, sep, raw = item.partition('=')
+        if not sep:
+            raise argparse.ArgumentTypeError(f"--set expects section.key=value, got {item!r}")
+        overrides[key] = yaml.safe_load(raw)
+    return overrides
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    import catboost
+    import lightgbm
+    import numpy
+    import pandas
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': numpy.__version__,
+        'pandas': pandas.__version__,
+        'lightgbm': lightgbm.__version__,
+        'catboost': catboost.__version__,
+    }
+
+
+def run(config, stages):
+    """
+    Runs the pipeline stages up to the last one requested, measuring each
+    requested stage.
+    Returns:
+        dict: Stage name mapped to its metrics.
+    """
+    from src.data.loader import DataLoader
+    from src.features.engineer import FeatureEngineer
+    from src.models.predictor import ModelPredictor
+    from src.models.trainer import ModelTrainer
+
+    results = {}
+    state = {}
+    engineer = FeatureEngineer(engine=config['features']['engine'], shards=config['features']['shards'])
+
+    def load():
+        return DataLoader(config).load_all()
+
+    def features():
+        return engineer.engineer_features(state['train'], state['test'])
+
+    def preprocess():
+        train, test, cat_cols = engineer.preprocess_metadata(
+            state['train'], state['test'], state['customer'], state['sku'], state['feature_cols'])
+        return engineer.generate_targets(train), test, cat_cols
+
+    def train():
+        return ModelTrainer(config).train_hybrid_ensemble(state['train'], state['features'], state['cat_cols'])
+
+    def predict():
+        return ModelPredictor(config).predict(state['models'], state['test'], state['features'])
+
+    steps = {
+        'load': (load, lambda out: len(out[0]) + len(out[1])),
+        'features': (features, lambda out: len(out[0]) + len(out[1])),
+        'preprocess': (preprocess, lambda out: len(out[0]) + len(out[1])),
+        'train': (train, lambda out: len(state['train'])),
+        'predict': (predict, len),
+    }
+    last = max(STAGES.index(stage) for stage in stages)
+    for stage in STAGES[:last + 1]:
+        fn, rows = steps[stage]
+        out, metrics = measure(fn, rows)
+        if stage in stages:
+            results[stage] = metrics
+            print(f"{stage:<11} {metrics['wall_s']:>9.2f}s wall {metrics['cpu_s']:>9.2f}s cpu "
+                  f"{metrics['peak_rss_mb']:>9.1f} MB peak")
+
+        if stage == 'load':
+            state['train'], state['test'], state['customer'], state['sku'] = out
+        elif stage == 'features':
+            state['train'], state['test'], state['feature_cols'] = out
+        elif stage == 'preprocess':
+            state['train'], state['test'], state['cat_cols'] = out
+            state['features'] = state['feature_cols'] + state['cat_cols']
+        elif stage == 'train':
+            state['models'] = out
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--customers", type=int, help="Override the scale's customer count")
+    parser.add_argument("--products", type=int, help="Override the scale's SKU count")
+    parser.add_argument("--weeks", type=int, help="Override the scale's Train week count")
+    parser.add_argument("--stages", default=",".join(STAGES), help=f"Comma-separated subset of {STAGES}")
+    parser.add_argument("--set", action="append", default=[], metavar="SECTION.KEY=VALUE",
+                        help="Config override applied after BENCH_OVERRIDES; repeatable")
+    parser.add_argument("--config", default=os.path.join(REPO_ROOT, "config", "config.yaml"))
+    parser.add_argument("--output", default=os.path.join(REPO_ROOT, "benchmarks", "results"),
+                        help="Directory for the JSON result (a .json path writes exactly there)")
+    args = parser.parse_args()
+
+    stages = [stage.strip() for stage in args.stages.split(",") if stage.strip()]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {sorted(unknown)}")
+    size = dict(SCALES[args.scale])
+    for arg, key in (("customers", "n_customers"), ("products", "n_products"), ("weeks", "n_weeks")):
+        if getattr(args, arg):
+            size[key] = getattr(args, arg)
+
+    with open(args.config) as f:
+        base = yaml.safe_load(f)
+    overrides = {**BENCH_OVERRIDES, **parse_set(args.set)}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"Generating '{args.scale}' data {size} ...")
+        paths = write_csvs(os.path.join(tmp, "data"), **size)
+        config = apply_overrides(base, overrides)
+        config['paths'].update(paths)
+        config['paths'].update({
+            'output_dir': os.path.join(tmp, "output"),
+            'model_dir': os.path.join(tmp, "models"),
+            'submission_file': os.path.join(tmp, "output", "submission.csv"),
+            'feature_store': os.path.join(tmp, "models", "feature_store.pkl"),
+            'feature_index': os.path.join(tmp, "models", "feature_index.pkl"),
+        })
+        results = run(config, stages)
+
+    now = datetime.datetime.now(datetime.timezone.utc)
+    report = {
+        'timestamp': now.isoformat(timespec='seconds'),
+        'git_commit': git_commit(),
+        'scale': args.scale,
+        'size': size,
+        'overrides': overrides,
+        'environment': environment(),
+        'stages': results,
+    }
+    out_path = args.output
+    if not out_path.endswith(".json"):
+        os.makedirs(out_path, exist_ok=True)
+        out_path = os.path.join(out_path, f"{args.scale}-{now.strftime('%Y%m%dT%H%M%S')}.json")
+    with open(out_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {out_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Synthetic Train/Test/customer/SKU tables in the competition layout.
+
+Pairs, SKUs and weeks scale independently, and generation is vectorized so
+millions of rows take seconds:
+
+    python benchmarks/synthetic.py --customers 5000 --products 600 --weeks 52 --out /tmp/synthetic
+"""
+import argparse
+import os
+import numpy as np
+import pandas as pd
+
+# Named sizes used by the benchmark suite; rows grow ~10x per step
+SCALES = {
+    'tiny': {'n_customers': 50, 'n_products': 30, 'n_weeks': 20},
+    'small': {'n_customers': 400, 'n_products': 150, 'n_weeks': 30},
+    'medium': {'n_customers': 2000, 'n_products': 400, 'n_weeks': 52},
+    'large': {'n_customers': 10000, 'n_products': 800, 'n_weeks': 104},
+}
+
+# Column order of the competition files
+TRAIN_COLUMNS = [
+    "ID", "customer_id", "product_unit_variant_id", "week_start", "qty_this_week", "num_orders_week",
+    "spend_this_week", "purchased_this_week", "product_id", "grade_name", "unit_name", "product_grade_variant_id",
+    "selling_price", "customer_category", "customer_status", "customer_created_at", "Target_qty_next_1w",
+    "Target_purchase_next_1w", "Target_qty_next_2w", "Target_purchase_next_2w",
+]
+TEST_COLUMNS = [
+    "ID", "customer_id", "product_unit_variant_id", "week_start", "product_id", "grade_name", "unit_name",
+    "product_grade_variant_id", "customer_category", "customer_status", "customer_created_at",
+]
+
+
+def generate(n_customers, n_products, n_weeks, n_test_weeks=1, pairs_per_customer=12, buy_rate=0.3, seed=0):
+    """
+    Builds the four input tables with the real column names and formats.
+
+    Each customer buys from `pairs_per_customer` random SKUs; each pair has a
+    row every week from its first week on, with a zero-inflated quantity.
+    Args:
+        n_customers (int): Customers.
+        n_products (int): SKUs (product_unit_variant_id values).
+        n_weeks (int): Train weeks.
+        n_test_weeks (int): Test weeks following Train.
+        pairs_per_customer (int): Average distinct SKUs per customer.
+        buy_rate (float): Share of pair-weeks with a purchase.
+        seed (int): RNG seed.
+    Returns:
+        train, test, customer, sku (pd.DataFrame)
+    """
+    rng = np.random.default_rng(seed)
+    customer_ids = np.arange(1, n_customers + 1)
+    product_ids = np.arange(100, 100 + n_products)
+    weeks = pd.date_range("2023-01-02", periods=n_weeks + n_test_weeks, freq="7D")
+
+    customer = pd.DataFrame({
+        "customer_id": customer_ids,
+        "customer_category": [f"CUST_CAT_{i:03d}" for i in rng.integers(0, 8, n_customers)],
+        "customer_status": [f"CUST_STAT_{i:03d}" for i in rng.integers(0, 3, n_customers)],
+        "customer_created_at": (pd.Timestamp("2022-01-01")
+                                + pd.to_timedelta(rng.integers(0, 365 * 86400, n_customers), unit="s")
+                                ).strftime("%Y-%m-%d %H:%M:%S"),
+    })
+    sku = pd.DataFrame({
+        "product_name": [f"SKU_NAME_{i // 3:04d}" for i in range(n_products)],
+        "product_grade_variant_sku": [f"B{i % 3 + 1:02d}" for i in range(n_products)],
+        "product_unit_variant_id": product_ids,
+        "unit_name": [f"UNIT_{i:03d}" for i in rng.integers(0, 12, n_products)],
+        "grade_name": [f"GRADE_{i:02d}" for i in rng.integers(0, 4, n_products)],
+        "grade_active_status": rng.random(n_products) < 0.9,
+    })
+
+    # Distinct (customer, product) pairs with a first week each
+    n_pairs = n_customers * min(pairs_per_customer, n_products)
+    pair_codes = np.unique(rng.integers(0, n_customers * n_products, n_pairs))
+    pair_cust, pair_prod = np.divmod(pair_codes, n_products)
+    first = rng.integers(0, n_weeks + n_test_weeks, len(pair_codes))
+    length = n_weeks + n_test_weeks - first
+
+    rows = np.repeat(np.arange(len(pair_codes)), length)
+    week_idx = first[rows] + (np.arange(len(rows)) - np.repeat(np.cumsum(length) - length, length))
+    qty = np.where(rng.random(len(rows)) < buy_rate, np.round(rng.gamma(1.5, 4.0, len(rows)), 1) + 1, 0.0)
+
+    # Rows are grouped by pair in week order here, so next-week targets are a shift
+    same_pair = np.append(rows[1:] == rows[:-1], False)
+    qty_next_1w = np.where(same_pair, np.append(qty[1:], 0.0), 0.0)
+    qty_next_2w = qty_next_1w + np.where(same_pair, np.append(qty_next_1w[1:], 0.0), 0.0)
+
+    panel = pd.DataFrame({
+        "customer_id": customer_ids[pair_cust[rows]],
+        "product_unit_variant_id": product_ids[pair_prod[rows]],
+        "week_start": weeks[week_idx].strftime("%Y-%m-%d"),
+        "qty_this_week": qty,
+        "Target_qty_next_1w": qty_next_1w,
+        "Target_purchase_next_1w": (qty_next_1w > 0).astype(int),
+        "Target_qty_next_2w": qty_next_2w,
+        "Target_purchase_next_2w": (qty_next_2w > 0).astype(int),
+        "_is_test": week_idx >= n_weeks,
+    })
+    panel = panel.sample(frac=1.0, random_state=seed).reset_index(drop=True)
+    panel.insert(0, "ID", (panel["customer_id"].astype(str) + "_" + panel["product_unit_variant_id"].astype(str)
+                           + "_" + panel["week_start"]))
+
+    # Denormalized product/customer attributes carried on every Train/Test row
+    product_attrs = sku.set_index("product_unit_variant_id").loc[panel["product_unit_variant_id"]]
+    customer_attrs = customer.set_index("customer_id").loc[panel["customer_id"]]
+    panel["product_id"] = panel["product_unit_variant_id"] // 3
+    panel["grade_name"] = product_attrs["grade_name"].to_numpy()
+    panel["unit_name"] = product_attrs["unit_name"].to_numpy()
+    panel["product_grade_variant_id"] = panel["product_unit_variant_id"]
+    for col in ("customer_category", "customer_status", "customer_created_at"):
+        panel[col] = customer_attrs[col].to_numpy()
+
+    is_test = panel.pop("_is_test")
+    train = panel[~is_test].reset_index(drop=True)
+    price = rng.uniform(20, 200, n_products)[train["product_unit_variant_id"] - product_ids[0]]
+    train["num_orders_week"] = (train["qty_this_week"] > 0).astype(int)
+    train["spend_this_week"] = np.round(train["qty_this_week"] * price, 2)
+    train["purchased_this_week"] = train["num_orders_week"]
+    train["selling_price"] = np.round(price, 2)
+    train = train[TRAIN_COLUMNS]
+    test = panel.loc[is_test, TEST_COLUMNS].reset_index(drop=True)
+    return train, test, customer, sku
+
+
+def write_csvs(out_dir, **kwargs):
+    """
+    Generates the tables and writes them as Train.csv, Test.csv,
+    customer_data.csv and sku_data.csv.
+    Returns:
+        dict: `paths` config entries pointing at the written files.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    train, test, customer, sku = generate(**kwargs)
+    paths = {
+        'train_data': os.path.join(out_dir, "Train.csv"),
+        'test_data': os.path.join(out_dir, "Test.csv"),
+        'customer_data': os.path.join(out_dir, "customer_data.csv"),
+        'sku_data': os.path.join(out_dir, "sku_data.csv"),
+    }
+    for df, key in ((train, 'train_data'), (test, 'test_data'), (customer, 'customer_data'), (sku, 'sku_data')):
+        df.to_csv(paths[key], index=False)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--customers", type=int)
+    parser.add_argument("--products", type=int)
+    parser.add_argument("--weeks", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", required=True)
+    args = parser.parse_args()
+
+    size = dict(SCALES[args.scale])
+    for arg, key in (("customers", "n_customers"), ("products", "n_products"), ("weeks", "n_weeks")):
+        if getattr(args, arg):
+            size[key] = getattr(args, arg)
+    for key, path in write_csvs(args.out, seed=args.seed, **size).items():
+        print(f"{key}: {path}")
+
+
+if __name__ == "__main__":
+    main()
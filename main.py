@@ -1,10 +1,40 @@
 import yaml
 import logging
 import argparse
+import json
+import os
+import pandas as pd
+import src.data.cache
+import src.data.loader
+import src.features.candidates
+import src.features.encoders
+import src.features.engineer
+import src.features.kernels
+import src.features.store
+import src.models.drift
+import src.models.matrix
+import src.models.predictor
+import src.models.registry
+import src.models.trainer
+from src.data.cache import file_sha256
 from src.data.loader import DataLoader
-from src.features.engineer import FeatureEngineer
+from src.features.candidates import CandidateIndex
+from src.features.encoders import CategoryEncoder
+from src.features.engineer import FeatureEngineer, FEATURE_COLS
+from src.features.store import FeatureStore
+from src.features.index import FeatureIndex
 from src.models.trainer import ModelTrainer
 from src.models.predictor import ModelPredictor
+from src.models.registry import ModelRegistry
+from src.models.selection import EnsembleSelector
+from src.models.trainer import holdout_split
+from src.models.tuner import apply_overlay
+from src.pipeline.stages import StageRunner, source_digest
+from src.monitoring.spans import TRACER, span
+
+# Records the run the feature store and serving indexes were published by
+SERVING_MANIFEST = 'serving_state.json'
+
 
 def setup_logging():
     logging.basicConfig(
@@ -12,48 +42,333 @@ def setup_logging():
         format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
     )
 
+
+def score_test(config, models, test, features):
+    """
+    Writes the submission, streaming it in `inference.chunk_size` row chunks when set.
+    Returns:
+        int: Number of submission rows.
+    """
+    predictor = ModelPredictor(config)
+    if predictor.chunk_size:
+        return predictor.predict_streaming(models, test, features)
+    return len(predictor.predict(models, test, features))
+
+
+def candidate_options(config):
+    """CandidateIndex.build options from `serving.recommend`."""
+    return {k: v for k, v in config['serving']['recommend'].items() if k != 'top_k'}
+
+
+def build_serving_indexes(config, history, test, features, cat_cols, store, customer, sku, encoder):
+    """
+    Builds the FeatureIndex and CandidateIndex the API serves from.
+    Returns:
+        tuple: (FeatureIndex, CandidateIndex)
+    """
+    with span("feature_index", rows=len(test)):
+        index = FeatureIndex.build(test, features, cat_cols, store)
+    with span("candidate_index") as current:
+        candidates = CandidateIndex.build(history, index, store, customer, sku, encoder, **candidate_options(config))
+        current.rows = len(candidates.products)
+    return index, candidates
+
+
+def serving_manifest_path(config):
+    return os.path.join(os.path.dirname(config['paths']['feature_store']), SERVING_MANIFEST)
+
+
+def serving_run_key(config):
+    """The features stage key the serving state was published under, or None."""
+    paths = config['paths']
+    path = serving_manifest_path(config)
+    if not all(os.path.exists(p) for p in (path, paths['feature_store'], paths['feature_index'],
+                                           paths['candidate_index'])):
+        return None
+    with open(path) as f:
+        return json.load(f).get('run_key')
+
+
+def save_serving_state(config, store, index, candidates, run_key=None):
+    """
+    Writes the feature store --mode incremental appends to and the indexes the
+    API loads, recording `run_key` (the features stage key of a full run, None
+    for an incremental one) so unchanged state is not rewritten.
+    """
+    paths = config['paths']
+    with span("save_serving_state"):
+        store.save(paths['feature_store'])
+        index.save(paths['feature_index'])
+        candidates.save(paths['candidate_index'])
+        with open(serving_manifest_path(config), 'w') as f:
+            json.dump({'run_key': run_key}, f)
+
+
+def run_incremental(config, logger):
+    """
+    Scores Test with the saved ensemble, deriving its features from the
+    persisted FeatureStore instead of recomputing the whole history. Train
+    weeks newer than the store are appended to it first.
+    """
+    logger.info("--- STEP 1: DATA INGESTION ---")
+    with span("load") as current:
+        loader = DataLoader(config)
+        train, test, customer, sku = loader.load_all()
+        current.rows = len(train) + len(test)
+
+    logger.info("--- STEP 2: INCREMENTAL FEATURES ---")
+    with span("features", rows=len(test)):
+        store_path = config['paths']['feature_store']
+        if os.path.exists(store_path):
+            store = FeatureStore.load(store_path)
+            new_rows = train[train["week_start"] > store.last_week]
+            logger.info(f"Appending {len(new_rows)} new Train rows to the feature store")
+            store.append(new_rows)
+        else:
+            logger.info(f"No feature store at {store_path}, building it from Train")
+            store = FeatureStore().fit(train)
+
+        features = store.transform(test)
+        test = pd.concat([test, features[FEATURE_COLS]], axis=1)
+        # Encode categoricals exactly as the saved ensemble was trained
+        registry = ModelRegistry.for_config(config)
+        encoders = registry.encoders() if registry.exists() else {}
+        encoder = CategoryEncoder.from_dict(encoders) if encoders else None
+        engineer = FeatureEngineer(engine=config['features']['engine'])
+        train, test, cat_cols = engineer.preprocess_metadata(train, test, customer, sku, FEATURE_COLS, encoder=encoder)
+        index, candidates = build_serving_indexes(config, train, test, FEATURE_COLS + cat_cols, cat_cols, store,
+                                                  customer, sku, engineer.encoder)
+        save_serving_state(config, store, index, candidates)
+
+    logger.info("--- STEP 3: INFERENCE & POST-PROCESSING ---")
+    with span("predict", rows=len(test)):
+        models = registry.load()
+        return score_test(config, models, test, FEATURE_COLS + cat_cols)
+
+
+def pipeline_stages(config, logger):
+    """
+    The checkpointed stages of a full run: each is skipped when its inputs,
+    code and config section are unchanged since a checkpointed run, and is
+    evaluated lazily, on the first call of its function.
+    Returns:
+        dict: 'runner', the 'features_key' and 'train_key', plus the
+            'features', 'trained' and 'predictions' stage functions.
+            'trained' returns the models with everything
+            `ModelRegistry.save` publishes alongside them.
+    """
+    runner = StageRunner(config['checkpoints']['dir'], enabled=config['checkpoints']['enabled'])
+    paths = config['paths']
+    outputs = {}
+
+    sources = [paths['train_data'], paths['test_data'], paths['customer_data'], paths['sku_data']]
+    load_key = runner.key(
+        'load', [file_sha256(path) for path in sources], config['schema'],
+        source_digest(src.data.loader, src.data.cache),
+    )
+    # The shard count changes how features are computed, not what they are
+    features_config = {k: v for k, v in config['features'].items() if k != 'shards'}
+    features_key = runner.key(
+        'features', load_key, features_config, candidate_options(config),
+        source_digest(src.features.engineer, src.features.encoders, src.features.kernels, src.features.store,
+                      src.features.candidates),
+    )
+    training = {k: v for k, v in config['training'].items() if k != 'dataset_dir'}
+    train_key = runner.key(
+        'train', features_key, config['environment'], config['model'], config['catboost'], training,
+        config['validation'], config['retraining'],
+        source_digest(src.models.trainer, src.models.registry, src.models.drift, src.models.matrix),
+    )
+    predict_key = runner.key('predict', train_key, source_digest(src.models.predictor))
+
+    def build_features():
+        # Step 1: Data Ingestion
+        logger.info("--- STEP 1: DATA INGESTION ---")
+        with span("load") as current:
+            loader = DataLoader(config)
+            train, test, customer, sku = loader.load_all()
+            current.rows = len(train) + len(test)
+
+        # Step 2: Feature Engineering
+        logger.info("--- STEP 2: FEATURE ENGINEERING ---")
+        with span("features", rows=len(train) + len(test)):
+            engineer = FeatureEngineer(engine=config['features']['engine'], shards=config['features']['shards'])
+            train, test, feature_cols = engineer.engineer_features(train, test)
+            # Seed the feature store so later runs can use --mode incremental
+            with span("feature_store", rows=len(train)):
+                store = FeatureStore().fit(train)
+            train, test, cat_cols = engineer.preprocess_metadata(train, test, customer, sku, feature_cols)
+            train = engineer.generate_targets(train)
+
+            # Combine numerical and categorical features — this is what models train AND predict on
+            all_features = feature_cols + cat_cols
+            index, candidates = build_serving_indexes(config, train, test, all_features, cat_cols, store,
+                                                      customer, sku, engineer.encoder)
+        return {'train': train, 'test': test, 'features': all_features, 'cat_cols': cat_cols,
+                'encoders': engineer.encoder.to_dict(), 'store': store, 'feature_index': index,
+                'candidate_index': candidates}
+
+    def features():
+        if 'features' not in outputs:
+            outputs['features'] = runner.run('features', features_key, build_features)
+        return outputs['features']
+
+    def train_models():
+        # Step 3: Model Training
+        logger.info("--- STEP 3: MODEL TRAINING ---")
+        data = features()
+        with span("train", rows=len(data['train'])):
+            trainer = ModelTrainer(config)
+            models = trainer.train_hybrid_ensemble(data['train'], data['features'], data['cat_cols'],
+                                                   run_key=train_key, encoders=data['encoders'])
+        # Checkpointed with the models so a republished ensemble keeps them
+        return {'models': models, 'validation': trainer.validation_report,
+                'holdout': trainer.holdout_predictions, 'lineage': trainer.lineage,
+                'feature_profile': trainer.feature_profile}
+
+    def trained():
+        if 'train' not in outputs:
+            outputs['train'] = runner.run('train', train_key, train_models)
+        return outputs['train']
+
+    def predict_means():
+        # Step 4: Prediction
+        logger.info("--- STEP 4: INFERENCE ---")
+        data = features()
+        models = trained()['models']
+        with span("predict", rows=len(data['test'])):
+            means = ModelPredictor(config).predict_means(models, data['test'], data['features'])
+        return {'ids': data['test']['ID'], 'means': means}
+
+    return {
+        'runner': runner,
+        'features_key': features_key,
+        'train_key': train_key,
+        'features': features,
+        'trained': trained,
+        'predictions': lambda: runner.run('predict', predict_key, predict_means),
+    }
+
+
+def publish(registry, trained, config, run_key, encoders):
+    """Publishes a checkpointed 'trained' stage output as the trainer would have."""
+    registry.save(trained['models'], config, run_key=run_key, encoders=encoders,
+                  validation=trained['validation'], holdout=trained['holdout'], lineage=trained['lineage'],
+                  feature_profile=trained['feature_profile'])
+
+
+def run_full(config, logger):
+    """
+    Runs ingestion, feature engineering, training and inference, skipping
+    every stage whose inputs, code and config section are unchanged since a
+    checkpointed run. Stages are evaluated lazily, so when only `scaling` or
+    `ensemble` change, only the cached seed means are read and re-blended.
+    The feature store and serving indexes are rewritten when they were not
+    published from this run's features stage.
+    Returns:
+        int: Number of submission rows.
+    """
+    stages = pipeline_stages(config, logger)
+    if serving_run_key(config) != stages['features_key']:
+        # Publish the feature store and serving indexes of this run's features,
+        # also on a checkpoint hit: an incremental run may have replaced them
+        data = stages['features']()
+        save_serving_state(config, data['store'], data['feature_index'], data['candidate_index'],
+                           run_key=stages['features_key'])
+    train_key = stages['train_key']
+    registry = ModelRegistry.for_config(config)
+    if stages['runner'].has('train', train_key) and registry.run_key() != train_key:
+        # The trainer will not run, so publish the checkpointed ensemble the API loads
+        publish(registry, stages['trained'](), config, train_key, stages['features']()['encoders'])
+    predictions = stages['predictions']()
+
+    # Step 5: Post-Processing — cheap, so it always runs with the current scaling/ensemble config
+    logger.info("--- STEP 5: POST-PROCESSING ---")
+    with span("postprocess", rows=len(predictions['ids'])):
+        return ModelPredictor(config).write_submission(predictions['ids'], predictions['means'])
+
+
+def run_select(config, logger):
+    """
+    Picks the reduced serving ensemble with the best holdout objective whose
+    scoring time fits `selection.latency_budget_ms` and saves it next to the
+    published models, training them first if their stage is not checkpointed.
+    The holdout is the last `validation.holdout_weeks` labelled Train weeks.
+    Returns:
+        dict: The saved selection.
+    """
+    holdout_weeks = config['validation']['holdout_weeks']
+    if not holdout_weeks:
+        raise ValueError("--mode select scores the validation holdout; set validation.holdout_weeks")
+    if config['validation']['refit']:
+        logger.warning("validation.refit is on: the published models were also fitted on the holdout weeks, "
+                       "which favours larger ensembles")
+
+    stages = pipeline_stages(config, logger)
+    data = stages['features']()
+    registry = ModelRegistry.for_config(config)
+    if registry.run_key() != stages['train_key']:
+        trained = stages['trained']()
+        # Training publishes the models itself; a checkpoint hit does not
+        if registry.run_key() != stages['train_key']:
+            publish(registry, trained, config, stages['train_key'], data['encoders'])
+
+    logger.info("--- SERVING ENSEMBLE SELECTION ---")
+    train = data['train']
+    start, unlabelled = holdout_split(train["week_start"], holdout_weeks)
+    holdout = train[(train["week_start"] >= start) & (train["week_start"] < unlabelled)]
+    with span("select", rows=len(holdout)):
+        selection = EnsembleSelector(config).select(registry, holdout, data['features'], data['test'])
+        registry.save_selection(selection)
+    return selection
+
+
 def main():
     setup_logging()
     logger = logging.getLogger("PipelineRunner")
-    
+
     parser = argparse.ArgumentParser(description="Feed-to-Farm ML Pipeline")
     parser.add_argument('--config', type=str, default='config/config.yaml', help='Path to config file')
+    parser.add_argument('--mode', choices=['full', 'incremental', 'select'], default='full',
+                        help='full: run every stage not already checkpointed; incremental: score Test from the feature store; '
+                             'select: save the reduced serving ensemble that fits selection.latency_budget_ms')
+    parser.add_argument('--profile', action='append', default=[], metavar='SPAN',
+                        help='Profile this span name or path (e.g. train) with monitoring.profile.tool; repeatable')
+    parser.add_argument('--overlay', type=str, default=None,
+                        help='YAML whose values replace those of the config, e.g. tuning.overlay from src.models.tuner')
     args = parser.parse_args()
 
     logger.info(f"Loading configuration from {args.config}")
     with open(args.config, 'r') as file:
         config = yaml.safe_load(file)
+    if args.overlay:
+        logger.info(f"Applying overlay {args.overlay}")
+        with open(args.overlay, 'r') as file:
+            config = apply_overlay(config, yaml.safe_load(file) or {})
+    monitoring = config['monitoring']
+    monitoring['profile']['stages'] = (monitoring['profile']['stages'] or []) + args.profile
+    TRACER.configure(monitoring)
 
     try:
-        # Step 1: Data Ingestion
-        logger.info("--- STEP 1: DATA INGESTION ---")
-        loader = DataLoader(config)
-        train, test, customer, sku = loader.load_all()
-        
-        # Step 2: Feature Engineering
-        logger.info("--- STEP 2: FEATURE ENGINEERING ---")
-        engineer = FeatureEngineer()
-        train, test, feature_cols = engineer.engineer_features(train, test)
-        train, test, cat_cols = engineer.preprocess_metadata(train, test, customer, sku, feature_cols)
-        train = engineer.generate_targets(train)
-        
-        # Combine numerical and categorical features — this is what models train AND predict on
-        all_features = feature_cols + cat_cols
-        
-        # Step 3: Model Training
-        logger.info("--- STEP 3: MODEL TRAINING ---")
-        trainer = ModelTrainer(config)
-        models = trainer.train_hybrid_ensemble(train, all_features, cat_cols)
-        
-        # Step 4: Prediction & Post-Processing
-        logger.info("--- STEP 4: INFERENCE & POST-PROCESSING ---")
-        predictor = ModelPredictor(config)
-        submission = predictor.predict(models, test, all_features)
-        
-        logger.info(f"Pipeline executed successfully! Submission shape: {submission.shape}")
-        
+        with span(args.mode):
+            if args.mode == 'incremental':
+                n_rows = run_incremental(config, logger)
+                logger.info(f"Incremental scoring finished! Submission rows: {n_rows}")
+                return
+            if args.mode == 'select':
+                selection = run_select(config, logger)
+                logger.info(f"Serving selection saved: {selection['seeds']}, trees {selection['round_fraction']}")
+                return
+
+            n_rows = run_full(config, logger)
+            logger.info(f"Pipeline executed successfully! Submission rows: {n_rows}")
+
     except Exception as e:
         logger.error(f"Pipeline failed: {str(e)}", exc_info=True)
+    finally:
+        if TRACER.enabled and monitoring['report']:
+            TRACER.save(monitoring['report'])
+
 
 if __name__ == "__main__":
     main()
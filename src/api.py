@@ -1,45 +1,140 @@
-from fastapi import FastAPI, HTTPException
-import joblib
+from fastapi import FastAPI, HTTPException, Request
+import threading
+import time
 import yaml
-import pandas as pd
-import numpy as np
 import os
+import signal
+import numpy as np
 from pydantic import BaseModel
-from typing import List, Optional
-from src.features.engineer import FeatureEngineer
+from typing import List, NamedTuple, Optional
+from src.features.candidates import CandidateIndex
+from src.features.index import FeatureIndex
 from src.models.predictor import ModelPredictor
+from src.models.batcher import MicroBatcher
+from src.models.cache import PredictionCache
+from src.models.registry import ModelRegistry
+from src.monitoring.memory import process_memory_mb
+from src.monitoring.metrics import LatencyHistogram, RequestMetrics
 
 # Initialize FastAPI app
-app = FastAPI(title="Feed-to-Farm Prediction API", 
+app = FastAPI(title="Feed-to-Farm Prediction API",
               description="Real-time purchasing recommendations for produce.")
 
 # Load Config
 with open("config/config.yaml", "r") as f:
     config = yaml.safe_load(f)
 
-# Global variables for models and predictors
-MODELS = None
+
+class Artifacts(NamedTuple):
+    """Everything loaded from disk that requests are served from, swapped as one unit on reload."""
+    models: Optional[dict] = None
+    # Identifies the loaded ensemble in cache keys; changes whenever models are republished
+    version: Optional[str] = None
+    feature_index: Optional[FeatureIndex] = None
+    candidate_index: Optional[CandidateIndex] = None
+
+
+# Handlers read ARTIFACTS once and use that snapshot throughout, so a reload
+# never mixes models and indexes of different versions within a request
+ARTIFACTS = Artifacts()
+_RELOAD_LOCK = threading.Lock()
 PREDICTOR = ModelPredictor(config)
-FE_ENGINEER = FeatureEngineer()
+BATCHER = None
+# Set by src.serve in pre-forked workers; /reload then asks that parent to roll the workers
+SERVER_PID = None
+
+cache_config = config['serving']['cache']
+CACHE = PredictionCache(cache_config['max_size'], cache_config['ttl_s']) if cache_config['enabled'] else None
+
+# Served by /metrics: per-route request latency and ensemble scoring latency
+REQUEST_METRICS = RequestMetrics()
+SCORE_LATENCY = LatencyHistogram()
+SCORED_ROWS = 0
+_SCORED_ROWS_LOCK = threading.Lock()
+
+
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get('route')
+        path = route.path if route is not None else "unmatched"
+        REQUEST_METRICS.observe(f"{request.method} {path}", (time.perf_counter() - start) * 1000, status)
+
+
+def load_artifacts(lazy=None):
+    """
+    Loads the models and indexes into a new snapshot, then swaps it in with
+    one assignment, so requests keep being served from the previous snapshot
+    until the new one is complete. Cached predictions of the previous models
+    are dropped.
+    Args:
+        lazy (bool): Overrides `serving.models.lazy`; src.serve loads eagerly
+            before forking so workers share the models.
+    """
+    global ARTIFACTS
+    loading = config['serving']['models']
+    mmap_mode = 'r' if config['serving']['server']['mmap_indexes'] else None
+    with _RELOAD_LOCK:
+        models = version = feature_index = candidate_index = None
+        registry = ModelRegistry.for_config(config)
+        if registry.exists():
+            selection = registry.selection() if loading['selection'] else None
+            models = registry.load(seeds=loading['seeds'], lazy=loading['lazy'] if lazy is None else lazy,
+                                   max_workers=loading['load_workers'], selection=selection)
+            version = registry.model_version(selection)
+        else:
+            print(f"Warning: Model registry not found at {registry.directory}. Predict endpoint will fail.")
+
+        index_path = config['paths']['feature_index']
+        if os.path.exists(index_path):
+            feature_index = FeatureIndex.load(index_path, mmap_mode=mmap_mode)
+        else:
+            print(f"Warning: Feature index not found at {index_path}. Predict endpoint will fail.")
+
+        candidates_path = config['paths']['candidate_index']
+        if os.path.exists(candidates_path):
+            candidate_index = CandidateIndex.load(candidates_path, mmap_mode=mmap_mode)
+        else:
+            print(f"Warning: Candidate index not found at {candidates_path}. Recommend endpoint will fail.")
+
+        ARTIFACTS = Artifacts(models, version, feature_index, candidate_index)
+        if CACHE is not None:
+            CACHE.clear()
+
 
 @app.on_event("startup")
 def load_models():
-    global MODELS
-    model_path = os.path.join(config['paths']['model_dir'], 'hybrid_ensemble.pkl')
-    if os.path.exists(model_path):
-        MODELS = joblib.load(model_path)
-    else:
-        print(f"Warning: Model not found at {model_path}. Predict endpoint will fail.")
+    global BATCHER
+    # Pre-forked workers inherit the snapshot their parent loaded
+    if ARTIFACTS == Artifacts():
+        load_artifacts()
+    micro_batch = config['serving']['micro_batch']
+    if micro_batch['enabled']:
+        BATCHER = MicroBatcher(score, window_ms=micro_batch['window_ms'],
+                               max_batch_size=micro_batch['max_batch_size'])
+
+
+@app.on_event("shutdown")
+def stop_batcher():
+    global BATCHER
+    if BATCHER is not None:
+        BATCHER.close()
+        BATCHER = None
+
 
 class PurchaseRequest(BaseModel):
-    # This expects the raw columns needed for feature engineering
-    # For a real API, you might want to fetch some of this from a DB instead of passing it all
     customer_id: int
     product_unit_variant_id: int
-    # ... any other immediate fields if needed by FE_ENGINEER ...
-    # Note: In a production setting, the API would likely query the last X weeks of history 
-    # from a DB rather than requiring the caller to provide all lag features.
-    historical_data: List[dict] # List of weeks with 'week_start' and 'qty_this_week'
+    # Optional recent weeks with 'week_start' and 'qty_this_week'. Only weeks on or
+    # after the indexed scoring week change the features; older ones are already indexed.
+    historical_data: List[dict] = []
+
 
 class PredictionResponse(BaseModel):
     buy_1w_prob: float
@@ -47,45 +142,224 @@ class PredictionResponse(BaseModel):
     qty_1w: float
     qty_2w: float
 
+
+class BatchPurchaseRequest(BaseModel):
+    items: List[PurchaseRequest]
+
+
+class BatchPredictionItem(PredictionResponse):
+    customer_id: int
+    product_unit_variant_id: int
+
+
+class BatchPredictionResponse(BaseModel):
+    predictions: List[BatchPredictionItem]
+
+
+class RecommendedProduct(PredictionResponse):
+    product_unit_variant_id: int
+
+
+class RecommendationResponse(BaseModel):
+    customer_id: int
+    candidates: int
+    recommendations: List[RecommendedProduct]
+
+
 @app.get("/")
 def read_root():
-    return {"status": "online", "model_loaded": MODELS is not None}
+    artifacts = ARTIFACTS
+    return {
+        "status": "online",
+        "pid": os.getpid(),
+        "model_loaded": artifacts.models is not None,
+        "indexed_pairs": len(artifacts.feature_index) if artifacts.feature_index is not None else 0,
+        "indexed_customers": len(artifacts.candidate_index) if artifacts.candidate_index is not None else 0,
+        "model_version": artifacts.version,
+        "cache": CACHE.snapshot() if CACHE is not None else None,
+    }
+
+
+@app.post("/reload")
+def reload():
+    """
+    Hot-swaps the published models and indexes without dropping requests.
+    A single process loads the new snapshot while it keeps serving the old
+    one. Pre-forked workers instead signal their parent, which loads it once,
+    forks fresh workers on the same socket and drains the old ones.
+    """
+    if SERVER_PID is not None:
+        os.kill(SERVER_PID, signal.SIGHUP)
+        return {"status": "reloading", "server_pid": SERVER_PID}
+    load_artifacts()
+    return read_root()
+
+
+@app.get("/metrics")
+def metrics():
+    """
+    Request latency per route, ensemble scoring latency, micro-batching
+    counters and this worker's memory. Pre-forked workers each answer for
+    themselves; their PSS adds up to the server's real footprint.
+    """
+    return {
+        "process": {"pid": os.getpid(), **process_memory_mb()},
+        "endpoints": REQUEST_METRICS.snapshot(),
+        "scoring": {"rows": SCORED_ROWS, "latency": SCORE_LATENCY.snapshot()},
+        "micro_batch": {"batches": BATCHER.batches, "rows": BATCHER.rows} if BATCHER is not None else None,
+    }
+
+
+def score_raw(X, models=None):
+    """
+    Runs the ensemble on a feature matrix in training column order and
+    returns the blended (p1, p2, q1, q2) before post-processing.
+    Args:
+        models (dict): The snapshot's models; defaults to the current ones
+            (the micro-batcher scores with the models live at dispatch).
+    """
+    global SCORED_ROWS
+    models = ARTIFACTS.models if models is None else models
+    start = time.perf_counter()
+    X_lgb, cb_pool = PREDICTOR.ensemble_inputs(models, X)
+    raw = PREDICTOR.predict_raw(models, X_lgb, cb_pool)
+    SCORE_LATENCY.observe((time.perf_counter() - start) * 1000)
+    with _SCORED_ROWS_LOCK:
+        SCORED_ROWS += len(X)
+    return raw
+
+
+def score(X, models=None):
+    """
+    Runs the ensemble on a feature matrix in training column order and
+    returns the post-processed targets.
+    """
+    return PREDICTOR.postprocess(*score_raw(X, models))
+
+
+def to_response(out, i):
+    return {
+        "buy_1w_prob": float(out["Target_purchase_next_1w"][i]),
+        "buy_2w_prob": float(out["Target_purchase_next_2w"][i]),
+        "qty_1w": float(out["Target_qty_next_1w"][i]),
+        "qty_2w": float(out["Target_qty_next_2w"][i]),
+    }
+
+
+def request_vector(request, index):
+    """Looks up (and if needed rolls forward) the feature vector of one request."""
+    pair = (request.customer_id, request.product_unit_variant_id)
+    if pair not in index:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No features for customer {pair[0]}, product {pair[1]}"
+        )
+    try:
+        return index.vector(*pair, request.historical_data)
+    except (KeyError, ValueError, TypeError) as e:
+        raise HTTPException(status_code=422, detail=f"Invalid historical_data: {e}")
+
+
+def cache_key(request, artifacts):
+    """
+    Everything a request's prediction depends on: the pair, the week its
+    vector was indexed for, any newer supplied weeks and the model version.
+    Call after `request_vector`, which validates the pair and history.
+    """
+    pair = (request.customer_id, request.product_unit_variant_id)
+    index = artifacts.feature_index
+    newer = index.newer_history(*pair, request.historical_data)
+    return pair, index.weeks[index.keys[pair]], tuple(newer), artifacts.version
+
 
 @app.post("/predict", response_model=PredictionResponse)
 def predict(request: PurchaseRequest):
-    if MODELS is None:
+    artifacts = ARTIFACTS
+    if artifacts.models is None or artifacts.feature_index is None:
         raise HTTPException(status_code=503, detail="Models not loaded")
-    
-    # 1. Convert historical data to DataFrame
-    df = pd.DataFrame(request.historical_data)
-    df['customer_id'] = request.customer_id
-    df['product_unit_variant_id'] = request.product_unit_variant_id
-    df['week_start'] = pd.to_datetime(df['week_start'])
-    
-    # 2. Run feature engineering (minimal subset needed for inference)
-    # This is a simplification; in production, you'd apply the same FeatureEngineer transforms
-    # to the input window provided in the request.
+
+    X = request_vector(request, artifacts.feature_index)
+    key = cache_key(request, artifacts) if CACHE is not None else None
+    cached = CACHE.get(key) if key is not None else None
+    if cached is not None:
+        return cached
     try:
-        # Note: For real-time, we usually just need the features for the LAST week
-        # Here we mock the process since full-scale FE needs the whole train context
-        # In a real portfolio app, you'd show how you derive features for a single request.
-        
-        # We'll use the predictor logic directly for the demonstration
-        # Usually, you'd pass the transformed row to PREDICTOR.predict()
-        
-        # This is a placeholder for the logic:
-        # 1. Transform request to feature vector
-        # 2. Call PREDICTOR.predict() on that vector
-        
-        return {
-            "buy_1w_prob": 0.85, # placeholder values for logic demo
-            "buy_2w_prob": 0.72,
-            "qty_1w": 5.5,
-            "qty_2w": 4.2
+        out = BATCHER.submit(X) if BATCHER is not None else score(X, artifacts.models)
+        response = to_response(out, 0)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if key is not None:
+        CACHE.put(key, response)
+    return response
+
+
+@app.post("/predict/batch", response_model=BatchPredictionResponse)
+def predict_batch(request: BatchPurchaseRequest):
+    """Scores many pairs with one pass of every model over the stacked rows not already cached."""
+    artifacts = ARTIFACTS
+    if artifacts.models is None or artifacts.feature_index is None:
+        raise HTTPException(status_code=503, detail="Models not loaded")
+    if not request.items:
+        return {"predictions": []}
+
+    vectors = [request_vector(item, artifacts.feature_index) for item in request.items]
+    keys = [cache_key(item, artifacts) if CACHE is not None else None for item in request.items]
+    responses = [CACHE.get(key) if key is not None else None for key in keys]
+    # Only cache misses are scored, still in one pass over their stacked rows
+    misses = [i for i, response in enumerate(responses) if response is None]
+    if misses:
+        try:
+            out = score(np.vstack([vectors[i] for i in misses]), artifacts.models)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+        for j, i in enumerate(misses):
+            responses[i] = to_response(out, j)
+            if keys[i] is not None:
+                CACHE.put(keys[i], responses[i])
+    return {"predictions": [
+        {
+            "customer_id": item.customer_id,
+            "product_unit_variant_id": item.product_unit_variant_id,
+            **response,
         }
+        for item, response in zip(request.items, responses)
+    ]}
+
+
+@app.get("/recommend/{customer_id}", response_model=RecommendationResponse)
+def recommend(customer_id: int, k: int = None):
+    """
+    Scores every precomputed candidate SKU of a customer in one ensemble pass
+    and returns the `k` most likely next-week purchases with expected quantities.
+    """
+    artifacts = ARTIFACTS
+    if artifacts.models is None or artifacts.candidate_index is None:
+        raise HTTPException(status_code=503, detail="Models not loaded")
+    k = config['serving']['recommend']['top_k'] if k is None else k
+    if k < 1:
+        raise HTTPException(status_code=422, detail=f"k must be at least 1, got {k}")
+    if customer_id not in artifacts.candidate_index:
+        raise HTTPException(status_code=404, detail=f"No candidates for customer {customer_id}")
+
+    products, X = artifacts.candidate_index.candidates(customer_id)
+    try:
+        raw = score_raw(X, artifacts.models)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    out = PREDICTOR.postprocess(*raw)
+    # Highest blended 1-week probability first: the served one is scaled and
+    # clipped at 1, which would tie the likeliest candidates
+    top = np.argsort(-raw[0], kind="stable")[:k]
+    return {
+        "customer_id": customer_id,
+        "candidates": len(products),
+        "recommendations": [
+            {"product_unit_variant_id": int(products[i]), **to_response(out, i)} for i in top
+        ],
+    }
+
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    server = config['serving']['server']
+    uvicorn.run(app, host=server['host'], port=server['port'])
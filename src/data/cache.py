@@ -0,0 +1,91 @@
+import hashlib
+import json
+import logging
+import os
+import pyarrow as pa
+import pyarrow.feather as feather
+
+# Bump when the loader's typing changes so stale caches are rebuilt
+CACHE_VERSION = 1
+
+
+def file_sha256(path, block_size=1 << 20):
+    """Streams a file through SHA-256 without loading it into memory."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class FrameCache:
+    """
+    Typed copies of source CSVs stored as uncompressed Arrow IPC (Feather v2)
+    files, which can be memory-mapped on read.
+
+    Each entry `<name>.feather` has a `<name>.json` manifest recording the
+    source's size, mtime and SHA-256, plus the signature of the schema the
+    frame was typed with. An unchanged size and mtime is a hit without
+    rehashing. A changed mtime with the same hash (e.g. a `touch`) is still a
+    hit and refreshes the manifest. Anything else is a miss.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.logger = logging.getLogger(self.__class__.__name__)
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _paths(self, name):
+        base = os.path.join(self.cache_dir, name)
+        return f"{base}.feather", f"{base}.json"
+
+    def _source_stamp(self, source):
+        stat = os.stat(source)
+        return {'source': os.path.abspath(source), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+    def get(self, name, source, signature=''):
+        """
+        Returns the cached frame for `source` typed under `signature`, or None
+        if it is missing or stale.
+        """
+        data_path, manifest_path = self._paths(name)
+        if not (os.path.exists(data_path) and os.path.exists(manifest_path)):
+            return None
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+        stamp = self._source_stamp(source)
+        if manifest.get('version') != CACHE_VERSION or manifest.get('source') != stamp['source']:
+            return None
+        if manifest.get('signature') != signature:
+            return None
+        if manifest['size'] != stamp['size']:
+            return None
+        if manifest['mtime_ns'] != stamp['mtime_ns']:
+            if file_sha256(source) != manifest['sha256']:
+                return None
+            manifest.update(stamp)
+            self._write_manifest(manifest_path, manifest)
+
+        self.logger.info(f"Cache hit for {name}: memory-mapping {data_path}")
+        table = feather.read_table(data_path, memory_map=True)
+        return table.to_pandas(split_blocks=True)
+
+    def put(self, name, source, df, signature=''):
+        """Stores `df` as the copy of `source` typed under `signature`."""
+        data_path, manifest_path = self._paths(name)
+        self.logger.info(f"Caching {name} to {data_path}")
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        # Uncompressed so cache hits can be memory-mapped instead of decoded
+        feather.write_feather(table, data_path, compression='uncompressed')
+        manifest = {
+            'version': CACHE_VERSION, 'signature': signature,
+            'sha256': file_sha256(source), **self._source_stamp(source),
+        }
+        self._write_manifest(manifest_path, manifest)
+
+    def _write_manifest(self, path, manifest):
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp, path)
@@ -1,6 +1,9 @@
 import pandas as pd
-import numpy as np
+import json
 import logging
+from pandas.api.types import union_categoricals
+from src.data.cache import FrameCache
+
 
 class DataLoader:
     def __init__(self, config):
@@ -9,7 +12,10 @@ class DataLoader:
         """
         self.config = config
         self.paths = config['paths']
+        self.schema = config['schema']
         self.logger = logging.getLogger(self.__class__.__name__)
+        cache = config['data_cache']
+        self.cache = FrameCache(cache['dir']) if cache['enabled'] else None
 
     def _downcast_memory(self, df):
         """
@@ -23,35 +29,73 @@ class DataLoader:
                 df[col] = df[col].astype('int32')
         return df
 
+    def _read_csv(self, path, schema):
+        """
+        Reads a CSV with its declared schema applied by the parser, so columns
+        arrive already typed instead of as int64/float64/object first. With
+        `chunksize`, the file is parsed chunk by chunk and only typed chunks
+        are kept.
+        Args:
+            path (str): CSV path.
+            schema (dict): Optional `usecols`, `dtypes`, `categoricals`,
+                `dates` and `chunksize` entries for this table. `usecols`
+                lists the columns to read when the file has them.
+        Returns:
+            pd.DataFrame
+        """
+        categoricals = schema.get('categoricals', [])
+        usecols = schema.get('usecols')
+        kwargs = {
+            # A whitelist: listed columns missing from the file are skipped, not an error
+            'usecols': (lambda col, keep=frozenset(usecols): col in keep) if usecols else None,
+            'dtype': {**schema.get('dtypes', {}), **{col: 'category' for col in categoricals}},
+            'parse_dates': schema.get('dates') or None,
+        }
+        if not schema.get('chunksize'):
+            return pd.read_csv(path, **kwargs)
+
+        chunks = list(pd.read_csv(path, chunksize=schema['chunksize'], **kwargs))
+        if not chunks:
+            return pd.read_csv(path, **kwargs)
+        # Chunks see different category sets; align them so concat keeps the dtype
+        for col in (c for c in categoricals if c in chunks[0].columns):
+            categories = union_categoricals([chunk[col] for chunk in chunks]).categories
+            for chunk in chunks:
+                chunk[col] = chunk[col].cat.set_categories(categories)
+        return pd.concat(chunks, ignore_index=True)
+
+    def _read(self, name, path):
+        """
+        Reads one table with its schema, downcasting any numeric column the
+        schema leaves undeclared, going through the columnar cache when it is
+        enabled.
+        Returns:
+            pd.DataFrame
+        """
+        schema = self.schema[name]
+        # Cached frames are only valid for the schema they were typed with
+        signature = json.dumps(schema, sort_keys=True)
+        if self.cache is not None:
+            df = self.cache.get(name, path, signature)
+            if df is not None:
+                return df
+
+        self.logger.info(f"Loading {name} data from {path}")
+        df = self._downcast_memory(self._read_csv(path, schema))
+
+        if self.cache is not None:
+            self.cache.put(name, path, df, signature)
+        return df
+
     def load_all(self):
         """
-        Loads train, test, customer, and sku datasets, applies downcasting,
-        and parses datetime columns.
+        Loads train, test, customer, and sku datasets typed by the configured
+        schema, with datetime columns parsed.
         Returns:
             train, test, customer, sku (pd.DataFrame)
         """
-        self.logger.info(f"Loading Train data from {self.paths['train_data']}")
-        train = pd.read_csv(self.paths['train_data'])
-        
-        self.logger.info(f"Loading Test data from {self.paths['test_data']}")
-        test = pd.read_csv(self.paths['test_data'])
-        
-        self.logger.info(f"Loading Customer data from {self.paths['customer_data']}")
-        customer = pd.read_csv(self.paths['customer_data'])
-        
-        self.logger.info(f"Loading SKU data from {self.paths['sku_data']}")
-        sku = pd.read_csv(self.paths['sku_data'])
-
-        # Downcast
-        train = self._downcast_memory(train)
-        test = self._downcast_memory(test)
-        customer = self._downcast_memory(customer)
-        sku = self._downcast_memory(sku)
-
-        # Datetime Parsing
-        self.logger.info("Parsing datetime columns...")
-        train["week_start"] = pd.to_datetime(train["week_start"])
-        test["week_start"] = pd.to_datetime(test["week_start"])
-        customer["customer_created_at"] = pd.to_datetime(customer["customer_created_at"])
-
+        train = self._read('train', self.paths['train_data'])
+        test = self._read('test', self.paths['test_data'])
+        customer = self._read('customer', self.paths['customer_data'])
+        sku = self._read('sku', self.paths['sku_data'])
         return train, test, customer, sku
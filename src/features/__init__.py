@@ -2,8 +2,10 @@
 Feature Engineering components.
 
 Contains logic to create rolling aggregates, universal product trends,
-customer momentum features, and time-based seasonality indicators.
+customer momentum features, time-based seasonality indicators, and the
+fitted categorical encoder stored with the models.
 """
 from .engineer import FeatureEngineer
+from .encoders import CategoryEncoder
 
-__all__ = ["FeatureEngineer"]
+__all__ = ["FeatureEngineer", "CategoryEncoder"]
@@ -0,0 +1,154 @@
+import pandas as pd
+import numpy as np
+import logging
+import joblib
+import os
+from .encoders import UNSEEN
+from .engineer import FEATURE_COLS
+
+ONE_WEEK = pd.Timedelta(days=7)
+
+
+class CandidateIndex:
+    """
+    Precomputed recommendation candidates of every customer with their
+    scoring vectors, used by the API's /recommend endpoint.
+
+    A customer's candidates are the SKUs they bought most (up to
+    `max_history`) plus the SKUs that sold most over the last
+    `popular_weeks` Train weeks (up to `n_popular`), so the rows scored per
+    request stay bounded however large the catalogue grows. Rows of all
+    customers are stored contiguously in one float64 matrix in training
+    column order, with each customer's block located through `offsets`.
+
+    Pairs in the FeatureIndex reuse their indexed vector. Other candidates
+    are scored as new rows of the index's scoring week, with features from
+    the FeatureStore and categoricals from the customer and SKU tables.
+    """
+
+    def __init__(self, features, customers, offsets, products, matrix, week):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.features = list(features)
+        self.customers = customers
+        self.offsets = offsets
+        self.products = products
+        self.matrix = matrix
+        self.week = week
+
+    @classmethod
+    def build(cls, history, feature_index, store, customer, sku, encoder,
+              max_history=100, n_popular=50, popular_weeks=4):
+        """
+        Args:
+            history (pd.DataFrame): Train rows with customer_id,
+                product_unit_variant_id, week_start and qty_this_week.
+            feature_index (FeatureIndex): Vectors of the pairs being scored.
+            store (FeatureStore): State holding every Train week.
+            customer, sku (pd.DataFrame): Metadata tables.
+            encoder (CategoryEncoder): The encoder the models were trained with.
+        Returns:
+            CandidateIndex
+        """
+        features = feature_index.features
+        week = (pd.Timestamp(feature_index.weeks.max()) if len(feature_index)
+                else pd.Timestamp(store.last_week) + ONE_WEEK)
+
+        # Best sellers among the SKUs still listed (and active, when known)
+        listed = sku
+        if "grade_active_status" in sku.columns:
+            listed = sku[sku["grade_active_status"].fillna(False).astype(bool)]
+        recent = history[history["week_start"] > pd.Timestamp(store.last_week) - popular_weeks * ONE_WEEK]
+        volume = recent.groupby("product_unit_variant_id", observed=True)["qty_this_week"].sum()
+        volume = volume[volume.index.isin(listed["product_unit_variant_id"])]
+        popular = volume.sort_values(ascending=False, kind="mergesort").index[:n_popular].to_numpy()
+
+        # Each customer's most-bought SKUs, then the popular ones they lack
+        bought = pd.DataFrame(
+            [(c, p, state.qty_sum) for (c, p), state in store.pairs.items() if state.qty_sum > 0],
+            columns=["customer_id", "product_unit_variant_id", "qty"],
+        )
+        bought = bought.sort_values(["customer_id", "qty"], ascending=[True, False], kind="mergesort")
+        bought = bought.groupby("customer_id").head(max_history)
+        customers = np.union1d(bought["customer_id"].to_numpy(), customer["customer_id"].to_numpy())
+        extra = pd.DataFrame({
+            "customer_id": np.repeat(customers, len(popular)),
+            "product_unit_variant_id": np.tile(popular, len(customers)),
+        })
+        pairs = pd.concat([bought[["customer_id", "product_unit_variant_id"]], extra], ignore_index=True)
+        pairs = pairs.drop_duplicates(keep="first").sort_values("customer_id", kind="mergesort")
+        pairs = pairs.reset_index(drop=True)
+
+        matrix = np.empty((len(pairs), len(features)))
+        rows = np.array([feature_index.keys.get(pair, -1) for pair in
+                         zip(pairs["customer_id"].tolist(), pairs["product_unit_variant_id"].tolist())])
+        indexed = rows >= 0
+        matrix[indexed] = feature_index.matrix[rows[indexed]]
+        if (~indexed).any():
+            matrix[~indexed] = cls._new_pair_vectors(
+                pairs[~indexed], week, features, store, customer, sku, encoder)
+
+        cust = pairs["customer_id"].to_numpy()
+        starts = np.flatnonzero(np.r_[True, cust[1:] != cust[:-1]]) if len(cust) else np.array([], dtype=int)
+        offsets = np.r_[starts, len(cust)]
+        customers = {c: i for i, c in enumerate(cust[starts].tolist())}
+        return cls(features, customers, offsets, pairs["product_unit_variant_id"].to_numpy(),
+                   np.ascontiguousarray(matrix), week)
+
+    @staticmethod
+    def _new_pair_vectors(pairs, week, features, store, customer, sku, encoder):
+        """Scoring vectors of candidate pairs outside the FeatureIndex."""
+        rows = pairs[["customer_id", "product_unit_variant_id"]].reset_index(drop=True)
+        rows["week_start"] = week
+        out = store.transform(rows)[FEATURE_COLS].fillna(0)
+
+        # Categoricals are named as in Train ("*_x"); look up the metadata attribute
+        for col in (c for c in features if c not in FEATURE_COLS):
+            base = col[:-2] if col.endswith("_x") else col
+            for meta, key in ((customer, "customer_id"), (sku, "product_unit_variant_id")):
+                if base in meta.columns:
+                    values = meta.drop_duplicates(key).set_index(key)[base].reindex(rows[key].to_numpy())
+                    out[col] = encoder.transform_column(col, values.reset_index(drop=True))
+                    break
+            else:
+                out[col] = UNSEEN
+        return out[features].to_numpy(dtype=np.float64)
+
+    def __len__(self):
+        return len(self.customers)
+
+    def __contains__(self, customer_id):
+        return customer_id in self.customers
+
+    def candidates(self, customer_id):
+        """
+        Returns:
+            tuple: (product ids, (n, n_features) matrix) of one customer's
+                candidates, views into the index.
+        Raises:
+            KeyError: If the customer has no candidates.
+        """
+        i = self.customers[customer_id]
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.products[start:end], self.matrix[start:end]
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.logger.info(f"Saving candidate index ({len(self)} customers, {len(self.products)} rows) to {path}")
+        joblib.dump({
+            "features": self.features,
+            "customers": self.customers,
+            "offsets": self.offsets,
+            "products": self.products,
+            "matrix": self.matrix,
+            "week": self.week,
+        }, path)
+
+    @classmethod
+    def load(cls, path, mmap_mode=None):
+        """
+        Args:
+            mmap_mode (str): 'r' maps the stored arrays read-only instead of
+                reading them, so processes serving the same file share its
+                pages. Rows handed out are never written to in place.
+        """
+        return cls(**joblib.load(path, mmap_mode=mmap_mode))
@@ -0,0 +1,85 @@
+import pandas as pd
+import numpy as np
+
+# Code given to categories the encoder was not fitted on. LightGBM treats
+# negative categorical values as missing; CatBoost sees one extra category.
+UNSEEN = -1
+
+
+def _labels(values):
+    """
+    Row labels of a non-categorical column as strings. Missing values become
+    'nan' explicitly: pandas 3 keeps NaN through `astype(str)`, older
+    versions give 'nan'.
+    """
+    return values.astype(object).where(values.notna(), 'nan').astype(str)
+
+
+def _observed(values):
+    """Distinct values of a column as strings, 'nan' standing in for missing ones."""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # Work on the categories instead of materializing a string per row
+        codes = np.unique(values.cat.codes.to_numpy())
+        labels = values.cat.categories.astype(str).to_numpy(dtype=object)[codes[codes >= 0]]
+        return np.append(labels, 'nan') if len(codes) and codes[0] < 0 else labels
+    return pd.unique(_labels(values).to_numpy(dtype=object))
+
+
+class CategoryEncoder:
+    """
+    Fitted mapping from category label to integer code for every categorical
+    column, replacing one LabelEncoder refitted per column. Codes are each
+    label's position among the column's sorted labels, as LabelEncoder
+    assigns them; labels outside the fitted set encode to `UNSEEN`.
+
+    The mapping is a plain {column: [labels]} dict, stored in the model
+    registry manifest so inference encodes exactly as training did.
+    """
+
+    def __init__(self, classes=None):
+        self.classes = {col: pd.Index(labels, dtype=object) for col, labels in (classes or {}).items()}
+
+    def fit(self, frames, cols):
+        """
+        Args:
+            frames (list[pd.DataFrame]): Frames whose labels together make up
+                each column's classes, e.g. [train, test].
+            cols (list): Categorical columns to fit.
+        Returns:
+            CategoryEncoder: self
+        """
+        for col in cols:
+            labels = np.concatenate([_observed(frame[col]) for frame in frames])
+            self.classes[col] = pd.Index(np.unique(labels.astype(str)), dtype=object)
+        return self
+
+    def transform_column(self, col, values):
+        """
+        Encodes one column with a hash lookup of each distinct label.
+        Returns:
+            np.ndarray: int64 codes, `UNSEEN` for labels outside the classes.
+        """
+        classes = self.classes[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # Look up each category once and gather by the row codes; -1 row
+            # codes are missing values, which encode as the 'nan' label
+            lookup = classes.get_indexer(values.cat.categories.astype(str))
+            lookup = np.append(lookup, classes.get_indexer(['nan']))
+            codes = lookup[values.cat.codes.to_numpy()].astype(np.int64)
+        else:
+            codes = classes.get_indexer(_labels(values)).astype(np.int64)
+        codes[codes < 0] = UNSEEN
+        return codes
+
+    def transform(self, frame, cols):
+        """Replaces each of `cols` in `frame` with its codes, in place."""
+        for col in cols:
+            frame[col] = self.transform_column(col, frame[col])
+        return frame
+
+    def to_dict(self):
+        return {col: classes.tolist() for col, classes in self.classes.items()}
+
+    @classmethod
+    def from_dict(cls, classes):
+        return cls(classes)
@@ -2,12 +2,102 @@ import pandas as pd
 import numpy as np
 import logging
 import gc
-from sklearn.preprocessing import LabelEncoder
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from src.monitoring.spans import span, traced
+from . import kernels
+from .encoders import CategoryEncoder
+
+FEATURE_COLS = [
+    "lag1", "lag2", "roll_mean_4",
+    "cust_lag1", "cust_roll_4",
+    "global_lag1", "global_roll_4",
+    "pair_buy_rate", "pair_recency",
+    "is_new_pair", "month", "week_of_year",
+]
+
+ENGINES = ("pandas", "vectorized")
+
+BASE_COLS = ["customer_id", "product_unit_variant_id", "week_start", "qty_this_week"]
+KEY_COLS = ["customer_id", "product_unit_variant_id", "week_start"]
+
+# Storage type of the fractional feature columns; counts and calendar features stay integers
+FEATURE_DTYPE = np.float32
+INT_FEATURE_COLS = ["is_new_pair", "month", "week_of_year"]
+
+
+def join_metadata(frame, meta, key):
+    """
+    Left-joins `meta` onto `frame` by looking `key` up in an index of `meta`
+    rather than merging, so `frame`'s columns are shared, not copied. Columns
+    present in both get merge's "_x"/"_y" suffixes and rows keep their order.
+    """
+    table = meta.drop_duplicates(key).set_index(key)
+    looked_up = table.reindex(frame[key].to_numpy())
+    overlap = set(table.columns) & set(frame.columns)
+
+    out = frame.copy(deep=False)
+    out.columns = [f"{c}_x" if c in overlap else c for c in frame.columns]
+    for col in table.columns:
+        out[f"{col}_y" if col in overlap else col] = looked_up[col].to_numpy()
+    return out
+
+
+def customer_shards(customer_ids, n_shards):
+    """
+    Assigns every row to one of up to `n_shards` contiguous, ascending
+    ranges of customer ids holding similar numbers of rows, so shards that
+    are each sorted by customer concatenate in shard order into one sorted
+    frame.
+    Returns:
+        np.ndarray: Shard number of each row.
+    """
+    ids, inverse, counts = np.unique(customer_ids, return_inverse=True, return_counts=True)
+    if len(ids) == 0:
+        return np.zeros(0, dtype=int)
+    # A customer goes to the shard its first row falls in
+    first_row = np.cumsum(counts) - counts
+    shard_of_customer = np.minimum(first_row * n_shards // counts.sum(), n_shards - 1)
+    return shard_of_customer[inverse.ravel()]
+
+
+def key_order(customers, products, weeks):
+    """
+    Positions of rows in stable (customer, product, week) order, the order
+    `sort_values` on those columns gives.
+    """
+    return np.lexsort((weeks, products, customers))
+
+
+def _shard_features(engine, train, test, rows):
+    """Pool task: the sorted base frame of a range of customers with its pair, customer and seasonality features."""
+    engineer = FeatureEngineer(engine=engine)
+    temp_df = engineer._base_frame(train, test, rows)
+    temp_df = engineer._pair_features(temp_df)
+    engineer._seasonality(temp_df)
+    return temp_df
+
 
 class FeatureEngineer:
-    def __init__(self):
+    def __init__(self, engine="pandas", shards=1):
+        """
+        Args:
+            engine (str): "pandas" runs the reference groupby implementation,
+                "vectorized" runs the NumPy segment kernels. Both produce the
+                same feature columns.
+            shards (int): Processes computing pair, customer and seasonality
+                features over disjoint customer ranges. Only the product
+                trends span customers; they run on the reassembled frame.
+                The output is identical for any number of shards.
+        """
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown feature engine '{engine}', expected one of {ENGINES}")
+        if shards < 1:
+            raise ValueError(f"shards must be at least 1, got {shards}")
+        self.engine = engine
+        self.shards = shards
         self.logger = logging.getLogger(self.__class__.__name__)
-        self.le = LabelEncoder()
+        self.encoder = CategoryEncoder()
 
     def _weeks_since_last_purchase(self, x):
         out, last = [], None
@@ -19,19 +109,126 @@ class FeatureEngineer:
                 out.append(i - last if last is not None else np.nan)
         return pd.Series(out, index=x.index)
 
+    @traced("engineer_features", rows=lambda out: len(out[0]) + len(out[1]))
     def engineer_features(self, train, test):
-        self.logger.info("Creating base universal dataframe...")
-        base_cols = ["customer_id", "product_unit_variant_id", "week_start", "qty_this_week"]
-        
+        """
+        Computes FEATURE_COLS for every Train and Test row. Rows are sorted
+        once into (customer, product, week) order to compute them, then each
+        feature is written straight back to the rows it belongs to, so the
+        returned frames share the input columns instead of copying them and
+        keep the input order and index.
+        Returns:
+            train, test (pd.DataFrame), feature_cols (list)
+        """
+        if self.shards > 1:
+            temp_df = self._sharded_frame(train, test)
+        else:
+            self.logger.info("Creating base universal dataframe...")
+            with span("base_frame") as s:
+                temp_df = self._base_frame(train, test)
+                s.rows = len(temp_df)
+            with span(f"{self.engine}_features", rows=len(temp_df)):
+                temp_df = self._pair_features(temp_df)
+            self.logger.info("Generating Seasonality...")
+            with span("seasonality", rows=len(temp_df)):
+                self._seasonality(temp_df)
+
+        with span("product_features", rows=len(temp_df)):
+            temp_df = self._product_features(temp_df)
+
+        feature_cols = list(FEATURE_COLS)
+
+        self.logger.info("Aligning features back to train and test...")
+        with span("align", rows=len(train) + len(test)):
+            # Where each input row (Train first, then Test) sits in the sorted frame
+            sorted_pos = np.empty(len(temp_df), dtype=np.int64)
+            sorted_pos[temp_df["row"].to_numpy()] = np.arange(len(temp_df))
+            train_pos, test_pos = sorted_pos[:len(train)], sorted_pos[len(train):]
+            train, test = train.copy(deep=False), test.copy(deep=False)
+            for col in feature_cols:
+                values = temp_df.pop(col).to_numpy()
+                if col not in INT_FEATURE_COLS:
+                    values = values.astype(FEATURE_DTYPE, copy=False)
+                train[col] = values[train_pos]
+                test[col] = values[test_pos]
+
+        # Cleanup
+        del temp_df
+        gc.collect()
+
+        return train, test, feature_cols
+
+    def _base_frame(self, train, test, rows=None):
+        """
+        Train and Test rows of the base columns, sorted by customer, product
+        and week, with each row's position in Train followed by Test as "row".
+        Args:
+            rows (np.ndarray): Those positions when `train` and `test` are
+                slices of the full inputs; defaults to 0..n-1.
+        """
+        n_train = len(train)
         # In test, we don't have qty_this_week yet, assign 0.0 for rolling window continuity
-        test_dummy = test[["customer_id", "product_unit_variant_id", "week_start"]].copy()
-        test_dummy["qty_this_week"] = 0.0
-        
-        temp_df = pd.concat([train[base_cols], test_dummy], ignore_index=True)
-        temp_df = temp_df.sort_values(["customer_id", "product_unit_variant_id", "week_start"]).reset_index(drop=True)
-        
+        base = {
+            col: np.concatenate([train[col].to_numpy(), test[col].to_numpy()]) for col in KEY_COLS
+        }
+        base["qty_this_week"] = np.concatenate([
+            train["qty_this_week"].to_numpy(dtype=np.float64), np.zeros(len(test)),
+        ])
+        base["row"] = np.arange(n_train + len(test)) if rows is None else rows
+        order = key_order(*(base[col] for col in KEY_COLS))
+        return pd.DataFrame({col: values[order] for col, values in base.items()})
+
+    def _sharded_frame(self, train, test):
+        """
+        Builds the base frame with pair, customer and seasonality features on
+        a process pool, one contiguous customer range per task, and
+        concatenates the shards back into the unsharded frame's row order.
+        """
+        shard = customer_shards(np.concatenate([train["customer_id"].to_numpy(), test["customer_id"].to_numpy()]),
+                                self.shards)
+        train_shard, test_shard = shard[:len(train)], shard[len(train):]
+        # A customer holding many rows can leave a shard number unused
+        tasks = np.unique(shard)
+
+        self.logger.info(f"Computing pair and customer features on {len(tasks)} customer shards...")
+        with span("sharded_features", rows=len(shard)):
+            if len(tasks) == 0:
+                return _shard_features(self.engine, train, test, None)
+            # spawn: callers may already have started OpenMP threads (LightGBM) in this process
+            with ProcessPoolExecutor(max_workers=len(tasks), mp_context=multiprocessing.get_context("spawn")) as pool:
+                futures = [
+                    pool.submit(_shard_features, self.engine,
+                                train.loc[train_shard == i, BASE_COLS], test.loc[test_shard == i, KEY_COLS],
+                                np.flatnonzero(shard == i))
+                    for i in tasks
+                ]
+                parts = [f.result() for f in futures]
+        with span("reassemble", rows=len(shard)):
+            return pd.concat(parts, ignore_index=True)
+
+    def _pair_features(self, temp_df):
+        """Pair lags, rolls, buy rate and recency plus customer momentum, all within one customer's rows."""
+        if self.engine == "vectorized":
+            return self._vectorized_features(temp_df)
+        return self._pandas_features(temp_df)
+
+    def _seasonality(self, temp_df):
+        temp_df["month"] = temp_df["week_start"].dt.month.fillna(0).astype(int)
+        temp_df["week_of_year"] = temp_df["week_start"].dt.isocalendar().week.fillna(0).astype(int)
+
+    def _product_features(self, temp_df):
+        """Global product trends, which reduce volumes over every customer's rows."""
+        if self.engine == "vectorized":
+            return self._vectorized_product_features(temp_df)
+        return self._pandas_product_features(temp_df)
+
+    def _pandas_features(self, temp_df):
+        """
+        Reference implementation of the pair and customer features using
+        pandas groupby transforms.
+        """
         pair_grp = temp_df.groupby(["customer_id", "product_unit_variant_id"])["qty_this_week"]
-        
+
         self.logger.info("Generating Pair Features (Lags, Roll, Recency)...")
         temp_df["lag1"] = pair_grp.shift(1)
         temp_df["lag2"] = pair_grp.shift(2)
@@ -39,55 +236,101 @@ class FeatureEngineer:
         temp_df["is_new_pair"] = pair_grp.shift(1).isna().astype(int)
         temp_df["pair_buy_rate"] = pair_grp.transform(lambda x: x.shift(1).expanding().mean())
         temp_df["pair_recency"] = pair_grp.transform(lambda x: self._weeks_since_last_purchase(x).shift(1))
-        
+
         self.logger.info("Generating Customer Momentum...")
         cust_grp = temp_df.groupby("customer_id")["qty_this_week"]
         temp_df["cust_lag1"] = cust_grp.shift(1)
         temp_df["cust_roll_4"] = cust_grp.transform(lambda x: x.shift(1).rolling(4).mean())
-        
+
+        del pair_grp, cust_grp
+        return temp_df
+
+    def _pandas_product_features(self, temp_df):
+        """Reference implementation of the global product trends."""
         self.logger.info("Generating Global Product Trends...")
-        global_weekly = (
-            temp_df.groupby(["product_unit_variant_id", "week_start"])["qty_this_week"]
-            .sum()
-            .reset_index()
-            .rename(columns={"qty_this_week": "global_weekly_vol"})
+        temp_df["global_weekly_vol"] = (
+            temp_df.groupby(["product_unit_variant_id", "week_start"])["qty_this_week"].transform("sum")
         )
-        temp_df = temp_df.merge(global_weekly, on=["product_unit_variant_id", "week_start"], how="left")
         prod_grp = temp_df.groupby("product_unit_variant_id")["global_weekly_vol"]
         temp_df["global_lag1"] = prod_grp.shift(1)
         temp_df["global_roll_4"] = prod_grp.transform(lambda x: x.shift(1).rolling(4).mean())
-        
-        self.logger.info("Generating Seasonality...")
-        temp_df["month"] = temp_df["week_start"].dt.month.fillna(0).astype(int)
-        temp_df["week_of_year"] = temp_df["week_start"].dt.isocalendar().week.fillna(0).astype(int)
-        
-        feature_cols = [
-            "lag1", "lag2", "roll_mean_4",
-            "cust_lag1", "cust_roll_4",
-            "global_lag1", "global_roll_4",
-            "pair_buy_rate", "pair_recency",
-            "is_new_pair", "month", "week_of_year",
-        ]
-        
-        self.logger.info("Merging features back to train and test...")
-        merge_cols = ["customer_id", "product_unit_variant_id", "week_start"]
-        train = train.merge(temp_df[merge_cols + feature_cols], on=merge_cols, how="left")
-        test = test.merge(temp_df[merge_cols + feature_cols], on=merge_cols, how="left")
-        
-        # Cleanup
-        del temp_df, pair_grp, cust_grp, prod_grp, global_weekly
-        gc.collect()
-        
-        return train, test, feature_cols
 
-    def preprocess_metadata(self, train, test, customer, sku, feature_cols):
+        del prod_grp
+        return temp_df
+
+    def _vectorized_features(self, temp_df):
+        """
+        Computes the same features as `_pandas_features` with NumPy segment
+        kernels. Expects `temp_df` sorted by customer, product and week.
+        """
+        cust = temp_df["customer_id"].to_numpy()
+        prod = temp_df["product_unit_variant_id"].to_numpy()
+        qty = temp_df["qty_this_week"].to_numpy(dtype=np.float64)
+
+        self.logger.info("Generating Pair Features (Lags, Roll, Recency)...")
+        pair_pos = kernels.segment_positions(kernels.segment_starts(cust, prod))
+        lag1 = kernels.segment_shift(qty, pair_pos, 1)
+        temp_df["lag1"] = lag1
+        temp_df["lag2"] = kernels.segment_shift(qty, pair_pos, 2)
+        temp_df["roll_mean_4"] = kernels.segment_rolling_mean(qty, pair_pos, 4)
+        temp_df["is_new_pair"] = np.isnan(lag1).astype(int)
+        temp_df["pair_buy_rate"] = kernels.segment_expanding_mean(qty, pair_pos)
+        temp_df["pair_recency"] = kernels.segment_recency(qty, pair_pos)
+
+        self.logger.info("Generating Customer Momentum...")
+        cust_pos = kernels.segment_positions(kernels.segment_starts(cust))
+        temp_df["cust_lag1"] = kernels.segment_shift(qty, cust_pos, 1)
+        temp_df["cust_roll_4"] = kernels.segment_rolling_mean(qty, cust_pos, 4)
+
+        return temp_df
+
+    def _vectorized_product_features(self, temp_df):
+        """
+        Computes the same features as `_pandas_product_features`. A product's
+        rows are taken in the frame's (customer, product, week) order.
+        """
+        prod = temp_df["product_unit_variant_id"].to_numpy()
+        qty = temp_df["qty_this_week"].to_numpy(dtype=np.float64)
+
+        self.logger.info("Generating Global Product Trends...")
+        prod_codes, _ = pd.factorize(prod)
+        week_codes, week_uniques = pd.factorize(temp_df["week_start"])
+        global_vol = kernels.group_sum(prod_codes * len(week_uniques) + week_codes, qty)
+        temp_df["global_weekly_vol"] = global_vol
+
+        # Product groups are not contiguous in the pair ordering; a stable sort
+        # keeps each product's rows in their existing relative order.
+        order = np.argsort(prod, kind="stable")
+        prod_pos = kernels.segment_positions(kernels.segment_starts(prod[order]))
+        global_lag1 = np.empty(len(order))
+        global_roll_4 = np.empty(len(order))
+        global_lag1[order] = kernels.segment_shift(global_vol[order], prod_pos, 1)
+        global_roll_4[order] = kernels.segment_rolling_mean(global_vol[order], prod_pos, 4)
+        temp_df["global_lag1"] = global_lag1
+        temp_df["global_roll_4"] = global_roll_4
+
+        return temp_df
+
+    @traced("preprocess_metadata", rows=lambda out: len(out[0]) + len(out[1]))
+    def preprocess_metadata(self, train, test, customer, sku, feature_cols, encoder=None):
+        """
+        Joins customer and SKU metadata, encodes the categorical columns and
+        fills missing numerical features.
+        Args:
+            encoder (CategoryEncoder): Fitted encoder to apply, e.g. the one
+                stored with the models; when None one is fitted on Train and
+                Test. Either way it is kept as `self.encoder`.
+        Returns:
+            train, test (pd.DataFrame), cat_cols (list)
+        """
         self.logger.info("Merging Customer and SKU Metadata...")
-        train = train.merge(customer, on="customer_id", how="left")
-        train = train.merge(sku, on="product_unit_variant_id", how="left")
-        
-        test = test.merge(customer, on="customer_id", how="left")
-        test = test.merge(sku, on="product_unit_variant_id", how="left")
-        
+        with span("merge_metadata", rows=len(train) + len(test)):
+            train = join_metadata(train, customer, "customer_id")
+            train = join_metadata(train, sku, "product_unit_variant_id")
+
+            test = join_metadata(test, customer, "customer_id")
+            test = join_metadata(test, sku, "product_unit_variant_id")
+
         cat_candidates = ["customer_category", "customer_status", "grade_name", "unit_name"]
         cat_cols = []
         for c in cat_candidates:
@@ -95,31 +338,42 @@ class FeatureEngineer:
                 cat_cols.append(f"{c}_x")
             elif c in train.columns:
                 cat_cols.append(c)
-                
+
         self.logger.info("Encoding Categorical Variables...")
-        for col in cat_cols:
-            train[col] = train[col].astype(str).fillna("UNKNOWN")
-            test[col] = test[col].astype(str).fillna("UNKNOWN")
-            self.le.fit(pd.concat([train[col], test[col]]))
-            train[col] = self.le.transform(train[col])
-            test[col] = self.le.transform(test[col])
-            
+        with span("encode", rows=len(train) + len(test)):
+            self.encoder = encoder if encoder is not None else CategoryEncoder().fit([train, test], cat_cols)
+            self.encoder.transform(train, cat_cols)
+            self.encoder.transform(test, cat_cols)
+
         self.logger.info("Filling missing numerical values...")
-        for col in feature_cols:
-            train[col] = train[col].fillna(0)
-            test[col] = test[col].fillna(0)
-            
+        with span("fillna", rows=len(train) + len(test)):
+            for col in feature_cols:
+                # Train may arrive without features when only Test is being scored
+                if col in train.columns:
+                    train[col] = train[col].fillna(0)
+                test[col] = test[col].fillna(0)
+
         return train, test, cat_cols
 
+    @traced("generate_targets", rows=len)
     def generate_targets(self, train):
+        """
+        Adds each pair's quantity 1 and 2 weeks ahead and whether it buys.
+        A pair's next rows are found through the (customer, product, week)
+        order of the keys, so the frame is not re-sorted and keeps its order.
+        """
         self.logger.info("Generating Training Targets (1 week & 2 week)...")
-        train = train.sort_values(["customer_id", "product_unit_variant_id", "week_start"])
-        grp = train.groupby(["customer_id", "product_unit_variant_id"])["qty_this_week"]
-        
-        train["target_qty_1w"] = grp.shift(-1).fillna(0)
-        train["target_qty_2w"] = grp.shift(-2).fillna(0)
-        
-        train["target_buy_1w"] = (train["target_qty_1w"] > 0).astype(int)
-        train["target_buy_2w"] = (train["target_qty_2w"] > 0).astype(int)
-        
+        cust, prod = train["customer_id"].to_numpy(), train["product_unit_variant_id"].to_numpy()
+        order = key_order(cust, prod, train["week_start"].to_numpy())
+        starts = kernels.segment_starts(cust[order], prod[order])
+        qty = train["qty_this_week"].to_numpy()
+        dtype = np.result_type(qty.dtype, FEATURE_DTYPE)
+
+        train = train.copy(deep=False)
+        for weeks in (1, 2):
+            target = np.empty(len(train), dtype=dtype)
+            target[order] = np.nan_to_num(kernels.segment_lead(qty[order], starts, weeks), nan=0.0)
+            train[f"target_qty_{weeks}w"] = target
+            train[f"target_buy_{weeks}w"] = (target > 0).astype(int)
+
         return train
@@ -0,0 +1,215 @@
+import pandas as pd
+import numpy as np
+import logging
+import joblib
+import os
+from .engineer import FEATURE_DTYPE
+from .store import FeatureStore, WINDOW, _PairState
+
+ONE_WEEK = pd.Timedelta(days=7)
+
+
+def _customer_tails(test, store, pairs):
+    """
+    The customer quantities preceding each of `pairs`' own rows, most recent
+    first, in FeatureEngineer's (customer, product, week) order: the
+    customer's earlier products, each with its stored tail followed by its
+    scoring rows, which count as zero quantities.
+    Returns:
+        dict: Pair mapped to up to WINDOW quantities.
+    """
+    if not pairs:
+        return {}
+    counts = test.groupby(["customer_id", "product_unit_variant_id"], observed=True).size()
+    scored = dict(zip(counts.index.tolist(), counts.tolist()))
+    products = {}
+    for c, p in scored:
+        products.setdefault(c, set()).add(p)
+
+    def tail_of(c, p):
+        state = store.pairs.get((c, p))
+        return (state.qty_tail if state is not None else []) + [0.0] * scored.get((c, p), 0)
+
+    tails = {}
+    for c, p in pairs:
+        neighbours = sorted(set(store.customer_products.get(c, [])) | products.get(c, set()))
+        tails[(c, p)] = FeatureStore._walk_back(neighbours, p, [], lambda p2, c=c: tail_of(c, p2))
+    return tails
+
+
+def _with_scoring_rows(state, k):
+    """
+    A copy of a pair's state with `k` scoring rows appended, which
+    FeatureEngineer places in the pair's sequence as zero quantities.
+    """
+    folded = _PairState()
+    if state is not None:
+        folded.n, folded.qty_sum, folded.last_buy = state.n, state.qty_sum, state.last_buy
+        folded.qty_tail, folded.vol_tail = list(state.qty_tail), list(state.vol_tail)
+    folded.n += k
+    folded.qty_tail = (folded.qty_tail + [0.0] * k)[-WINDOW:]
+    return folded
+
+
+class FeatureIndex:
+    """
+    Compact in-memory lookup of each (customer_id, product_unit_variant_id)
+    pair's latest scoring vector, used by the API instead of running
+    `FeatureEngineer` per request.
+
+    Vectors are stored as rows of one float64 matrix in training column order
+    (numerical features followed by encoded categoricals), with a dict from
+    pair to row number for O(1) lookup. The pair's `FeatureStore` state is
+    kept alongside so a vector can be rolled forward when a caller supplies
+    weeks newer than the one it was built for, and for pairs with fewer than
+    `WINDOW` rows so are the customer quantities preceding the pair's own
+    rows, which complete its customer momentum window. When Test spans
+    several weeks, a pair's state includes its scoring rows before the
+    indexed one, as zero quantities.
+    """
+
+    def __init__(self, features, cat_cols, keys, matrix, weeks, pair_states, customer_tails=None):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.features = list(features)
+        self.cat_cols = list(cat_cols)
+        self.keys = keys
+        self.matrix = matrix
+        self.weeks = weeks
+        self.pair_states = pair_states
+        self.customer_tails = customer_tails or {}
+        self.col = {name: i for i, name in enumerate(self.features)}
+
+    @classmethod
+    def build(cls, test, features, cat_cols, store):
+        """
+        Builds the index from fully preprocessed scoring rows.
+        Args:
+            test (pd.DataFrame): Rows after `preprocess_metadata`, one or more per pair.
+            features (list): Training column order (numerical + categorical).
+            cat_cols (list): Encoded categorical columns within `features`.
+            store (FeatureStore): State holding every week before the scoring rows.
+        Returns:
+            FeatureIndex
+        """
+        # Keep the latest scoring row of every pair
+        latest = test.sort_values("week_start", kind="mergesort").drop_duplicates(
+            ["customer_id", "product_unit_variant_id"], keep="last"
+        )
+        pairs = list(zip(latest["customer_id"].tolist(), latest["product_unit_variant_id"].tolist()))
+        keys = {pair: i for i, pair in enumerate(pairs)}
+        matrix = np.ascontiguousarray(latest[features].to_numpy(dtype=np.float64))
+        weeks = latest["week_start"].to_numpy(dtype="datetime64[ns]")
+        # Scoring rows before each pair's indexed one, which precede it in FeatureEngineer's sequence
+        earlier = test.groupby(["customer_id", "product_unit_variant_id"], observed=True).size() - 1
+        earlier = dict(zip(earlier.index.tolist(), earlier.tolist()))
+        pair_states = {
+            pair: _with_scoring_rows(store.pairs.get(pair), earlier[pair]) if earlier[pair] else store.pairs[pair]
+            for pair in pairs if pair in store.pairs or earlier[pair]
+        }
+        short = [pair for pair in pairs if pair not in pair_states or pair_states[pair].n < WINDOW]
+        return cls(features, cat_cols, keys, matrix, weeks, pair_states, _customer_tails(test, store, short))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, pair):
+        return pair in self.keys
+
+    def newer_history(self, customer_id, product_id, history=None):
+        """
+        The entries of `history` that change a pair's vector: those dated on
+        or after its indexed week, sorted by week.
+        Returns:
+            list: (pd.Timestamp, float quantity) tuples, empty when the
+                indexed vector applies as is.
+        Raises:
+            KeyError: If the pair is not indexed.
+        """
+        week = self.weeks[self.keys[(customer_id, product_id)]]
+        if not history:
+            return []
+        newer = sorted(
+            (pd.Timestamp(h["week_start"]), float(h.get("qty_this_week", 0.0) or 0.0))
+            for h in history
+        )
+        return [(w, q) for w, q in newer if w >= week]
+
+    def vector(self, customer_id, product_id, history=None):
+        """
+        Returns the scoring vector of a pair as a (1, n_features) array.
+
+        Entries of `history` dated on or after the indexed week are treated as
+        newly observed weeks: pair lags, rolling mean, buy rate, recency and
+        seasonality are rolled forward to the week after the latest one, and
+        customer momentum follows the pair's own rows, preceded by the
+        customer's earlier products while the pair has fewer than `WINDOW`
+        rows, as `FeatureStore` walks them. Product trends need
+        other customers' volumes and are kept as indexed.
+        Args:
+            history (list[dict]): Optional rows with 'week_start' and 'qty_this_week'.
+        Raises:
+            KeyError: If the pair is not indexed.
+        """
+        pair = (customer_id, product_id)
+        row = self.matrix[self.keys[pair]][None, :]
+        newer = self.newer_history(customer_id, product_id, history)
+        if not newer:
+            return row
+
+        state = self.pair_states.get(pair) or _PairState()
+        n, total, last_buy = state.n, state.qty_sum, state.last_buy
+        tail = list(state.qty_tail)
+        for _, q in newer:
+            if q > 0:
+                last_buy = n
+            n, total = n + 1, total + q
+            tail.append(q)
+        tail = tail[-WINDOW:]
+
+        row = row.copy()
+        values = row[0]
+        prev = tail[::-1]
+        values[self.col["lag1"]] = prev[0]
+        values[self.col["lag2"]] = prev[1] if n >= 2 else 0
+        values[self.col["pair_buy_rate"]] = total / n
+        values[self.col["pair_recency"]] = (n - 1) - last_buy if last_buy >= 0 else 0
+        values[self.col["is_new_pair"]] = 0
+        values[self.col["cust_lag1"]] = prev[0]
+        if n >= WINDOW:
+            roll = FeatureStore._window_mean(prev[:WINDOW])
+            values[self.col["roll_mean_4"]] = roll
+            values[self.col["cust_roll_4"]] = roll
+        else:
+            # Missing windows are filled with 0, as preprocess_metadata does
+            customer = (prev + self.customer_tails.get(pair, []))[:WINDOW]
+            values[self.col["cust_roll_4"]] = FeatureStore._window_mean(customer) if len(customer) == WINDOW else 0
+
+        next_week = newer[-1][0] + ONE_WEEK
+        values[self.col["month"]] = next_week.month
+        values[self.col["week_of_year"]] = next_week.isocalendar()[1]
+        # Rounded like the feature columns the index was built from
+        values[:] = values.astype(FEATURE_DTYPE)
+        return row
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.logger.info(f"Saving feature index ({len(self)} pairs) to {path}")
+        joblib.dump({
+            "features": self.features,
+            "cat_cols": self.cat_cols,
+            "keys": self.keys,
+            "matrix": self.matrix,
+            "weeks": self.weeks,
+            "pair_states": self.pair_states,
+            "customer_tails": self.customer_tails,
+        }, path)
+
+    @classmethod
+    def load(cls, path, mmap_mode=None):
+        """
+        Args:
+            mmap_mode (str): 'r' maps the stored arrays read-only instead of
+                reading them, so processes serving the same file share its
+                pages. Rows handed out are never written to in place.
+        """
+        return cls(**joblib.load(path, mmap_mode=mmap_mode))
@@ -0,0 +1,123 @@
+"""
+Vectorized segment kernels for feature engineering.
+
+Every kernel works on flat NumPy arrays that are already sorted so that each
+group (pair, customer or product) occupies one contiguous run of rows, called
+a segment. Segments are described by a boolean ``starts`` mask flagging the
+first row of each run, and ``pos`` holds each row's zero-based offset inside
+its segment. Together they replace ``groupby(...).transform(lambda ...)``
+with a handful of array operations.
+"""
+import numpy as np
+
+
+def segment_starts(*keys):
+    """
+    Flags the first row of every run of identical keys.
+    Args:
+        *keys (np.ndarray): One or more equally sized, pre-sorted key arrays.
+    Returns:
+        np.ndarray: Boolean mask, True where a new segment begins.
+    """
+    n = len(keys[0])
+    starts = np.zeros(n, dtype=bool)
+    if n == 0:
+        return starts
+    starts[0] = True
+    for key in keys:
+        key = np.asarray(key)
+        starts[1:] |= key[1:] != key[:-1]
+    return starts
+
+
+def segment_positions(starts):
+    """
+    Returns the zero-based position of every row inside its segment.
+    """
+    idx = np.arange(len(starts))
+    first = np.maximum.accumulate(np.where(starts, idx, 0))
+    return idx - first
+
+
+def segment_shift(values, pos, periods=1):
+    """
+    Equivalent of ``groupby(...).shift(periods)`` for positive periods.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    out = np.full(len(values), np.nan)
+    if 0 < periods < len(values):
+        out[periods:] = values[:-periods]
+    out[pos < periods] = np.nan
+    return out
+
+
+def segment_lead(values, starts, periods=1):
+    """
+    Equivalent of ``groupby(...).shift(-periods)`` for positive periods:
+    the value `periods` rows later in the same segment, NaN past its end.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    seg = np.cumsum(starts)
+    out = np.full(len(values), np.nan)
+    if 0 < periods < len(values):
+        out[:-periods] = np.where(seg[periods:] == seg[:-periods], values[periods:], np.nan)
+    return out
+
+
+def segment_rolling_mean(values, pos, window, shift=1):
+    """
+    Equivalent of ``x.shift(shift).rolling(window).mean()`` per segment.
+
+    The window is summed directly from shifted copies rather than from a
+    running cumulative sum, so long histories do not lose precision.
+    """
+    total = np.zeros(len(values))
+    for k in range(shift, shift + window):
+        total += segment_shift(values, pos, k)
+    return total / window
+
+
+def segment_expanding_mean(values, pos, shift=1):
+    """
+    Equivalent of ``x.shift(shift).expanding().mean()`` per segment.
+
+    The running sums are a segmented scan: in pass d every row adds the
+    partial sum of the row d positions earlier in its own segment, for d =
+    1, 2, 4, ... So the sums take log2(longest segment) array operations,
+    and, unlike a global cumulative sum minus each segment's offset, a late
+    segment does not inherit the rounding error of every row before it.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    pos = np.asarray(pos)
+    within = values.copy()
+    step = 1
+    longest = int(pos.max()) + 1 if len(pos) else 0
+    while step < longest:
+        within[step:] += np.where(pos[step:] >= step, within[:-step], 0.0)
+        step *= 2
+    shifted = segment_shift(within, pos, shift)
+    count = (pos - shift + 1).astype(np.float64)
+    return shifted / np.where(count > 0, count, np.nan)
+
+
+def segment_recency(values, pos, shift=1):
+    """
+    Rows since the last positive value (0 on a purchase row), shifted per
+    segment. NaN until the first positive value of the segment.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    idx = np.arange(len(values))
+    first = idx - pos
+    last_buy = np.maximum.accumulate(np.where(values > 0, idx, -1))
+    recency = np.where(last_buy >= first, idx - last_buy, np.nan)
+    return segment_shift(recency, pos, shift)
+
+
+def group_sum(codes, values):
+    """
+    Sums ``values`` per integer group code and broadcasts the totals back
+    to every row, like ``groupby(...).transform("sum")``.
+    """
+    codes = np.asarray(codes)
+    totals = np.bincount(codes, weights=np.asarray(values, dtype=np.float64))
+    return totals[codes]
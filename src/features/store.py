@@ -0,0 +1,290 @@
+import pandas as pd
+import numpy as np
+import logging
+import bisect
+import joblib
+import os
+from . import kernels
+from .engineer import FEATURE_COLS, FEATURE_DTYPE
+
+KEY_COLS = ["customer_id", "product_unit_variant_id", "week_start"]
+
+# Longest look-back used by any feature (the 4-week rolling means)
+WINDOW = 4
+
+
+class _PairState:
+    """Running state of one (customer_id, product_unit_variant_id) pair."""
+    __slots__ = ("n", "qty_sum", "last_buy", "qty_tail", "vol_tail")
+
+    def __init__(self):
+        self.n = 0
+        self.qty_sum = 0.0
+        self.last_buy = -1
+        self.qty_tail = []
+        self.vol_tail = []
+
+
+class FeatureStore:
+    """
+    Persisted per-pair, per-customer and per-product state that turns newly
+    appended weeks into feature rows without recomputing the full history.
+
+    Rows are laid out in the same order `FeatureEngineer.engineer_features`
+    uses (customer, product, week), so customer features walk back through
+    the customer's earlier products and product features walk back through
+    the product's earlier customers. Only the last `WINDOW` quantities and
+    global volumes of each pair are kept.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.pairs = {}
+        self.customer_products = {}
+        self.product_customers = {}
+        self.last_week = None
+
+    def fit(self, history):
+        """
+        Builds the state from a full transaction history in one vectorized pass.
+        Args:
+            history (pd.DataFrame): Rows with customer_id, product_unit_variant_id,
+                week_start and qty_this_week.
+        Returns:
+            FeatureStore: self
+        """
+        self.logger.info(f"Building feature store from {len(history)} rows...")
+        self.pairs, self.customer_products, self.product_customers = {}, {}, {}
+        self.last_week = None
+        if len(history) == 0:
+            return self
+
+        df = history[KEY_COLS + ["qty_this_week"]].sort_values(KEY_COLS, kind="mergesort")
+        cust = df["customer_id"].to_numpy()
+        prod = df["product_unit_variant_id"].to_numpy()
+        qty = df["qty_this_week"].to_numpy(dtype=np.float64)
+        global_vol = self._global_volume(prod, df["week_start"], qty)
+
+        starts = kernels.segment_starts(cust, prod)
+        pos = kernels.segment_positions(starts)
+        seg = np.cumsum(starts) - 1
+        start_idx = np.flatnonzero(starts)
+        sizes = np.bincount(seg)
+        sums = np.add.reduceat(qty, start_idx)
+        last_buy = np.full(len(start_idx), -1)
+        bought = qty > 0
+        np.maximum.at(last_buy, seg[bought], pos[bought])
+
+        states = []
+        for i in start_idx:
+            state = _PairState()
+            self.pairs[(cust[i].item(), prod[i].item())] = state
+            states.append(state)
+        for s, state in enumerate(states):
+            state.n = int(sizes[s])
+            state.qty_sum = float(sums[s])
+            state.last_buy = int(last_buy[s])
+
+        keep = np.flatnonzero(pos >= sizes[seg] - WINDOW)
+        for i, q, v in zip(seg[keep], qty[keep], global_vol[keep]):
+            states[i].qty_tail.append(float(q))
+            states[i].vol_tail.append(float(v))
+
+        for c, p in self.pairs:
+            self.customer_products.setdefault(c, []).append(p)
+            self.product_customers.setdefault(p, []).append(c)
+        for neighbours in (self.customer_products, self.product_customers):
+            for values in neighbours.values():
+                values.sort()
+
+        self.last_week = df["week_start"].max()
+        return self
+
+    def transform(self, rows):
+        """
+        Computes feature rows for weeks later than the stored state without
+        changing it. Missing `qty_this_week` is treated as 0, like Test rows
+        in a full recompute.
+        Args:
+            rows (pd.DataFrame): New rows, all with week_start after `last_week`.
+        Returns:
+            pd.DataFrame: KEY_COLS + FEATURE_COLS, aligned to `rows`.
+        """
+        features, _ = self._process(rows)
+        return features
+
+    def append(self, rows):
+        """
+        Computes feature rows for newly observed weeks, then commits their
+        quantities to the state. Cost is proportional to len(rows).
+        Returns:
+            pd.DataFrame: KEY_COLS + FEATURE_COLS, aligned to `rows`.
+        """
+        features, commit = self._process(rows)
+        commit()
+        return features
+
+    def _global_volume(self, prod, week_start, qty):
+        """Total quantity per (product, week), broadcast to every row."""
+        prod_codes, _ = pd.factorize(prod)
+        week_codes, week_uniques = pd.factorize(week_start)
+        return kernels.group_sum(prod_codes * len(week_uniques) + week_codes, qty)
+
+    def _process(self, rows):
+        df = rows[KEY_COLS].reset_index(drop=True)
+        if "qty_this_week" in rows.columns:
+            df["qty_this_week"] = rows["qty_this_week"].to_numpy(dtype=np.float64)
+        else:
+            df["qty_this_week"] = 0.0
+        df["week_start"] = pd.to_datetime(df["week_start"])
+        if self.last_week is not None and len(df) and df["week_start"].min() <= self.last_week:
+            raise ValueError(
+                f"Feature store already holds weeks up to {self.last_week.date()}; "
+                f"new rows must be strictly later"
+            )
+        df = df.sort_values(KEY_COLS, kind="mergesort")
+
+        cust = df["customer_id"].to_numpy()
+        prod = df["product_unit_variant_id"].to_numpy()
+        qty = df["qty_this_week"].to_numpy(dtype=np.float64)
+        global_vol = self._global_volume(prod, df["week_start"], qty)
+
+        # Copy-on-write overlays of the neighbour lists touched by new pairs
+        customer_products, product_customers = {}, {}
+
+        def neighbours(overlay, committed, key):
+            if key not in overlay:
+                return committed.get(key, [])
+            return overlay[key]
+
+        def insert(overlay, committed, key, value):
+            if key not in overlay:
+                overlay[key] = list(committed.get(key, []))
+            bisect.insort(overlay[key], value)
+
+        # Extended tails: committed tail followed by every batch row of the pair
+        ext = {}
+        for c, p, q, v in zip(cust.tolist(), prod.tolist(), qty.tolist(), global_vol.tolist()):
+            key = (c, p)
+            if key not in ext:
+                state = self.pairs.get(key)
+                if state is None:
+                    state = _PairState()
+                    insert(customer_products, self.customer_products, c, p)
+                    insert(product_customers, self.product_customers, p, c)
+                ext[key] = (state, list(state.qty_tail), list(state.vol_tail), len(state.qty_tail))
+            ext[key][1].append(q)
+            ext[key][2].append(v)
+
+        def qty_tail(c, p):
+            return ext[(c, p)][1] if (c, p) in ext else self.pairs[(c, p)].qty_tail
+
+        def vol_tail(c, p):
+            return ext[(c, p)][2] if (c, p) in ext else self.pairs[(c, p)].vol_tail
+
+        out = np.full((len(df), len(FEATURE_COLS)), np.nan)
+        col = {name: i for i, name in enumerate(FEATURE_COLS)}
+        cursor = {}
+        running = {}
+        for r, (c, p) in enumerate(zip(cust.tolist(), prod.tolist())):
+            key = (c, p)
+            state, q_ext, _, offset = ext[key]
+            j = cursor.get(key, offset)
+            cursor[key] = j + 1
+            n, total, last_buy = running.get(key, (state.n, state.qty_sum, state.last_buy))
+
+            # Pair features
+            if n >= 1:
+                out[r, col["lag1"]] = q_ext[j - 1]
+                out[r, col["pair_buy_rate"]] = total / n
+                if last_buy >= 0:
+                    out[r, col["pair_recency"]] = (n - 1) - last_buy
+            if n >= 2:
+                out[r, col["lag2"]] = q_ext[j - 2]
+            if n >= WINDOW:
+                out[r, col["roll_mean_4"]] = self._window_mean(q_ext[j - WINDOW:j][::-1])
+            out[r, col["is_new_pair"]] = int(n == 0)
+
+            q = q_ext[j]
+            running[key] = (n + 1, total + q, n if q > 0 else last_buy)
+
+            # Customer momentum: previous rows in (product, week) order
+            products = neighbours(customer_products, self.customer_products, c)
+            prev = self._walk_back(products, p, q_ext[:j], lambda p2: qty_tail(c, p2))
+            self._fill_lag_roll(out[r], col["cust_lag1"], col["cust_roll_4"], prev)
+
+            # Global trend: previous rows in (customer, week) order for this product
+            customers = neighbours(product_customers, self.product_customers, p)
+            prev = self._walk_back(customers, c, ext[key][2][:j], lambda c2: vol_tail(c2, p))
+            self._fill_lag_roll(out[r], col["global_lag1"], col["global_roll_4"], prev)
+
+        features = df[KEY_COLS].copy()
+        # Stored like FeatureEngineer's columns, so both paths give the same values
+        for name, i in col.items():
+            features[name] = out[:, i].astype(FEATURE_DTYPE)
+        features["is_new_pair"] = features["is_new_pair"].astype(int)
+        features["month"] = features["week_start"].dt.month.fillna(0).astype(int)
+        features["week_of_year"] = features["week_start"].dt.isocalendar().week.fillna(0).astype(int)
+        features = features.sort_index()
+        features.index = rows.index
+
+        def commit():
+            for key, (state, q_ext, v_ext, offset) in ext.items():
+                n, total, last_buy = running[key]
+                state.n, state.qty_sum, state.last_buy = n, total, last_buy
+                state.qty_tail = q_ext[-WINDOW:]
+                state.vol_tail = v_ext[-WINDOW:]
+                self.pairs[key] = state
+            self.customer_products.update(customer_products)
+            self.product_customers.update(product_customers)
+            if len(df):
+                self.last_week = df["week_start"].max()
+
+        return features, commit
+
+    @staticmethod
+    def _walk_back(neighbours, key, own_values, tail_of):
+        """
+        Collects up to WINDOW values preceding a row, most recent first: the
+        row's own earlier values, then the tails of earlier neighbours.
+        """
+        prev = own_values[::-1][:WINDOW]
+        i = bisect.bisect_left(neighbours, key) - 1
+        while len(prev) < WINDOW and i >= 0:
+            prev.extend(tail_of(neighbours[i])[::-1][:WINDOW - len(prev)])
+            i -= 1
+        return prev
+
+    @staticmethod
+    def _window_mean(prev):
+        # Same summation order as kernels.segment_rolling_mean (most recent first)
+        total = 0.0
+        for v in prev:
+            total += v
+        return total / WINDOW
+
+    def _fill_lag_roll(self, row, lag_idx, roll_idx, prev):
+        if len(prev) >= 1:
+            row[lag_idx] = prev[0]
+        if len(prev) >= WINDOW:
+            row[roll_idx] = self._window_mean(prev[:WINDOW])
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.logger.info(f"Saving feature store to {path}")
+        joblib.dump({
+            "pairs": self.pairs,
+            "customer_products": self.customer_products,
+            "product_customers": self.product_customers,
+            "last_week": self.last_week,
+        }, path)
+
+    @classmethod
+    def load(cls, path):
+        state = joblib.load(path)
+        store = cls()
+        store.pairs = state["pairs"]
+        store.customer_products = state["customer_products"]
+        store.product_customers = state["product_customers"]
+        store.last_week = state["last_week"]
+        return store
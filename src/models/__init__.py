@@ -2,9 +2,19 @@
 Model Training and Inference components.
 
 Contains the Hybrid Ensemble logic (LGBM + CatBoost) for 5-seed training,
-as well as decoupled calibration and quantity thresholds for prediction.
+as well as decoupled calibration and quantity thresholds for prediction,
+a float32 feature matrix both model families read without converting it,
+a registry storing each model in its native format for lazy loading,
+a grid-search tuner of the post-processing on holdout predictions,
+a latency-aware selector of a reduced serving ensemble,
+and a micro-batcher that merges concurrent scoring calls for serving.
 """
 from .trainer import ModelTrainer
 from .predictor import ModelPredictor
+from .batcher import MicroBatcher
+from .registry import ModelRegistry
+from .tuner import PostprocessTuner
+from .selection import EnsembleSelector
 
-__all__ = ["ModelTrainer", "ModelPredictor"]
+__all__ = ["ModelTrainer", "ModelPredictor", "MicroBatcher", "ModelRegistry", "PostprocessTuner",
+           "EnsembleSelector"]
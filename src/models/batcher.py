@@ -0,0 +1,96 @@
+import numpy as np
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    """
+    Merges concurrent scoring calls into one matrix so the ensemble's per-call
+    overhead is paid once per batch rather than once per request.
+
+    Callers block in `submit` while a background thread waits up to
+    `window_ms` after the first queued request (or until `max_batch_size`
+    rows are queued), stacks the rows, runs `score_fn` once and hands each
+    caller back its own slice of the result.
+    """
+
+    def __init__(self, score_fn, window_ms=2.0, max_batch_size=256):
+        """
+        Args:
+            score_fn (callable): Maps an (n, n_features) array to a dict of
+                length-n arrays, e.g. the API's ensemble scorer.
+            window_ms (float): How long to wait for more requests after the first.
+            max_batch_size (int): Rows at which a batch is dispatched immediately.
+        """
+        self.score_fn = score_fn
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.batches = 0
+        self.rows = 0
+        self._queue = queue.Queue()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="MicroBatcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, X):
+        """
+        Queues an (n, n_features) array and blocks until it has been scored.
+        Returns:
+            dict: The `score_fn` outputs for these rows only.
+        """
+        if self._stopped.is_set():
+            raise RuntimeError("MicroBatcher is closed")
+        future = Future()
+        self._queue.put((X, future))
+        return future.result()
+
+    def close(self):
+        """Scores anything still queued, then stops the background thread."""
+        self._stopped.set()
+        self._queue.put(None)
+        self._thread.join()
+
+    def _collect(self):
+        """Blocks for the first request, then gathers more until the window closes."""
+        first = self._queue.get()
+        if first is None:
+            return []
+        batch, n_rows = [first], len(first[0])
+        deadline = time.perf_counter() + self.window
+        while n_rows < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)
+                break
+            batch.append(item)
+            n_rows += len(item[0])
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if not batch:
+                return
+            try:
+                out = self.score_fn(np.vstack([X for X, _ in batch]))
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            offset = 0
+            for X, future in batch:
+                future.set_result({k: v[offset:offset + len(X)] for k, v in out.items()})
+                offset += len(X)
+            self.batches += 1
+            self.rows += offset
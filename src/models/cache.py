@@ -0,0 +1,76 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class PredictionCache:
+    """
+    Thread-safe LRU cache of post-processed predictions with an optional TTL.
+
+    Keys identify everything a prediction depends on (the pair, the week its
+    features were built for, any supplied newer history and the model
+    version), so an entry never has to be invalidated individually: a new
+    week or model simply produces new keys. `clear` drops every entry at
+    once when models are reloaded, and the least recently used entry is
+    evicted once `max_size` is reached.
+    """
+
+    def __init__(self, max_size=100_000, ttl_s=None):
+        """
+        Args:
+            max_size (int): Entries kept before evicting the least recently used.
+            ttl_s (float): Seconds an entry stays valid; None keeps it until evicted.
+        """
+        self.max_size = max_size
+        self.ttl = ttl_s
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Returns:
+            The cached value, or None on a miss or an expired entry.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (self.ttl is None or now - entry[1] < self.ttl):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drops every entry, e.g. after the models are reloaded."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def snapshot(self):
+        with self._lock:
+            size, hits, misses, evictions = len(self._entries), self.hits, self.misses, self.evictions
+        lookups = hits + misses
+        return {
+            'size': size,
+            'max_size': self.max_size,
+            'hits': hits,
+            'misses': misses,
+            'evictions': evictions,
+            'hit_rate': round(hits / lookups, 4) if lookups else None,
+        }
@@ -0,0 +1,52 @@
+"""
+Feature drift between the rows an ensemble was fitted on and newer ones.
+
+A profile keeps each feature's quantile bin edges and the share of rows in
+every bin, small enough to live in the registry manifest. New rows are
+binned on the same edges and compared with the population stability index,
+sum((actual - expected) * ln(actual / expected)): below 0.1 is usually read
+as stable and above 0.25 as a shifted population.
+"""
+import numpy as np
+
+N_BINS = 10
+# Floor on bin shares so that empty bins do not make the index infinite
+MIN_SHARE = 1e-4
+
+
+def _values(frame, col):
+    values = frame[col].to_numpy(dtype=np.float64)
+    return values[~np.isnan(values)]
+
+
+def _shares(values, edges):
+    counts = np.bincount(np.searchsorted(edges, values, side='right'), minlength=len(edges) + 1)
+    return counts / max(len(values), 1)
+
+
+def feature_profile(frame, columns, n_bins=N_BINS):
+    """
+    Returns:
+        dict: Column mapped to {'edges': inner quantile edges, 'shares':
+            share of non-missing rows in each of the len(edges) + 1 bins}.
+    """
+    profile = {}
+    for col in columns:
+        values = _values(frame, col)
+        edges = np.unique(np.quantile(values, np.linspace(0, 1, n_bins + 1)[1:-1])) if len(values) else np.array([])
+        profile[col] = {'edges': edges.tolist(), 'shares': _shares(values, edges).tolist()}
+    return profile
+
+
+def population_stability(profile, frame):
+    """
+    Returns:
+        dict: Each profiled column mapped to the stability index of its
+            values in `frame` against the profile.
+    """
+    out = {}
+    for col, reference in profile.items():
+        expected = np.maximum(np.asarray(reference['shares']), MIN_SHARE)
+        actual = np.maximum(_shares(_values(frame, col), np.asarray(reference['edges'])), MIN_SHARE)
+        out[col] = float(np.sum((actual - expected) * np.log(actual / expected)))
+    return out
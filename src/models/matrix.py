@@ -0,0 +1,116 @@
+"""
+Feature matrices shared by both model families.
+
+Handing LightGBM and CatBoost a pandas frame makes each library convert it
+to its own array, on top of the copy `train[features]` already took. A
+`FeatureMatrix` is built once per dataset instead: one C-contiguous float32
+array in training column order, which LightGBM bins and scores without
+converting it again, and the categorical columns' integer codes, which
+CatBoost reads as categories (it rejects categorical values stored as
+floats). Features are float32 from feature engineering and categorical
+codes are small integers, so the float32 array holds them exactly.
+
+Rows that form one contiguous block are taken as views. `ModelTrainer`
+orders the rows as purchases in the first week only, in both weeks, in the
+second week only, then neither, so that each Tweedie regressor's positive
+rows are one block and `pos_1w` and `pos_2w` are slices of `all` rather
+than copies.
+"""
+import numpy as np
+from catboost import FeaturesData, Pool
+
+
+def _code_labels(codes):
+    """
+    Categorical codes as the UTF-8 bytes CatBoost hashes, the same string
+    it makes of an integer column. Each distinct code is encoded once and
+    gathered, so no object is created per row.
+    """
+    if not codes.size:
+        return np.empty(codes.shape, dtype=object)
+    low = int(codes.min())
+    labels = np.array([str(code).encode() for code in range(low, int(codes.max()) + 1)], dtype=object)
+    return labels[codes - low]
+
+
+class FeatureMatrix:
+    """
+    Features in training column order as one float32 array (`values`), with
+    the categorical columns, which must come last as CatBoost orders them,
+    also kept as int32 codes (`codes`).
+    Args:
+        values (np.ndarray): (rows, features) float32, C-contiguous.
+        codes (np.ndarray): (rows, categorical features) int32.
+        features (list): Column names, or None.
+        cat_indices (list): Positions of the categorical columns.
+    """
+
+    def __init__(self, values, codes, features, cat_indices):
+        n_features = values.shape[1]
+        self.cat_indices = [int(i) for i in cat_indices]
+        if self.cat_indices != list(range(n_features - len(self.cat_indices), n_features)):
+            raise ValueError(f"categorical features must be the last columns, got positions {self.cat_indices} "
+                             f"of {n_features}")
+        self.values = values
+        self.codes = codes
+        self.features = None if features is None else list(features)
+
+    @classmethod
+    def from_frame(cls, frame, features, cat_cols, order=None):
+        """
+        Copies `frame[features]` column by column into the float32 array, so
+        no float64 or mixed-dtype intermediate of the whole frame is made.
+        Args:
+            order (np.ndarray): Optional row positions to take, in order.
+        """
+        n_rows = len(frame) if order is None else len(order)
+        cat_indices = [features.index(col) for col in cat_cols]
+        values = np.empty((n_rows, len(features)), dtype=np.float32)
+        codes = np.empty((n_rows, len(cat_cols)), dtype=np.int32)
+        for j, col in enumerate(features):
+            column = frame[col].to_numpy()
+            values[:, j] = column if order is None else column[order]
+        for k, j in enumerate(cat_indices):
+            codes[:, k] = values[:, j]
+        return cls(values, codes, features, cat_indices)
+
+    @classmethod
+    def from_array(cls, X, cat_indices, features=None):
+        """A matrix over a 2-D array in training column order, e.g. an API request."""
+        values = np.ascontiguousarray(X, dtype=np.float32)
+        return cls(values, values[:, list(cat_indices)].astype(np.int32), features, cat_indices)
+
+    def __len__(self):
+        return self.values.shape[0]
+
+    @property
+    def nbytes(self):
+        """Bytes of the arrays this matrix owns; 0 for a view."""
+        return sum(a.nbytes for a in (self.values, self.codes) if a.base is None)
+
+    def rows(self, mask):
+        """
+        The rows where the boolean `mask` is true: a view of this matrix when
+        they form one contiguous block, a gathered copy otherwise.
+        """
+        selected = np.flatnonzero(np.asarray(mask, dtype=bool))
+        start, stop = (int(selected[0]), int(selected[-1]) + 1) if len(selected) else (0, 0)
+        if stop - start == len(selected):
+            block = slice(start, stop)
+            return FeatureMatrix(self.values[block], self.codes[block], self.features, self.cat_indices)
+        return FeatureMatrix(self.values[selected], self.codes[selected], self.features, self.cat_indices)
+
+    def pool(self, label=None):
+        """
+        A catboost.Pool reading the numerical block of `values` in place and
+        the categorical codes as categories.
+        """
+        n_num = self.values.shape[1] - len(self.cat_indices)
+        names = self.features
+        data = FeaturesData(
+            num_feature_data=self.values[:, :n_num],
+            cat_feature_data=_code_labels(self.codes) if self.cat_indices else None,
+            num_feature_names=None if names is None else names[:n_num],
+            cat_feature_names=None if names is None or not self.cat_indices else names[n_num:],
+        )
+        return Pool(data, label=label)
@@ -2,96 +2,259 @@ import pandas as pd
 import numpy as np
 import logging
 import os
+from src.models.matrix import FeatureMatrix
+from src.models.registry import _booster, truncated_rounds
+from src.models.trainer import MODEL_NAMES
+from src.monitoring.spans import span, traced
+
+
+def _accumulate(total, values):
+    """Adds one seed's predictions to a running sum, taking ownership of the first array."""
+    if total is None:
+        return np.array(values, dtype=np.float64)
+    total += values
+    return total
+
+
+def predict_model(name, model, X_lgb, cb_pool, round_fraction=None):
+    """
+    One model's predictions as the ensemble averages them: purchase
+    probabilities, or quantities clipped at 0. LightGBM is called through its
+    Booster to skip the sklearn wrapper's per-call validation; the outputs are
+    identical. With `round_fraction`, only that share of the model's trees is
+    evaluated.
+    """
+    cut = {}
+    if name.startswith('lgb'):
+        if round_fraction is not None:
+            cut['num_iteration'] = truncated_rounds(name, model, round_fraction)
+        pred = _booster(model).predict(X_lgb, **cut)
+    else:
+        if round_fraction is not None:
+            cut['ntree_end'] = truncated_rounds(name, model, round_fraction)
+        pred = model.predict_proba(cb_pool, **cut)[:, 1] if '_clf' in name else model.predict(cb_pool, **cut)
+    return pred if '_clf' in name else np.maximum(0, pred)
+
 
 class ModelPredictor:
     def __init__(self, config):
         self.config = config
         self.logger = logging.getLogger(self.__class__.__name__)
-        
+
         # Scaling parameters
         self.scale_p1 = config['scaling']['purchase_1w_scale']
         self.scale_p2 = config['scaling']['purchase_2w_scale']
         self.thresh_q1 = config['scaling']['qty_1w_threshold']
         self.thresh_q2 = config['scaling']['qty_2w_threshold']
-        
+
         # Ensemble weights
         self.w_lgb = config['ensemble']['lgbm_weight']
         self.w_cb = config['ensemble']['catboost_weight']
 
-    def predict(self, models, test, features):
+        # Rows per chunk for streamed inference; None scores Test in one pass
+        self.chunk_size = config['inference']['chunk_size']
+
+    def ensemble_inputs(self, models, X):
         """
-        Runs inference across all seeds and both model types,
-        then blends and applies decoupled post-processing.
+        Converts a feature matrix into the inputs both model families take
+        natively, so each of them is built once rather than once per model.
+        Both read the same float32 FeatureMatrix (src/models/matrix.py).
         Args:
             models (dict): Dict of model lists from ModelTrainer.
-            test (pd.DataFrame): The test dataframe with all feature columns.
-            features (list): The list of all feature column names used in training.
+            X (pd.DataFrame | np.ndarray): Features in training column order.
         Returns:
-            pd.DataFrame: The final submission dataframe.
+            tuple: (float32 array for LightGBM boosters, catboost.Pool)
         """
-        self.logger.info("Starting Ensemble Inference...")
-        
-        num_seeds = len(self.config['model']['seeds'])
-        
-        lgb_p1_all, lgb_p2_all = [], []
-        lgb_q1_all, lgb_q2_all = [], []
-        
-        cb_p1_all, cb_p2_all = [], []
-        cb_q1_all, cb_q2_all = [], []
-        
-        X_test = test[features]
-
-        self.logger.info(f"Predicting across {num_seeds} seeds...")
-        for i in range(num_seeds):
-            # LightGBM Predictions
-            lgb_p1_all.append(models['lgb_clf1'][i].predict_proba(X_test)[:, 1])
-            lgb_p2_all.append(models['lgb_clf2'][i].predict_proba(X_test)[:, 1])
-            lgb_q1_all.append(np.maximum(0, models['lgb_reg1'][i].predict(X_test)))
-            lgb_q2_all.append(np.maximum(0, models['lgb_reg2'][i].predict(X_test)))
-            
-            # CatBoost Predictions
-            cb_p1_all.append(models['cb_clf1'][i].predict_proba(X_test)[:, 1])
-            cb_p2_all.append(models['cb_clf2'][i].predict_proba(X_test)[:, 1])
-            cb_q1_all.append(np.maximum(0, models['cb_reg1'][i].predict(X_test)))
-            cb_q2_all.append(np.maximum(0, models['cb_reg2'][i].predict(X_test)))
-
-        self.logger.info("Averaging seed predictions...")
-        lgb_p1 = np.mean(lgb_p1_all, axis=0)
-        lgb_p2 = np.mean(lgb_p2_all, axis=0)
-        lgb_q1 = np.mean(lgb_q1_all, axis=0)
-        lgb_q2 = np.mean(lgb_q2_all, axis=0)
-        
-        cb_p1 = np.mean(cb_p1_all, axis=0)
-        cb_p2 = np.mean(cb_p2_all, axis=0)
-        cb_q1 = np.mean(cb_q1_all, axis=0)
-        cb_q2 = np.mean(cb_q2_all, axis=0)
+        cat_indices = models['cb_clf1'][0].get_cat_feature_indices()
+        if isinstance(X, pd.DataFrame):
+            columns = list(X.columns)
+            matrix = FeatureMatrix.from_frame(X, columns, [columns[i] for i in cat_indices])
+        else:
+            matrix = FeatureMatrix.from_array(X, cat_indices)
+        return matrix.values, matrix.pool()
+
+    def seed_means(self, models, X_lgb, cb_pool):
+        """
+        Runs every loaded seed of both model families and averages each head
+        over seeds. A reduced serving ensemble (`ModelRegistry.load` with a
+        selection) may load fewer seeds of one family than of the other and
+        evaluate only part of each model's trees.
+        Returns:
+            dict: Model name (e.g. 'lgb_clf1') mapped to its seed-mean array,
+                before blending.
+        """
+        # The loaded seeds, which may be a subset of config['model']['seeds']
+        counts = {name: len(models[name]) for name in MODEL_NAMES}
+        fractions = {name: getattr(models[name], 'round_fraction', None) for name in MODEL_NAMES}
+
+        # Running per-seed sums instead of lists of arrays; summing in seed
+        # order and dividing once matches np.mean over the stacked seeds.
+        sums = dict.fromkeys(MODEL_NAMES)
 
+        for i in range(max(counts.values())):
+            for name in MODEL_NAMES:
+                if i < counts[name]:
+                    sums[name] = _accumulate(
+                        sums[name], predict_model(name, models[name][i], X_lgb, cb_pool, fractions[name])
+                    )
+
+        return {name: total / counts[name] for name, total in sums.items()}
+
+    def blend(self, means):
+        """
+        Weights the LightGBM and CatBoost seed means of each head.
+        Returns:
+            tuple: Blended raw (p1, p2, q1, q2) arrays before post-processing.
+        """
+        raw_p1 = (means['lgb_clf1'] * self.w_lgb) + (means['cb_clf1'] * self.w_cb)
+        raw_p2 = (means['lgb_clf2'] * self.w_lgb) + (means['cb_clf2'] * self.w_cb)
+        raw_q1 = (means['lgb_reg1'] * self.w_lgb) + (means['cb_reg1'] * self.w_cb)
+        raw_q2 = (means['lgb_reg2'] * self.w_lgb) + (means['cb_reg2'] * self.w_cb)
+        return raw_p1, raw_p2, raw_q1, raw_q2
+
+    def predict_raw(self, models, X_lgb, cb_pool):
+        """
+        Runs every seed of both model families and blends them.
+        Returns:
+            tuple: Blended raw (p1, p2, q1, q2) arrays before post-processing.
+        """
+        return self.blend(self.seed_means(models, X_lgb, cb_pool))
+
+    @traced("predict_means", rows=lambda means: len(means['lgb_clf1']))
+    def predict_means(self, models, test, features):
+        """
+        Seed means of every head over all of `test`, scored in
+        `inference.chunk_size` row chunks when set. These are what the
+        pipeline checkpoints, so blending and post-processing can be retuned
+        without re-running the models.
+        Returns:
+            dict: Model name mapped to its seed-mean array.
+        """
+        chunk_size = self.chunk_size or max(len(test), 1)
+        chunks = [
+            self.seed_means(models, *self.ensemble_inputs(models, test.iloc[start:start + chunk_size][features]))
+            for start in range(0, len(test), chunk_size)
+        ]
+        return {name: np.concatenate([chunk[name] for chunk in chunks]) for name in MODEL_NAMES}
+
+    @traced("write_submission", rows=lambda n_rows: n_rows)
+    def write_submission(self, ids, means):
+        """
+        Blends and post-processes precomputed seed means and writes the
+        submission, producing the same file as `predict`. With
+        `inference.chunk_size`, rows are post-processed and appended to the
+        file one chunk at a time, as in `predict_streaming`.
+        Args:
+            ids (pd.Series): The Test ID column, in the order of `means`.
+            means (dict): Output of `predict_means`.
+        Returns:
+            int: Number of rows written.
+        """
         self.logger.info(f"Blending LGBM ({self.w_lgb}) and CatBoost ({self.w_cb})...")
-        raw_p1 = (lgb_p1 * self.w_lgb) + (cb_p1 * self.w_cb)
-        raw_p2 = (lgb_p2 * self.w_lgb) + (cb_p2 * self.w_cb)
-        raw_q1 = (lgb_q1 * self.w_lgb) + (cb_q1 * self.w_cb)
-        raw_q2 = (lgb_q2 * self.w_lgb) + (cb_q2 * self.w_cb)
+        ids = pd.Series(ids).reset_index(drop=True)
+        chunk_size = self.chunk_size or max(len(ids), 1)
 
-        self.logger.info("Applying Decoupled Post-Processing...")
-        submission = test[["ID"]].copy().reset_index(drop=True)
+        out_path = self.config['paths']['submission_file']
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        with open(out_path, 'w', newline='') as f:
+            for start in range(0, len(ids), chunk_size):
+                chunk = {name: values[start:start + chunk_size] for name, values in means.items()}
+                submission = pd.DataFrame({"ID": ids.iloc[start:start + chunk_size]}).reset_index(drop=True)
+                for col, values in self.postprocess(*self.blend(chunk)).items():
+                    submission[col] = values
+                submission.to_csv(f, header=start == 0, index=False)
+        self.logger.info(f"✅ Submission saved to {out_path}")
+        return len(ids)
 
+    def postprocess(self, raw_p1, raw_p2, raw_q1, raw_q2):
+        """
+        Applies the decoupled scaling and quantity thresholds.
+        Returns:
+            dict: Submission target columns mapped to arrays.
+        """
+        out = {}
         # STEP A: Purchase probability — scale aggressively for AUC ranking
-        submission["Target_purchase_next_1w"] = np.clip(raw_p1 * self.scale_p1, 0, 1)
-        submission["Target_purchase_next_2w"] = np.clip(raw_p2 * self.scale_p2, 0, 1)
+        out["Target_purchase_next_1w"] = np.clip(raw_p1 * self.scale_p1, 0, 1)
+        out["Target_purchase_next_2w"] = np.clip(raw_p2 * self.scale_p2, 0, 1)
 
         # STEP B: Quantity — expected value, forcing low-confidence rows to 0
         qty_1 = raw_p1 * raw_q1
         qty_1 = np.where(raw_p1 < self.thresh_q1, 0, qty_1)   # avoid indexing issues
-        submission["Target_qty_next_1w"] = np.clip(qty_1, a_min=0, a_max=None)
+        out["Target_qty_next_1w"] = np.clip(qty_1, a_min=0, a_max=None)
 
         qty_2 = raw_p2 * raw_q2
         qty_2 = np.where(raw_p2 < self.thresh_q2, 0, qty_2)
-        submission["Target_qty_next_2w"] = np.clip(qty_2, a_min=0, a_max=None)
+        out["Target_qty_next_2w"] = np.clip(qty_2, a_min=0, a_max=None)
+        return out
+
+    @traced("predict", rows=len)
+    def predict(self, models, test, features):
+        """
+        Runs inference across all seeds and both model types,
+        then blends and applies decoupled post-processing.
+        Args:
+            models (dict): Dict of model lists from ModelTrainer.
+            test (pd.DataFrame): The test dataframe with all feature columns.
+            features (list): The list of all feature column names used in training.
+        Returns:
+            pd.DataFrame: The final submission dataframe.
+        """
+        self.logger.info("Starting Ensemble Inference...")
+
+        with span("inputs", rows=len(test)):
+            X_lgb, cb_pool = self.ensemble_inputs(models, test[features])
+
+        self.logger.info(f"Predicting across {len(self.config['model']['seeds'])} seeds...")
+        self.logger.info(f"Blending LGBM ({self.w_lgb}) and CatBoost ({self.w_cb})...")
+        with span("ensemble", rows=len(test)):
+            raw = self.predict_raw(models, X_lgb, cb_pool)
+
+        self.logger.info("Applying Decoupled Post-Processing...")
+        with span("postprocess", rows=len(test)):
+            submission = test[["ID"]].copy().reset_index(drop=True)
+            for col, values in self.postprocess(*raw).items():
+                submission[col] = values
 
         # Save submission
         out_path = self.config['paths']['submission_file']
         os.makedirs(os.path.dirname(out_path), exist_ok=True)
-        submission.to_csv(out_path, index=False)
+        with span("write", rows=len(submission)):
+            submission.to_csv(out_path, index=False)
         self.logger.info(f"✅ Submission saved to {out_path}")
-        
+
         return submission
+
+    @traced("predict_streaming", rows=lambda n_rows: n_rows)
+    def predict_streaming(self, models, test, features, chunk_size=None):
+        """
+        Scores `test` in fixed-size row chunks and appends each chunk's
+        post-processed targets to the submission file, so peak memory follows
+        the chunk size rather than the number of rows. The file is identical
+        to the one written by `predict`.
+        Args:
+            models (dict): Dict of model lists from ModelTrainer.
+            test (pd.DataFrame): The test dataframe with all feature columns.
+            features (list): The list of all feature column names used in training.
+            chunk_size (int): Rows per chunk; defaults to `inference.chunk_size`.
+        Returns:
+            int: Number of rows written.
+        """
+        chunk_size = chunk_size or self.chunk_size
+        if not chunk_size or chunk_size < 1:
+            raise ValueError(f"chunk_size must be a positive integer, got {chunk_size!r}")
+
+        out_path = self.config['paths']['submission_file']
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        self.logger.info(f"Streaming inference over {len(test)} rows in chunks of {chunk_size}...")
+
+        with open(out_path, 'w', newline='') as f:
+            for start in range(0, len(test), chunk_size):
+                chunk = test.iloc[start:start + chunk_size]
+                raw = self.predict_raw(models, *self.ensemble_inputs(models, chunk[features]))
+                submission = chunk[["ID"]].reset_index(drop=True)
+                for col, values in self.postprocess(*raw).items():
+                    submission[col] = values
+                submission.to_csv(f, header=start == 0, index=False)
+
+        self.logger.info(f"✅ Submission saved to {out_path}")
+        return len(test)
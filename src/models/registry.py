@@ -0,0 +1,299 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import lightgbm as lgb
+from catboost import CatBoostClassifier, CatBoostRegressor
+
+# Bump when the manifest layout or file formats change
+REGISTRY_VERSION = 1
+MANIFEST = 'manifest.json'
+HOLDOUT = 'holdout.npz'
+SELECTION = 'selection.json'
+ENSEMBLE_DIR = 'hybrid_ensemble'
+
+
+def config_hash(config):
+    """Hash of the config sections that determine the fitted models."""
+    sections = {key: config[key] for key in ('environment', 'model', 'catboost')}
+    return hashlib.sha256(json.dumps(sections, sort_keys=True).encode()).hexdigest()
+
+
+def _booster(model):
+    """LightGBM entries are native Boosters when trained on shared Datasets, sklearn estimators otherwise."""
+    return getattr(model, 'booster_', model)
+
+
+def n_rounds(name, model):
+    """Boosting rounds a fitted model predicts with: its best iteration after early stopping, else all of them."""
+    if name.startswith('lgb'):
+        booster = _booster(model)
+        # Boosters read from a model file report best_iteration -1, not 0
+        return booster.best_iteration if booster.best_iteration > 0 else booster.current_iteration()
+    return model.tree_count_
+
+
+def _load_model(name, path):
+    if name.startswith('lgb'):
+        return lgb.Booster(model_file=path)
+    model = CatBoostClassifier() if '_clf' in name else CatBoostRegressor()
+    return model.load_model(path, format='cbm')
+
+
+def truncated_rounds(name, model, fraction):
+    """
+    Boosting rounds a model keeps when cut to `fraction` of its own, at least one.
+    Raises:
+        ValueError: If the model reports no rounds to cut.
+    """
+    rounds = n_rounds(name, model)
+    if rounds < 1:
+        raise ValueError(f"{name} reports {rounds} boosting rounds; cannot keep {fraction:.0%} of them")
+    return max(1, int(round(fraction * rounds)))
+
+
+class LazyModels(Sequence):
+    """
+    Seed models of one head, each read from its native file on first access.
+    `round_fraction` asks the predictor to use only that share of each
+    model's trees.
+    """
+
+    def __init__(self, name, paths, round_fraction=None):
+        self.name = name
+        self.paths = list(paths)
+        self.round_fraction = round_fraction
+        self._models = [None] * len(self.paths)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        model = self._models[i]
+        if model is None:
+            with self._lock:
+                model = self._models[i]
+                if model is None:
+                    model = self._models[i] = _load_model(self.name, self.paths[i])
+        return model
+
+    @property
+    def n_loaded(self):
+        return sum(model is not None for model in self._models)
+
+
+class ModelRegistry:
+    """
+    The trained ensemble stored as one native file per model plus a JSON
+    manifest, replacing the single joblib pickle:
+
+        hybrid_ensemble/
+            manifest.json          # features, categoricals, encoders, seeds, rounds, config hash, lineage
+            holdout.npz            # optional seed-mean holdout predictions and labels, for tuning
+            selection.json         # optional reduced serving ensemble, from main.py --mode select
+            lgb_clf1_seed42.txt    # LightGBM model text
+            cb_clf1_seed42.cbm     # CatBoost binary model
+            ...
+
+    `load` returns the same {model name: [one model per seed]} layout the
+    predictor takes, reading each model on first use (or all of them up
+    front on a thread pool), optionally for a subset of the seeds or the
+    reduced ensemble of a saved selection.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    @classmethod
+    def for_config(cls, config):
+        """The registry the pipeline publishes and the API serves from."""
+        return cls(os.path.join(config['paths']['model_dir'], ENSEMBLE_DIR))
+
+    def exists(self):
+        return os.path.exists(os.path.join(self.directory, MANIFEST))
+
+    def manifest(self):
+        with open(os.path.join(self.directory, MANIFEST)) as f:
+            manifest = json.load(f)
+        if manifest.get('version') != REGISTRY_VERSION:
+            raise ValueError(f"Unsupported model registry version {manifest.get('version')} in {self.directory}")
+        return manifest
+
+    def model_version(self, selection=None):
+        """
+        Digest of the manifest, which changes whenever a new ensemble is
+        published, and of the selection served from it, if any.
+        """
+        digest = hashlib.sha256()
+        with open(os.path.join(self.directory, MANIFEST), 'rb') as f:
+            digest.update(f.read())
+        if selection is not None:
+            digest.update(json.dumps(selection, sort_keys=True).encode())
+        return digest.hexdigest()[:16]
+
+    def encoders(self):
+        """The categorical classes the models were trained with, or {} if none were stored."""
+        return self.manifest().get('encoders', {})
+
+    def run_key(self):
+        """The pipeline key the registry was published under, or None."""
+        return self.manifest().get('run_key') if self.exists() else None
+
+    def holdout_predictions(self):
+        """
+        The holdout predictions saved with the ensemble, or None if it was
+        trained without a holdout.
+        Returns:
+            dict: {'means': {model name: seed-mean array},
+                'labels': {'buy_1w', 'buy_2w', 'qty_1w', 'qty_2w': array}}
+        """
+        filename = self.manifest().get('holdout')
+        if not filename:
+            return None
+        with np.load(os.path.join(self.directory, filename)) as saved:
+            out = {'means': {}, 'labels': {}}
+            for key in saved.files:
+                group, name = key.split('_', 1)
+                out[group][name] = saved[key]
+        return out
+
+    def save_selection(self, selection):
+        """
+        Stores a reduced serving ensemble of the published models. Publishing
+        a new ensemble replaces the directory and so drops it.
+        Args:
+            selection (dict): 'seeds' and 'round_fraction' per model family
+                ('lgb', 'cb'), plus whatever measurements justify them.
+        """
+        tmp = os.path.join(self.directory, f"{SELECTION}.tmp")
+        with open(tmp, 'w') as f:
+            json.dump({**selection, 'model_version': self.model_version()}, f, indent=2)
+        os.replace(tmp, os.path.join(self.directory, SELECTION))
+        self.logger.info(f"Saved serving selection to {self.directory}")
+
+    def selection(self):
+        """The saved selection of the published models, or None."""
+        path = os.path.join(self.directory, SELECTION)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            selection = json.load(f)
+        if selection.get('model_version') != self.model_version():
+            self.logger.warning(f"Ignoring {path}: it was selected from another ensemble")
+            return None
+        return selection
+
+    def save(self, models, config, run_key=None, encoders=None, validation=None, holdout=None, lineage=None,
+             feature_profile=None):
+        """
+        Writes every model in its native format and the manifest. Files are
+        staged in a sibling directory and swapped in once complete.
+        Args:
+            models (dict): Dict of model lists from ModelTrainer.
+            config (dict): Pipeline config; provides the seeds and config hash.
+            run_key (str): Optional identifier of the run that produced the models.
+            encoders (dict): Optional categorical column mapped to its classes,
+                in code order, so raw categories can be encoded at serving time.
+            validation (dict): Optional holdout report from ModelTrainer.
+            holdout (dict): Optional holdout predictions from ModelTrainer,
+                read back by `holdout_predictions`.
+            lineage (dict): Optional record of the full fit and incremental
+                updates the models went through, from ModelTrainer.
+            feature_profile (dict): Optional feature distribution of the full
+                fit's rows, against which later weeks are checked for drift.
+        Returns:
+            dict: The manifest.
+        """
+        seeds = list(config['model']['seeds'])
+        features = list(_booster(models['lgb_clf1'][0]).feature_name())
+        cat_indices = models['cb_clf1'][0].get_cat_feature_indices()
+
+        staging = f"{self.directory}.tmp"
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        files = {}
+        for name in models:
+            files[name] = []
+            for seed, model in zip(seeds, models[name]):
+                if name.startswith('lgb'):
+                    filename = f"{name}_seed{seed}.txt"
+                    _booster(model).save_model(os.path.join(staging, filename))
+                else:
+                    filename = f"{name}_seed{seed}.cbm"
+                    model.save_model(os.path.join(staging, filename), format='cbm')
+                files[name].append(filename)
+        if holdout:
+            np.savez(os.path.join(staging, HOLDOUT),
+                     **{f"{group}_{name}": values for group in ('means', 'labels')
+                        for name, values in holdout[group].items()})
+
+        manifest = {
+            'version': REGISTRY_VERSION,
+            'run_key': run_key,
+            'config_hash': config_hash(config),
+            'seeds': seeds,
+            'features': features,
+            'cat_cols': [features[i] for i in cat_indices],
+            'encoders': {col: list(classes) for col, classes in (encoders or {}).items()},
+            'models': files,
+            'rounds': {name: [n_rounds(name, model) for model in models[name]] for name in models},
+            'validation': validation,
+            'holdout': HOLDOUT if holdout else None,
+            'lineage': lineage,
+            'feature_profile': feature_profile,
+        }
+        with open(os.path.join(staging, MANIFEST), 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+        retired = f"{self.directory}.old"
+        shutil.rmtree(retired, ignore_errors=True)
+        if os.path.exists(self.directory):
+            os.replace(self.directory, retired)
+        os.replace(staging, self.directory)
+        shutil.rmtree(retired, ignore_errors=True)
+        self.logger.info(f"Saved {sum(len(v) for v in files.values())} models to {self.directory}")
+        return manifest
+
+    def load(self, seeds=None, lazy=True, max_workers=1, selection=None):
+        """
+        Args:
+            seeds (list): Seeds to load, e.g. a subset when memory is tight;
+                None loads every seed. Predictions average the loaded seeds.
+            lazy (bool): Read each model on first use instead of now.
+            max_workers (int): Threads reading models when not lazy.
+            selection (dict): A saved `selection()`; its per-family seeds
+                and round fractions replace `seeds`.
+        Returns:
+            dict: Model name mapped to a sequence of per-seed models.
+        """
+        manifest = self.manifest()
+        seeds = manifest['seeds'] if seeds is None else list(seeds)
+        family_seeds = selection['seeds'] if selection else {'lgb': seeds, 'cb': seeds}
+        fractions = selection['round_fraction'] if selection else {}
+        unknown = set().union(*family_seeds.values()) - set(manifest['seeds'])
+        if unknown:
+            raise ValueError(f"Seeds {sorted(unknown)} are not in the registry (has {manifest['seeds']})")
+
+        models = {}
+        for name in manifest['models']:
+            family = name.split('_', 1)[0]
+            paths = [os.path.join(self.directory, manifest['models'][name][manifest['seeds'].index(seed)])
+                     for seed in family_seeds[family]]
+            models[name] = LazyModels(name, paths, round_fraction=fractions.get(family))
+        if not lazy:
+            jobs = [(name, i) for name in models for i in range(len(models[name]))]
+            with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+                list(pool.map(lambda job: models[job[0]][job[1]], jobs))
+        counts = ", ".join(f"{len(family_seeds[f])} {f} seeds" for f in ('lgb', 'cb'))
+        self.logger.info(f"{'Opened' if lazy else 'Loaded'} {counts} x {len(models) // 2} models "
+                         f"from {self.directory}")
+        return models
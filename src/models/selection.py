@@ -0,0 +1,204 @@
+"""
+Latency-aware selection of a reduced serving ensemble.
+
+Every head of the published ensemble averages all seeds of both families at
+full depth. `EnsembleSelector` scores each seed model on a labelled holdout
+at several shares of its trees (`selection.round_fractions`) and times it on
+batches the size the API scores, then picks the number of seeds and trees per
+family with the best holdout objective whose estimated scoring time fits
+`selection.latency_budget_ms`:
+
+    python main.py --mode select
+
+The selection is saved next to the models (`selection.json`) and served with
+`serving.models.selection: true`.
+"""
+import logging
+import time
+import numpy as np
+from src.models.predictor import ModelPredictor, predict_model
+from src.models.trainer import MODEL_NAMES
+from src.models.tuner import PostprocessTuner
+
+FAMILIES = ('lgb', 'cb')
+
+
+def median_ms(fn, repeats):
+    """Median wall time of `repeats` calls of `fn`, in milliseconds."""
+    times = []
+    for _ in range(max(1, repeats)):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times) * 1000)
+
+
+def _heads(family):
+    return [name for name in MODEL_NAMES if name.split('_', 1)[0] == family]
+
+
+class EnsembleSelector:
+    """
+    Trades holdout accuracy against scoring time. The objective is the
+    tuner's (`tuning.auc_weight`) under the configured `ensemble` weights and
+    `scaling`. Each family's seeds are ranked greedily by the objective they
+    add; a candidate takes the first k of them at one round fraction, and
+    its latency is estimated as the input conversion plus the measured cost
+    of each seed it keeps.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.logger = logging.getLogger(self.__class__.__name__)
+        selection = config['selection']
+        self.budget_ms = selection['latency_budget_ms']
+        self.batch_rows = selection['batch_rows']
+        self.repeats = selection['repeats']
+        # Full depth is always a candidate and the reference for ranking seeds
+        self.fractions = sorted({float(f) for f in selection['round_fractions']} | {1.0})
+        self.predictor = ModelPredictor(config)
+        self.tuner = PostprocessTuner(config)
+
+    def score(self, means, labels):
+        return self.tuner.score({'means': means, 'labels': labels}, self.config['ensemble'], self.config['scaling'])
+
+    def predictions(self, models, X):
+        """
+        Every seed model's holdout predictions at every round fraction.
+        Returns:
+            dict: (model name, seed position, fraction) mapped to an array.
+        """
+        X_lgb, cb_pool = self.predictor.ensemble_inputs(models, X)
+        return {
+            (name, i, fraction): predict_model(name, models[name][i], X_lgb, cb_pool, fraction)
+            for name in MODEL_NAMES for i in range(len(models[name])) for fraction in self.fractions
+        }
+
+    def latencies(self, models, X):
+        """
+        Median time to convert `X` into both families' inputs, and to score
+        it with one seed of a family (its four heads) at each round fraction,
+        averaged over that family's seeds.
+        Returns:
+            tuple: (inputs ms, {(family, fraction): ms per seed})
+        """
+        X_lgb, cb_pool = self.predictor.ensemble_inputs(models, X)
+        inputs_ms = median_ms(lambda: self.predictor.ensemble_inputs(models, X), self.repeats)
+        cost = {}
+        for family in FAMILIES:
+            heads = _heads(family)
+            for fraction in self.fractions:
+                cost[(family, fraction)] = float(np.mean([
+                    median_ms(lambda: [predict_model(name, models[name][i], X_lgb, cb_pool, fraction)
+                                       for name in heads], self.repeats)
+                    for i in range(len(models[heads[0]]))
+                ]))
+        return inputs_ms, cost
+
+    def _means(self, preds, picks):
+        """Seed means of every head for {family: (seed positions, fraction)}."""
+        return {
+            name: np.mean([preds[(name, i, picks[family][1])] for i in picks[family][0]], axis=0)
+            for family in FAMILIES for name in _heads(family)
+        }
+
+    def seed_order(self, preds, labels, family, fraction, n_seeds):
+        """
+        Seed positions of `family` at `fraction`, each adding the most
+        objective to those before it, with the other family at full size.
+        Returns:
+            tuple: (positions, objective after each one)
+        """
+        full = {f: (list(range(n_seeds)), 1.0) for f in FAMILIES}
+        order, objectives = [], []
+        while len(order) < n_seeds:
+            scored = [
+                (self.score(self._means(preds, {**full, family: (order + [i], fraction)}), labels)['objective'], -i)
+                for i in range(n_seeds) if i not in order
+            ]
+            objective, neg_i = max(scored)
+            order.append(-neg_i)
+            objectives.append(objective)
+        return order, objectives
+
+    def select(self, registry, holdout, features, sample):
+        """
+        Args:
+            registry (ModelRegistry): The published ensemble to reduce.
+            holdout (pd.DataFrame): Labelled rows, with target columns, that
+                the models were not fitted on.
+            features (list): Training column order.
+            sample (pd.DataFrame): Rows to time, e.g. Test; the first
+                `selection.batch_rows` are scored per call.
+        Returns:
+            dict: The selection for `ModelRegistry.save_selection`: 'seeds'
+                and 'round_fraction' per family, with the estimated and
+                measured latency and holdout metrics of it and of the full
+                ensemble.
+        """
+        seeds = registry.manifest()['seeds']
+        models = registry.load(lazy=False)
+        n_seeds = len(seeds)
+        labels = {
+            'buy_1w': holdout["target_buy_1w"].to_numpy(dtype=np.float64),
+            'buy_2w': holdout["target_buy_2w"].to_numpy(dtype=np.float64),
+            'qty_1w': holdout["target_qty_1w"].to_numpy(dtype=np.float64),
+            'qty_2w': holdout["target_qty_2w"].to_numpy(dtype=np.float64),
+        }
+        batch = sample.iloc[:self.batch_rows][features]
+
+        self.logger.info(f"Scoring {len(MODEL_NAMES) * n_seeds} models at round fractions {self.fractions} "
+                         f"on {len(holdout)} holdout rows...")
+        preds = self.predictions(models, holdout[features])
+        inputs_ms, cost = self.latencies(models, batch)
+        orders = {(family, fraction): self.seed_order(preds, labels, family, fraction, n_seeds)
+                  for family in FAMILIES for fraction in self.fractions}
+
+        # Every (k seeds, fraction) per family whose estimated time fits the budget
+        candidates = []
+        for f_lgb in self.fractions:
+            for f_cb in self.fractions:
+                for k_lgb in range(1, n_seeds + 1):
+                    for k_cb in range(1, n_seeds + 1):
+                        estimate = inputs_ms + k_lgb * cost[('lgb', f_lgb)] + k_cb * cost[('cb', f_cb)]
+                        candidates.append((estimate, {'lgb': (k_lgb, f_lgb), 'cb': (k_cb, f_cb)}))
+        feasible = [c for c in candidates if c[0] <= self.budget_ms]
+        if not feasible:
+            feasible = [min(candidates, key=lambda c: c[0])]
+            self.logger.warning(f"No ensemble fits {self.budget_ms} ms (fastest takes {feasible[0][0]:.2f} ms); "
+                                f"selecting the fastest")
+
+        best = None
+        for estimate, choice in feasible:
+            picks = {f: (orders[(f, choice[f][1])][0][:choice[f][0]], choice[f][1]) for f in FAMILIES}
+            scores = self.score(self._means(preds, picks), labels)
+            key = (round(scores['objective'], 12), -estimate)
+            if best is None or key > best[0]:
+                best = (key, estimate, picks, scores)
+        _, estimate, picks, scores = best
+        full_scores = self.score(self._means(preds, {f: (list(range(n_seeds)), 1.0) for f in FAMILIES}), labels)
+
+        selection = {
+            'seeds': {f: [seeds[i] for i in picks[f][0]] for f in FAMILIES},
+            'round_fraction': {f: picks[f][1] for f in FAMILIES},
+            'latency_budget_ms': self.budget_ms,
+            'batch_rows': len(batch),
+            'seed_gains': {f: orders[(f, 1.0)][1] for f in FAMILIES},
+        }
+        measured = {}
+        for label, chosen in (('selected', selection), ('full', None)):
+            served = registry.load(lazy=False, selection=chosen)
+            measured[label] = median_ms(
+                lambda: self.predictor.seed_means(served, *self.predictor.ensemble_inputs(served, batch)),
+                self.repeats,
+            )
+        selection['latency_ms'] = {'estimated': round(estimate, 3), **{k: round(v, 3) for k, v in measured.items()}}
+        selection['holdout'] = {'selected': scores, 'full': full_scores}
+
+        self.logger.info(
+            f"Selected {len(picks['lgb'][0])} LGBM seeds at {picks['lgb'][1]:.0%} of their trees and "
+            f"{len(picks['cb'][0])} CatBoost seeds at {picks['cb'][1]:.0%}: {measured['selected']:.2f} ms vs "
+            f"{measured['full']:.2f} ms per {len(batch)}-row call, objective {scores['objective']:.5f} vs "
+            f"{full_scores['objective']:.5f}"
+        )
+        return selection
@@ -4,15 +4,253 @@ import pandas as pd
 import numpy as np
 import logging
 import gc
-import joblib
 import os
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from sklearn.metrics import mean_absolute_error, roc_auc_score
+from src.models.drift import feature_profile, population_stability
+from src.models.matrix import FeatureMatrix
+from src.models.registry import ModelRegistry, _booster, config_hash, n_rounds
+from src.monitoring.spans import span, traced
+
+MODEL_NAMES = ['lgb_clf1', 'lgb_clf2', 'lgb_reg1', 'lgb_reg2', 'cb_clf1', 'cb_clf2', 'cb_reg1', 'cb_reg2']
+
+# Feature matrix and label each model head is fitted on
+MODEL_TARGETS = {'clf1': 'buy_1w', 'clf2': 'buy_2w', 'reg1': 'qty_1w_pos', 'reg2': 'qty_2w_pos'}
+TARGET_MATRIX = {'buy_1w': 'all', 'buy_2w': 'all', 'qty_1w_pos': 'pos_1w', 'qty_2w_pos': 'pos_2w'}
+
+# Weeks at the end of Train whose targets are not fully observed
+LABEL_HORIZON = 2
+
+# Calendar features move with every new week by design, so they are not checked for drift
+DRIFT_EXEMPT = ['month', 'week_of_year']
+
+LGB_OBJECTIVES = {
+    'lgb_clf1': {'objective': 'binary'},
+    'lgb_clf2': {'objective': 'binary'},
+    'lgb_reg1': {'objective': 'tweedie', 'tweedie_variance_power': 1.3},
+    'lgb_reg2': {'objective': 'tweedie', 'tweedie_variance_power': 1.6},
+}
+
+# Training data shared with pool workers, set once per process by _init_worker
+_WORKER_DATA = None
+# Binned Datasets / quantized Pools built lazily in each worker
+_WORKER_CACHE = {}
+
+
+def _init_worker(data):
+    global _WORKER_DATA
+    _WORKER_DATA = data
+
+
+def _build_model(name, seed, lgb_params, cb_params):
+    """Creates the unfitted estimator for one (model name, seed) job."""
+    if name.startswith('lgb'):
+        lgb_p = lgb_params.copy()
+        lgb_p['random_state'] = seed
+        if name == 'lgb_reg1':
+            return lgb.LGBMRegressor(objective="tweedie", tweedie_variance_power=1.3, **lgb_p)
+        if name == 'lgb_reg2':
+            return lgb.LGBMRegressor(objective="tweedie", tweedie_variance_power=1.6, **lgb_p)
+        return lgb.LGBMClassifier(**lgb_p)
+
+    cb_p = cb_params.copy()
+    cb_p['random_seed'] = seed
+    if name == 'cb_reg1':
+        return CatBoostRegressor(**cb_p, loss_function='Tweedie:variance_power=1.3')
+    if name == 'cb_reg2':
+        return CatBoostRegressor(**cb_p, loss_function='Tweedie:variance_power=1.6')
+    return CatBoostClassifier(**cb_p, loss_function='Logloss')
+
+
+def _lgb_dataset(data, matrix_key, cache):
+    """
+    Returns the binned lgb.Dataset of one feature matrix, constructing it on
+    first use. Both horizon labels share it via set_label.
+    """
+    key = ('lgb', matrix_key)
+    if key not in cache:
+        path = os.path.join(data['dataset_dir'], f"lgb_{matrix_key}.bin") if data['dataset_dir'] else None
+        if path and data['load_saved']:
+            dataset = lgb.Dataset(path, params=data['lgb_dataset_params'], free_raw_data=False)
+        else:
+            matrix = data['matrices'][matrix_key]
+            dataset = lgb.Dataset(matrix.values, feature_name=matrix.features, params=data['lgb_dataset_params'],
+                                  free_raw_data=False)
+        dataset.construct()
+        if path and not data['load_saved']:
+            dataset.save_binary(path)
+        cache[key] = dataset
+    return cache[key]
+
+
+def _lgb_valid_dataset(data, target_key, reference, cache):
+    """
+    Returns the holdout lgb.Dataset of one label, binned with the borders of
+    the training Dataset it validates.
+    """
+    key = ('lgb_valid', target_key)
+    if key not in cache:
+        valid = data['valid']
+        matrix = valid['matrices'][TARGET_MATRIX[target_key]]
+        dataset = lgb.Dataset(matrix.values, label=valid['labels'][target_key], feature_name=matrix.features,
+                              reference=reference, free_raw_data=False)
+        dataset.construct()
+        cache[key] = dataset
+    return cache[key]
+
+
+def _cb_pool(data, target_key, cache, valid=False):
+    """
+    Returns the quantized catboost.Pool of one (feature matrix, label),
+    building it on first use. Pools are not saved to disk: regression models
+    fitted on a reloaded quantized pool differ from in-memory ones. With a
+    holdout, both pools are left raw so `fit` quantizes the eval set with the
+    training pool's borders.
+    """
+    key = ('cb_valid' if valid else 'cb', target_key)
+    if key not in cache:
+        source = data['valid'] if valid else data
+        pool = source['matrices'][TARGET_MATRIX[target_key]].pool(label=source['labels'][target_key])
+        if not data.get('valid'):
+            pool.quantize()
+        cache[key] = pool
+    return cache[key]
+
+
+def _fit_job(name, seed, lgb_params, cb_params, data=None, cache=None):
+    """
+    Fits one (model name, seed) job. Runs in-process for the sequential path
+    and in a pool worker (reading `_WORKER_DATA`) for the parallel one.
+
+    With `data['reuse_datasets']`, LightGBM trains a native Booster on a
+    shared binned Dataset and CatBoost on a shared quantized Pool instead of
+    re-binning the raw DataFrame for every fit. With `data['valid']`, both
+    libraries score the holdout every round and, given
+    `data['early_stopping_rounds']`, keep only the rounds up to the best one.
+    With `data['init_models']`, the job adds its rounds to the trees of the
+    (name, seed) model found there instead of starting from scratch.
+    """
+    data = _WORKER_DATA if data is None else data
+    cache = _WORKER_CACHE if cache is None else cache
+    target_key = MODEL_TARGETS[name.split('_', 1)[1]]
+    y = data['labels'][target_key]
+    valid = data.get('valid')
+    stopping = data.get('early_stopping_rounds')
+    # Model to continue boosting from, for incremental updates
+    init = data.get('init_models', {}).get((name, seed))
+    init_model = {} if init is None else {'init_model': _booster(init) if name.startswith('lgb') else init}
+
+    with span(f"fit_{name}_seed{seed}", rows=len(y)):
+        lgb_callbacks = [lgb.early_stopping(stopping, verbose=False)] if valid and stopping else []
+        # Without early stopping the holdout is only scored; keep every round
+        cb_stopping = {'early_stopping_rounds': stopping} if stopping else {'use_best_model': False}
+
+        if not data['reuse_datasets']:
+            X = data['matrices'][TARGET_MATRIX[target_key]]
+            model = _build_model(name, seed, lgb_params, cb_params)
+            if name.startswith('lgb'):
+                if valid:
+                    eval_set = [(valid['matrices'][TARGET_MATRIX[target_key]].values, valid['labels'][target_key])]
+                    model.fit(X.values, y, feature_name=X.features, eval_set=eval_set, callbacks=lgb_callbacks,
+                              **init_model)
+                else:
+                    model.fit(X.values, y, feature_name=X.features, **init_model)
+            elif valid:
+                eval_pool = valid['matrices'][TARGET_MATRIX[target_key]].pool(label=valid['labels'][target_key])
+                model.fit(X.pool(label=y), eval_set=eval_pool, **cb_stopping, **init_model)
+            else:
+                model.fit(X.pool(label=y), **init_model)
+            return model
+
+        if name.startswith('lgb'):
+            dataset = _lgb_dataset(data, TARGET_MATRIX[target_key], cache)
+            dataset.set_label(y)
+            params = {k: v for k, v in lgb_params.items() if k not in ('n_estimators', 'n_jobs')}
+            params.update(LGB_OBJECTIVES[name], num_threads=lgb_params['n_jobs'], seed=seed)
+            if valid:
+                valid_set = _lgb_valid_dataset(data, target_key, dataset, cache)
+                return lgb.train(params, dataset, num_boost_round=lgb_params['n_estimators'],
+                                 valid_sets=[valid_set], callbacks=lgb_callbacks, **init_model)
+            return lgb.train(params, dataset, num_boost_round=lgb_params['n_estimators'], **init_model)
+
+        model = _build_model(name, seed, lgb_params, cb_params)
+        if valid:
+            model.fit(_cb_pool(data, target_key, cache), eval_set=_cb_pool(data, target_key, cache, valid=True),
+                      **cb_stopping, **init_model)
+        else:
+            model.fit(_cb_pool(data, target_key, cache), **init_model)
+        return model
+
+
+def _predict(name, model, X, pool):
+    """
+    One model's clipped predictions on a FeatureMatrix, as ModelPredictor
+    computes them, given the matrix's catboost.Pool built once by the caller.
+    """
+    if name.startswith('lgb'):
+        pred = _booster(model).predict(X.values)
+    else:
+        pred = model.predict_proba(pool)[:, 1] if '_clf' in name else model.predict(pool)
+    return pred if '_clf' in name else np.maximum(0, pred)
+
+
+def row_blocks(buy_1w, buy_2w):
+    """
+    Block of each training row: 0 for a purchase in the first week only, 1
+    in both weeks, 2 in the second week only and 3 in neither. Sorted by
+    block, the rows of each horizon's purchases are contiguous.
+    """
+    first, second = buy_1w == 1, buy_2w == 1
+    return np.select([first & ~second, first & second, second], [0, 1, 2], default=3)
+
+
+def holdout_split(weeks, k):
+    """
+    Picks the last `k` labelled weeks as the holdout. The final
+    LABEL_HORIZON weeks of Train are left out of both sides: their 1- and
+    2-week targets reach past the data and are filled with zeros.
+    Args:
+        weeks (array-like): The `week_start` values of Train.
+        k (int): Number of holdout weeks.
+    Returns:
+        tuple: (first holdout week, first unlabelled week)
+    """
+    weeks = np.unique(np.asarray(weeks, dtype='datetime64[ns]'))
+    if len(weeks) < k + LABEL_HORIZON + 1:
+        raise ValueError(
+            f"validation.holdout_weeks={k} needs at least {k + LABEL_HORIZON + 1} Train weeks, got {len(weeks)}"
+        )
+    return weeks[-(k + LABEL_HORIZON)], weeks[-LABEL_HORIZON]
+
 
 class ModelTrainer:
     def __init__(self, config):
         self.config = config
         self.logger = logging.getLogger(self.__class__.__name__)
         self.seeds = config['model']['seeds']
-        
+        self.n_jobs, self.threads_per_job = self._core_budget(config['training'])
+        self.reuse_datasets = config['training']['reuse_datasets']
+        self.dataset_dir = config['training']['dataset_dir']
+
+        validation = config['validation']
+        self.holdout_weeks = validation['holdout_weeks'] or 0
+        self.early_stopping_rounds = validation['early_stopping_rounds']
+        self.refit = validation['refit']
+        # Holdout report and predictions of the last train_hybrid_ensemble call, None without a holdout
+        self.validation_report = None
+        self.holdout_predictions = None
+
+        retraining = config['retraining']
+        self.incremental = retraining['mode'] == 'incremental'
+        self.extra_rounds = retraining['extra_rounds']
+        self.max_drift = retraining['max_drift']
+        self.max_updates = retraining['max_updates']
+        # Lineage and feature profile of the ensemble published by the last train_hybrid_ensemble call
+        self.lineage = None
+        self.feature_profile = None
+
         self.lgb_params = {
             'n_estimators': config['model']['n_estimators'],
             'learning_rate': config['model']['learning_rate'],
@@ -20,93 +258,428 @@ class ModelTrainer:
             'feature_fraction': config['model']['feature_fraction'],
             'bagging_fraction': config['model']['bagging_fraction'],
             'bagging_freq': config['model']['bagging_freq'],
+            'n_jobs': self.threads_per_job,
             'verbose': -1
         }
-        
+        if config['environment']['deterministic']:
+            # Same inputs and thread count give bit-identical boosters
+            self.lgb_params['deterministic'] = True
+            self.lgb_params['force_row_wise'] = True
+
         self.cb_params = {
             'iterations': config['catboost']['iterations'],
             'learning_rate': config['catboost']['learning_rate'],
             'depth': config['catboost']['depth'],
+            'thread_count': self.threads_per_job,
             'verbose': 0,
             'allow_writing_files': False
         }
 
         os.makedirs(config['paths']['model_dir'], exist_ok=True)
 
-    def train_hybrid_ensemble(self, train, features, cat_cols):
-        self.logger.info(f"Starting Hybrid Ensemble Training over {len(self.seeds)} seeds...")
-        
-        models = {
-            'lgb_clf1': [], 'lgb_clf2': [], 'lgb_reg1': [], 'lgb_reg2': [],
-            'cb_clf1': [], 'cb_clf2': [], 'cb_reg1': [], 'cb_reg2': []
-        }
-        
-        # Prepare targets
-        y_buy_1w = train["target_buy_1w"]
-        y_buy_2w = train["target_buy_2w"]
-        y_qty_1w = train["target_qty_1w"]
-        y_qty_2w = train["target_qty_2w"]
-        
+    def _core_budget(self, training):
+        """
+        Splits the core budget between parallel jobs and per-model library
+        threads so that n_jobs * threads_per_job never exceeds it.
+        Returns:
+            tuple: (n_jobs, threads_per_job)
+        """
+        cores = training.get('cores') or os.cpu_count() or 1
+        n_jobs = max(1, min(training.get('n_jobs') or 1, cores))
+        threads_per_job = training.get('threads_per_job') or max(1, cores // n_jobs)
+        if n_jobs * threads_per_job > cores:
+            raise ValueError(
+                f"training.n_jobs ({n_jobs}) x training.threads_per_job ({threads_per_job}) "
+                f"exceeds the core budget of {cores}"
+            )
+        return n_jobs, threads_per_job
+
+    def _training_data(self, train, features, cat_cols, dataset_dir):
+        """
+        Builds the feature matrices and labels every job reads. The features
+        are copied once, into a FeatureMatrix whose rows are ordered as
+        purchases in the first week only, in both weeks, in the second week
+        only, then neither. The 2-week target is the purchase exactly two
+        weeks ahead, not a cumulative one, so the two sets of positives only
+        overlap; in this order each is one contiguous block, and the rows
+        each Tweedie regressor trains on (positive quantities only) are a
+        view of the matrix the classifiers train on. Labels follow the same
+        order, including the all-row quantities the holdout predictions are
+        scored against.
+        Returns:
+            dict: The `data` argument of `_fit_job`.
+        """
+        buy_1w = train["target_buy_1w"].to_numpy()
+        buy_2w = train["target_buy_2w"].to_numpy()
+        order = np.argsort(row_blocks(buy_1w, buy_2w), kind='stable')
+        X_train = FeatureMatrix.from_frame(train, features, cat_cols, order)
+
+        y_buy_1w, y_buy_2w = buy_1w[order], buy_2w[order]
+        y_qty_1w = train["target_qty_1w"].to_numpy()[order]
+        y_qty_2w = train["target_qty_2w"].to_numpy()[order]
+
         # Masks for Tweedie Regressors (Train only on positive quantities)
         mask_1w = y_buy_1w == 1
         mask_2w = y_buy_2w == 1
-        
-        X_train = train[features]
-        X_train_pos_1w = train.loc[mask_1w, features]
-        y_qty_1w_pos = y_qty_1w[mask_1w]
-        
-        X_train_pos_2w = train.loc[mask_2w, features]
-        y_qty_2w_pos = y_qty_2w[mask_2w]
-
-        # CatBoost needs categorical indices
-        cat_indices = [features.index(c) for c in cat_cols]
-
-        for seed in self.seeds:
-            self.logger.info(f"--- Training Seed {seed} ---")
-            
-            # --- LightGBM ---
-            lgb_p = self.lgb_params.copy()
-            lgb_p['random_state'] = seed
-            
-            clf1 = lgb.LGBMClassifier(**lgb_p)
-            clf2 = lgb.LGBMClassifier(**lgb_p)
-            reg1 = lgb.LGBMRegressor(objective="tweedie", tweedie_variance_power=1.3, **lgb_p)
-            reg2 = lgb.LGBMRegressor(objective="tweedie", tweedie_variance_power=1.6, **lgb_p)
-            
-            clf1.fit(X_train, y_buy_1w)
-            clf2.fit(X_train, y_buy_2w)
-            reg1.fit(X_train_pos_1w, y_qty_1w_pos)
-            reg2.fit(X_train_pos_2w, y_qty_2w_pos)
-            
-            models['lgb_clf1'].append(clf1)
-            models['lgb_clf2'].append(clf2)
-            models['lgb_reg1'].append(reg1)
-            models['lgb_reg2'].append(reg2)
-
-            # --- CatBoost ---
-            cb_p = self.cb_params.copy()
-            cb_p['random_seed'] = seed
-            
-            cb_clf1 = CatBoostClassifier(**cb_p, loss_function='Logloss')
-            cb_clf2 = CatBoostClassifier(**cb_p, loss_function='Logloss')
-            cb_reg1 = CatBoostRegressor(**cb_p, loss_function='Tweedie:variance_power=1.3')
-            cb_reg2 = CatBoostRegressor(**cb_p, loss_function='Tweedie:variance_power=1.6')
-            
-            cb_clf1.fit(X_train, y_buy_1w, cat_features=cat_indices)
-            cb_clf2.fit(X_train, y_buy_2w, cat_features=cat_indices)
-            cb_reg1.fit(X_train_pos_1w, y_qty_1w_pos, cat_features=cat_indices)
-            cb_reg2.fit(X_train_pos_2w, y_qty_2w_pos, cat_features=cat_indices)
-            
-            models['cb_clf1'].append(cb_clf1)
-            models['cb_clf2'].append(cb_clf2)
-            models['cb_reg1'].append(cb_reg1)
-            models['cb_reg2'].append(cb_reg2)
-            
-            gc.collect()
-
-        # Save the ensemble
-        model_path = os.path.join(self.config['paths']['model_dir'], 'hybrid_ensemble.pkl')
-        self.logger.info(f"Saving models to {model_path}")
-        joblib.dump(models, model_path)
-        
+
+        return {
+            'matrices': {'all': X_train, 'pos_1w': X_train.rows(mask_1w), 'pos_2w': X_train.rows(mask_2w)},
+            'labels': {
+                'buy_1w': y_buy_1w, 'buy_2w': y_buy_2w,
+                'qty_1w': y_qty_1w, 'qty_2w': y_qty_2w,
+                'qty_1w_pos': y_qty_1w[mask_1w], 'qty_2w_pos': y_qty_2w[mask_2w],
+            },
+            'reuse_datasets': self.reuse_datasets,
+            'dataset_dir': dataset_dir,
+            'load_saved': False,
+            'lgb_dataset_params': {'verbose': -1, 'num_threads': self.threads_per_job, 'seed': self.seeds[0]},
+        }
+
+    def _fit_jobs(self, jobs, data):
+        """
+        Fits (name, seed, lgb_params, cb_params) jobs, ordered seed by seed,
+        sequentially or on the process pool.
+        Returns:
+            list: Fitted models in job order.
+        """
+        cache = {}
+        worker_data = data
+        if self.reuse_datasets and data['dataset_dir']:
+            os.makedirs(data['dataset_dir'], exist_ok=True)
+            if self.n_jobs > 1:
+                # Bin once in the parent so workers only load the LightGBM binaries
+                with span("datasets"):
+                    for matrix_key in data['matrices']:
+                        _lgb_dataset(data, matrix_key, cache)
+                worker_data = {**data, 'load_saved': True}
+
+        if self.n_jobs == 1:
+            fitted = []
+            for seed in self.seeds:
+                self.logger.info(f"--- Training Seed {seed} ---")
+                fitted.extend(_fit_job(*job, data, cache) for job in jobs if job[1] == seed)
+                gc.collect()
+            return fitted
+
+        self.logger.info(
+            f"Training {len(jobs)} models on {self.n_jobs} processes x {self.threads_per_job} threads..."
+        )
+        # spawn: forking after OpenMP has started in the parent can deadlock
+        with span("fit_parallel", rows=len(jobs)), ProcessPoolExecutor(
+            max_workers=self.n_jobs,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(worker_data,),
+        ) as pool:
+            futures = [pool.submit(_fit_job, *job) for job in jobs]
+            return [f.result() for f in futures]
+
+    def _holdout_report(self, models, valid):
+        """
+        Scores the seed mean of every model on the holdout: AUC for the
+        purchase classifiers, MAE on positive-quantity rows for the Tweedie
+        regressors, alongside the rounds each model kept.
+        Returns:
+            dict: Model name mapped to its metric, mean rounds kept and the
+                configured maximum.
+        """
+        pools = {key: X.pool() for key, X in valid['matrices'].items()}
+        report = {}
+        for name in MODEL_NAMES:
+            target_key = MODEL_TARGETS[name.split('_', 1)[1]]
+            matrix_key = TARGET_MATRIX[target_key]
+            X = valid['matrices'][matrix_key]
+            y = valid['labels'][target_key]
+            pred = np.mean([_predict(name, model, X, pools[matrix_key]) for model in models[name]], axis=0)
+            if '_clf' in name:
+                # None when the holdout has a single class or no positive rows
+                metric, value = 'auc', roc_auc_score(y, pred) if len(np.unique(y)) == 2 else None
+            else:
+                metric, value = 'mae', mean_absolute_error(y, pred) if len(y) else None
+            max_rounds = self.lgb_params['n_estimators'] if name.startswith('lgb') else self.cb_params['iterations']
+            report[name] = {
+                metric: None if value is None else float(value),
+                'rounds': float(np.mean([n_rounds(name, model) for model in models[name]])),
+                'max_rounds': max_rounds,
+            }
+        return report
+
+    def _holdout_predictions(self, models, valid):
+        """
+        Seed means of every head on all holdout rows, with the purchase and
+        quantity labels they are scored against, so post-processing can be
+        tuned without re-running the models (src/models/tuner.py). Rows are
+        in the order of the holdout's FeatureMatrix.
+        Returns:
+            dict: {'means': {model name: array}, 'labels': {target: array}}
+        """
+        X = valid['matrices']['all']
+        pool = X.pool()
+        return {
+            'means': {
+                name: np.mean([_predict(name, model, X, pool) for model in models[name]], axis=0)
+                for name in MODEL_NAMES
+            },
+            'labels': {
+                target: valid['labels'][target].astype(np.float64)
+                for target in ('buy_1w', 'buy_2w', 'qty_1w', 'qty_2w')
+            },
+        }
+
+    def _fit_with_holdout(self, train, features, cat_cols, jobs):
+        """
+        Fits `jobs` on the weeks before the holdout, stopping early on it,
+        and records the holdout scores in `validation_report` and every
+        head's predictions in `holdout_predictions`.
+        Returns:
+            list: The early-stopped models in job order.
+        """
+        start, unlabelled = holdout_split(train["week_start"], self.holdout_weeks)
+        self.logger.info(f"Holding out {self.holdout_weeks} weeks from {pd.Timestamp(start).date()}...")
+        weeks = train["week_start"]
+        with span("prepare_holdout", rows=len(train)):
+            dataset_dir = os.path.join(self.dataset_dir, 'holdout') if self.dataset_dir else None
+            search = self._training_data(train[weeks < start], features, cat_cols, dataset_dir)
+            holdout = train[(weeks >= start) & (weeks < unlabelled)]
+            valid = self._training_data(holdout, features, cat_cols, None)
+            search.update(valid=valid, early_stopping_rounds=self.early_stopping_rounds)
+
+        clock = time.perf_counter()
+        with span("holdout_fit", rows=len(search['labels']['buy_1w'])):
+            fitted = self._fit_jobs(jobs, search)
+        seconds = time.perf_counter() - clock
+
+        models = {name: [] for name in MODEL_NAMES}
+        for (name, *_), model in zip(jobs, fitted):
+            models[name].append(model)
+        self.validation_report = {
+            'holdout_start': str(pd.Timestamp(start).date()),
+            'holdout_weeks': self.holdout_weeks,
+            'early_stopping_rounds': self.early_stopping_rounds,
+            'holdout_fit_seconds': round(seconds, 3),
+            'refit_seconds': None,
+            'models': self._holdout_report(models, valid),
+        }
+        with span("holdout_predictions", rows=len(holdout)):
+            self.holdout_predictions = self._holdout_predictions(models, valid)
+        return fitted
+
+    def _log_holdout_report(self, report):
+        self.logger.info(f"Holdout fit took {report['holdout_fit_seconds']:.1f}s"
+                         + (f", refit {report['refit_seconds']:.1f}s" if report['refit_seconds'] is not None else ""))
+        for name, scores in report['models'].items():
+            metric = 'auc' if 'auc' in scores else 'mae'
+            value = 'n/a' if scores[metric] is None else f"{scores[metric]:.4f}"
+            self.logger.info(f"  {name}: {metric.upper()} {value}, "
+                             f"rounds {scores['rounds']:.0f}/{scores['max_rounds']}")
+
+    def _incremental_plan(self, train, features, cat_cols, encoders):
+        """
+        Decides whether the published ensemble can be continued on the Train
+        weeks after those it was fitted on. It cannot when there is none, when
+        the features, encodings, model configuration or seeds differ from its
+        manifest, after `retraining.max_updates` updates in a row, when the
+        new weeks lack purchases for a regressor, or when a feature of the
+        new weeks drifts past `retraining.max_drift` from the full fit's rows.
+        Returns:
+            tuple: (manifest, rows to boost on, None) to update, or
+                (None, None, reason) for a full retrain.
+        """
+        registry = ModelRegistry.for_config(self.config)
+        if not registry.exists():
+            return None, None, "no published ensemble"
+        manifest = registry.manifest()
+        lineage = manifest.get('lineage')
+        if not lineage or not manifest.get('feature_profile'):
+            return None, None, "the published ensemble has no lineage"
+        if manifest['features'] != list(features) or manifest['cat_cols'] != list(cat_cols):
+            return None, None, "the feature columns changed"
+        if encoders is not None and manifest['encoders'] != {col: list(c) for col, c in encoders.items()}:
+            return None, None, "the categorical encodings changed"
+        if manifest['config_hash'] != config_hash(self.config) or manifest['seeds'] != list(self.seeds):
+            return None, None, "the model configuration changed"
+        if lineage['updates'] >= self.max_updates:
+            return None, None, f"{lineage['updates']} incremental updates since the last full retrain"
+
+        trained_through = pd.Timestamp(lineage['trained_through'])
+        weeks = train["week_start"]
+        if not (weeks > trained_through).any():
+            return manifest, train.iloc[:0], None
+        # The last LABEL_HORIZON weeks already fitted had targets reaching past
+        # the data; boost on them again now that their purchases are known
+        rows = train[weeks > trained_through - pd.Timedelta(weeks=LABEL_HORIZON)]
+        if not ((rows["target_buy_1w"] == 1).any() and (rows["target_buy_2w"] == 1).any()):
+            return None, None, "the new weeks have no purchases to fit the quantity models on"
+        drift = population_stability(manifest['feature_profile'], rows[rows["week_start"] > trained_through])
+        worst = max(drift, key=drift.get)
+        if drift[worst] > self.max_drift:
+            return None, None, f"{worst} drifted (PSI {drift[worst]:.3f} > {self.max_drift})"
+        return manifest, rows, None
+
+    def _update_ensemble(self, previous, rows, features, cat_cols):
+        """
+        Adds `retraining.extra_rounds` rounds, fitted on `rows`, to every
+        model of `previous` through LightGBM's and CatBoost's `init_model`.
+        A LightGBM model whose training rows cannot fill two leaves of
+        `min_child_samples` rows would gain no tree, so it is kept as it was.
+        Returns:
+            tuple: (jobs, updated models in job order, names of the models kept)
+        """
+        with span("prepare", rows=len(rows)):
+            data = self._training_data(rows, features, cat_cols, None)
+            # Shared binned Datasets and quantized Pools carry no initial scores
+            data.update(reuse_datasets=False, init_models={
+                (name, seed): previous[name][i] for i, seed in enumerate(self.seeds) for name in MODEL_NAMES
+            })
+        min_rows = 2 * self.lgb_params.get('min_child_samples', 20)
+        kept = [
+            name for name in MODEL_NAMES
+            if name.startswith('lgb') and len(data['labels'][MODEL_TARGETS[name.split('_', 1)[1]]]) < min_rows
+        ]
+        for name in kept:
+            self.logger.warning(f"Keeping {name}: the new weeks have fewer than {min_rows} rows to split on")
+
+        self.logger.info(f"Continuing {len(self.seeds) * (len(MODEL_NAMES) - len(kept))} models for "
+                         f"{self.extra_rounds} rounds on {len(rows)} rows from "
+                         f"{pd.Timestamp(rows['week_start'].min()).date()}...")
+        jobs = [
+            (name, seed, {**self.lgb_params, 'n_estimators': self.extra_rounds},
+             {**self.cb_params, 'iterations': self.extra_rounds})
+            for seed in self.seeds for name in MODEL_NAMES if name not in kept
+        ]
+        return jobs, self._fit_jobs(jobs, data), kept
+
+    def _lineage(self, train, manifest=None, rows=None, reason=None, rounds_added=None, kept=None):
+        """
+        The lineage recorded with a published ensemble: the last Train week
+        it was fitted on, how many incremental updates followed the full
+        fit, the version of the ensemble it was continued from, and every
+        fit since the full one. An incremental fit records the rounds each
+        model gained, per seed, and the models it kept unchanged.
+        """
+        fitted = train if rows is None else rows
+        entry = {
+            'mode': 'full' if manifest is None else 'incremental',
+            'from': str(pd.Timestamp(fitted["week_start"].min()).date()),
+            'through': str(pd.Timestamp(fitted["week_start"].max()).date()),
+            'rows': int(len(fitted)),
+            'rounds_added': rounds_added,
+            'kept': kept,
+            'reason': reason,
+        }
+        if manifest is None:
+            return {'trained_through': entry['through'], 'updates': 0, 'parent_version': None, 'history': [entry]}
+        lineage = manifest['lineage']
+        return {
+            'trained_through': entry['through'],
+            'updates': lineage['updates'] + 1,
+            'parent_version': ModelRegistry.for_config(self.config).model_version(),
+            'history': lineage['history'] + [entry],
+        }
+
+    @traced("train_hybrid_ensemble")
+    def train_hybrid_ensemble(self, train, features, cat_cols, run_key=None, encoders=None):
+        """
+        Fits every (seed, model) job and publishes the ensemble to the model
+        registry under `paths.model_dir`.
+
+        With `retraining.mode: incremental`, the published ensemble is
+        instead continued on the weeks after those it was fitted on, unless
+        `_incremental_plan` finds a reason to retrain from scratch; the
+        lineage of either is kept in `lineage` and the manifest.
+
+        With `validation.holdout_weeks`, models are first fitted on the weeks
+        before a time-based holdout and stopped early on it, and the holdout
+        scores and predictions are kept in `validation_report` and
+        `holdout_predictions`. With `validation.refit`, every model is then
+        refitted on all of Train with the rounds it kept.
+        Args:
+            run_key (str): Optional identifier of the pipeline run, recorded
+                in the registry manifest.
+            encoders (dict): Optional fitted categorical classes, as from
+                `CategoryEncoder.to_dict`, stored with the models.
+        Returns:
+            dict: Model name mapped to its per-seed models.
+        """
+        self.validation_report = None
+        self.holdout_predictions = None
+        reason = None
+        if self.incremental:
+            manifest, rows, reason = self._incremental_plan(train, features, cat_cols, encoders)
+            if manifest is not None:
+                return self._train_incremental(train, features, cat_cols, manifest, rows, run_key, encoders)
+            self.logger.info(f"Full retrain: {reason}")
+
+        self.logger.info(f"Starting Hybrid Ensemble Training over {len(self.seeds)} seeds...")
+
+        # One independent job per (seed, model); results are slotted back by
+        # position so the ensemble layout never depends on completion order.
+        jobs = [(name, seed, self.lgb_params, self.cb_params) for seed in self.seeds for name in MODEL_NAMES]
+
+        # The rows the published models are fitted on, which their lineage records
+        fit_rows = train
+        if self.holdout_weeks:
+            fitted = self._fit_with_holdout(train, features, cat_cols, jobs)
+            if not self.refit:
+                fit_rows = train[train["week_start"] < holdout_split(train["week_start"], self.holdout_weeks)[0]]
+            # Rounds each model kept become its budget on the full data
+            jobs = [
+                (name, seed, {**lgb_params, 'n_estimators': n_rounds(name, model)},
+                 {**cb_params, 'iterations': n_rounds(name, model)})
+                for (name, seed, lgb_params, cb_params), model in zip(jobs, fitted)
+            ]
+
+        if not self.holdout_weeks or self.refit:
+            with span("prepare", rows=len(train)):
+                data = self._training_data(train, features, cat_cols, self.dataset_dir)
+            clock = time.perf_counter()
+            fitted = self._fit_jobs(jobs, data)
+            if self.validation_report:
+                self.validation_report['refit_seconds'] = round(time.perf_counter() - clock, 3)
+
+        if self.validation_report:
+            self._log_holdout_report(self.validation_report)
+
+        models = {name: [] for name in MODEL_NAMES}
+        for (name, *_), model in zip(jobs, fitted):
+            models[name].append(model)
+
+        # Save the ensemble in native per-model files
+        self.lineage = self._lineage(fit_rows, reason=reason)
+        profiled = [col for col in features if col not in cat_cols and col not in DRIFT_EXEMPT]
+        self.feature_profile = feature_profile(fit_rows, profiled)
+        with span("save"):
+            ModelRegistry.for_config(self.config).save(models, self.config, run_key=run_key, encoders=encoders,
+                                                       validation=self.validation_report,
+                                                       holdout=self.holdout_predictions, lineage=self.lineage,
+                                                       feature_profile=self.feature_profile)
+
+        return models
+
+    def _train_incremental(self, train, features, cat_cols, manifest, rows, run_key, encoders):
+        """Continues the published ensemble on `rows` and republishes it with its lineage extended."""
+        registry = ModelRegistry.for_config(self.config)
+        previous = registry.load(lazy=False, max_workers=self.n_jobs * self.threads_per_job)
+        self.feature_profile = manifest['feature_profile']
+        if not len(rows):
+            self.logger.info(f"No Train weeks after {manifest['lineage']['trained_through']}; "
+                             f"keeping the published ensemble")
+            self.lineage = manifest['lineage']
+            self.validation_report = manifest.get('validation')
+            self.holdout_predictions = registry.holdout_predictions()
+            return {name: list(previous[name]) for name in MODEL_NAMES}
+
+        jobs, fitted, kept = self._update_ensemble(previous, rows, features, cat_cols)
+        models = {name: list(previous[name]) if name in kept else [] for name in MODEL_NAMES}
+        for (name, *_), model in zip(jobs, fitted):
+            models[name].append(model)
+        # LightGBM stops early once no leaf can be split, so count what each model gained
+        rounds_added = {
+            name: [n_rounds(name, new) - n_rounds(name, old) for new, old in zip(models[name], previous[name])]
+            for name in MODEL_NAMES
+        }
+        self.lineage = self._lineage(train, manifest, rows, rounds_added=rounds_added, kept=kept)
+        with span("save"):
+            registry.save(models, self.config, run_key=run_key, encoders=encoders, lineage=self.lineage,
+                          feature_profile=self.feature_profile)
         return models
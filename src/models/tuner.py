@@ -0,0 +1,255 @@
+"""
+Post-processing tuner.
+
+Searches the `ensemble` weights, `purchase_*_scale` and `qty_*_threshold`
+values against the holdout predictions a training run with
+`validation.holdout_weeks` saves next to the ensemble, without running a
+single model. For every (lgbm_weight, catboost_weight) pair on the grid the
+heads are blended once; every scale and every threshold is then scored in
+one broadcast NumPy pass over the sorted predictions, and the best values
+are written as a config overlay:
+
+    python -m src.models.tuner                      # writes tuning.overlay
+    python main.py --overlay config/tuned.yaml      # re-blends the checkpointed predictions
+"""
+import argparse
+import copy
+import logging
+import os
+import time
+import numpy as np
+import yaml
+from src.models.registry import ModelRegistry
+
+# Purchase head, quantity head and the labels of each horizon
+HORIZONS = {'1w': ('clf1', 'reg1', 'buy_1w', 'qty_1w'), '2w': ('clf2', 'reg2', 'buy_2w', 'qty_2w')}
+
+
+def grid(spec):
+    """Values from a [start, stop, step] spec, both ends included."""
+    start, stop, step = spec
+    return np.round(start + step * np.arange(int(round((stop - start) / step)) + 1), 10)
+
+
+def auc_by_scale(p, y, scales):
+    """
+    AUC of `clip(p * s, 0, 1)` against the binary labels `y` for every scale
+    `s` at once. Scaling keeps the order of `p`, so a scale only changes the
+    AUC by tying the rows it clips to 1. Each scale therefore costs a lookup
+    into cumulative label counts over the distinct values of `p`, sorted
+    once: pairs ranked within the untied values, plus top positives over
+    every other negative, plus half the pairs tied at 1.
+    Args:
+        p (np.ndarray): Non-negative scores.
+        y (np.ndarray): 0/1 labels.
+        scales (np.ndarray): Scales to evaluate.
+    Returns:
+        np.ndarray: AUC per scale; NaN when `y` holds a single class.
+    """
+    order = np.argsort(-p, kind='mergesort')
+    p_desc, y_desc = p[order], y[order]
+    # Distinct values, highest first, with their positive and negative counts
+    first = np.r_[True, p_desc[1:] != p_desc[:-1]]
+    group = np.cumsum(first) - 1
+    values = p_desc[first]
+    pos = np.bincount(group, weights=y_desc)
+    neg = np.bincount(group, weights=1 - y_desc)
+    n_pos, n_neg = pos.sum(), neg.sum()
+    if n_pos == 0 or n_neg == 0:
+        return np.full(len(scales), np.nan)
+
+    cum_pos = np.r_[0.0, np.cumsum(pos)]
+    cum_neg = np.r_[0.0, np.cumsum(neg)]
+    # Correctly ranked pairs of each value against lower values, ties counting half
+    pairs = pos * (n_neg - cum_neg[1:]) + 0.5 * pos * neg
+    pairs_from = np.r_[np.cumsum(pairs[::-1])[::-1], 0.0]
+
+    # Values clipped to 1 under each scale: the first k, since values are descending
+    scales = np.asarray(scales, dtype=np.float64)
+    k = np.searchsorted(-values, -1.0 / scales, side='right')
+    # Settle the boundary value on the product itself, as np.clip sees it
+    k += (k < len(values)) & (values[np.minimum(k, len(values) - 1)] * scales >= 1)
+    k -= (k > 0) & (values[np.maximum(k - 1, 0)] * scales < 1)
+    top_pos, top_neg = cum_pos[k], cum_neg[k]
+    correct = pairs_from[k] + top_pos * (n_neg - top_neg) + 0.5 * top_pos * top_neg
+    return correct / (n_pos * n_neg)
+
+
+def mae_by_threshold(p, q, y, thresholds):
+    """
+    MAE of the expected quantity `p * q`, zeroed where `p < t`, against `y`
+    for every threshold `t` at once: the rows below a threshold are a prefix
+    of the rows sorted by `p`, so each one sums the zeroed errors of that
+    prefix and the kept errors of the rest from two cumulative sums.
+    Returns:
+        np.ndarray: MAE per threshold.
+    """
+    order = np.argsort(p, kind='mergesort')
+    kept = np.r_[0.0, np.cumsum(np.abs(y - np.maximum(0, p * q))[order])]
+    zeroed = np.r_[0.0, np.cumsum(np.abs(y)[order])]
+    below = np.searchsorted(p[order], thresholds, side='left')
+    return (zeroed[below] + kept[-1] - kept[below]) / max(len(p), 1)
+
+
+def _pick(scores, values, current):
+    """Index of the best score, breaking ties by the value closest to the current one."""
+    best = np.flatnonzero(scores >= np.max(scores) - 1e-12)
+    return best[np.argmin(np.abs(values[best] - current))]
+
+
+class PostprocessTuner:
+    """
+    Grid search of the blending weights and decoupled post-processing on
+    saved holdout predictions. The objective mirrors the competition's
+    blend: `auc_weight` x mean purchase AUC plus the rest x mean quantity
+    MAE skill, 1 - MAE / MAE of predicting zero, so both terms lie on a
+    comparable scale.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.logger = logging.getLogger(self.__class__.__name__)
+        tuning = config['tuning']
+        self.auc_weight = tuning['auc_weight']
+        self.weights = grid(tuning['weight_grid'])
+        self.scales = grid(tuning['scale_grid'])
+        self.thresholds = grid(tuning['threshold_grid'])
+
+    def evaluate(self, holdout, w_lgb, w_cb, scales, thresholds):
+        """
+        Scores one weight pair over the scale and threshold grids.
+        Returns:
+            dict: Horizon ('1w', '2w') mapped to its per-scale 'auc' and
+                per-threshold 'mae' and 'skill' arrays.
+        """
+        means, labels = holdout['means'], holdout['labels']
+        out = {}
+        for horizon, (clf, reg, buy, qty) in HORIZONS.items():
+            p = w_lgb * means[f'lgb_{clf}'] + w_cb * means[f'cb_{clf}']
+            q = w_lgb * means[f'lgb_{reg}'] + w_cb * means[f'cb_{reg}']
+            # A single-class holdout carries no ranking information
+            auc = np.nan_to_num(auc_by_scale(p, labels[buy], scales), nan=0.5)
+            mae = mae_by_threshold(p, q, labels[qty], thresholds)
+            zero = np.abs(labels[qty]).mean() if len(p) else 0.0
+            out[horizon] = {'auc': auc, 'mae': mae, 'skill': 1 - mae / zero if zero > 0 else -mae}
+        return out
+
+    def score(self, holdout, ensemble, scaling):
+        """
+        The objective and metrics of one set of `ensemble` and `scaling`
+        values, as `ModelPredictor` would post-process them.
+        """
+        metrics = {}
+        for horizon in HORIZONS:
+            scores = self.evaluate(holdout, ensemble['lgbm_weight'], ensemble['catboost_weight'],
+                                   np.array([scaling[f'purchase_{horizon}_scale']]),
+                                   np.array([scaling[f'qty_{horizon}_threshold']]))[horizon]
+            metrics[horizon] = {name: float(values[0]) for name, values in scores.items()}
+        return self._summary(metrics)
+
+    def _summary(self, metrics):
+        auc = np.mean([m['auc'] for m in metrics.values()])
+        skill = np.mean([m['skill'] for m in metrics.values()])
+        return {
+            'objective': float(self.auc_weight * auc + (1 - self.auc_weight) * skill),
+            'auc': {h: m['auc'] for h, m in metrics.items()},
+            'mae': {h: m['mae'] for h, m in metrics.items()},
+        }
+
+    def search(self, holdout):
+        """
+        Finds the weights, scales and thresholds maximising the objective.
+        Scales only move the AUC and thresholds only the MAE, so each is
+        chosen independently per weight pair and horizon. Ties keep the
+        value closest to the current config.
+        Args:
+            holdout (dict): `ModelRegistry.holdout_predictions()`.
+        Returns:
+            dict: 'overlay' ({'ensemble': ..., 'scaling': ...}), the tuned
+                and current 'objective', 'auc' and 'mae', the number of
+                'combinations' evaluated and the 'seconds' it took.
+        """
+        current_ensemble, current_scaling = self.config['ensemble'], self.config['scaling']
+        clock = time.perf_counter()
+        best = None
+        for w_lgb in self.weights:
+            for w_cb in self.weights:
+                if w_lgb == 0 and w_cb == 0:
+                    continue
+                scores = self.evaluate(holdout, w_lgb, w_cb, self.scales, self.thresholds)
+                scaling, metrics = {}, {}
+                for horizon, s in scores.items():
+                    i = _pick(s['auc'], self.scales, current_scaling[f'purchase_{horizon}_scale'])
+                    j = _pick(s['skill'], self.thresholds, current_scaling[f'qty_{horizon}_threshold'])
+                    scaling[f'purchase_{horizon}_scale'] = float(self.scales[i])
+                    scaling[f'qty_{horizon}_threshold'] = float(self.thresholds[j])
+                    metrics[horizon] = {'auc': float(s['auc'][i]), 'mae': float(s['mae'][j]),
+                                        'skill': float(s['skill'][j])}
+                summary = self._summary(metrics)
+                distance = abs(w_lgb - current_ensemble['lgbm_weight']) + abs(w_cb - current_ensemble['catboost_weight'])
+                key = (round(summary['objective'], 12), -distance)
+                if best is None or key > best[0]:
+                    ensemble = {'lgbm_weight': float(w_lgb), 'catboost_weight': float(w_cb)}
+                    best = (key, {'ensemble': ensemble, 'scaling': scaling}, summary)
+        seconds = time.perf_counter() - clock
+
+        _, overlay, summary = best
+        n_pairs = len(self.weights) ** 2 - 1
+        return {
+            'overlay': overlay,
+            'objective': summary['objective'],
+            'auc': summary['auc'],
+            'mae': summary['mae'],
+            'current': self.score(holdout, current_ensemble, current_scaling),
+            'combinations': int(n_pairs * len(HORIZONS) * len(self.scales) * len(self.thresholds)),
+            'seconds': round(seconds, 3),
+        }
+
+
+def apply_overlay(config, overlay):
+    """A copy of `config` with the nested keys of `overlay` replacing its own."""
+    merged = copy.deepcopy(config)
+    for key, value in overlay.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = apply_overlay(merged[key], value)
+        else:
+            merged[key] = copy.deepcopy(value)
+    return merged
+
+
+def write_overlay(overlay, path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, 'w') as f:
+        yaml.safe_dump(overlay, f, sort_keys=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--config', default='config/config.yaml')
+    parser.add_argument('--output', default=None, help='Overlay path; defaults to tuning.overlay')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    logger = logging.getLogger("PostprocessTuner")
+    with open(args.config) as f:
+        config = yaml.safe_load(f)
+
+    registry = ModelRegistry.for_config(config)
+    holdout = registry.holdout_predictions() if registry.exists() else None
+    if holdout is None:
+        raise SystemExit(f"No holdout predictions in {registry.directory}; "
+                         f"train with validation.holdout_weeks set first")
+
+    result = PostprocessTuner(config).search(holdout)
+    current = result['current']
+    logger.info(f"Evaluated {result['combinations']} combinations in {result['seconds']:.1f}s")
+    logger.info(f"Objective {current['objective']:.5f} -> {result['objective']:.5f} "
+                f"(AUC 1w {result['auc']['1w']:.4f}, 2w {result['auc']['2w']:.4f}; "
+                f"MAE 1w {result['mae']['1w']:.4f}, 2w {result['mae']['2w']:.4f})")
+    path = args.output or config['tuning']['overlay']
+    write_overlay(result['overlay'], path)
+    logger.info(f"Wrote {path}")
+
+
+if __name__ == "__main__":
+    main()
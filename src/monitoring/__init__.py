@@ -0,0 +1,11 @@
+"""
+Monitoring components.
+
+Contains context-manager spans recording wall time, CPU time, peak RSS and
+rows for pipeline steps (with optional profiler capture), and the latency
+histograms served by the API's /metrics endpoint.
+"""
+from .spans import Tracer, TRACER, span, traced
+from .metrics import LatencyHistogram, RequestMetrics
+
+__all__ = ["Tracer", "TRACER", "span", "traced", "LatencyHistogram", "RequestMetrics"]
@@ -0,0 +1,65 @@
+import resource
+import sys
+
+# Linux can reset the process's RSS high-water mark, giving exact per-step peaks
+_CLEAR_REFS = "/proc/self/clear_refs"
+
+
+def reset_peak_rss():
+    """
+    Resets the RSS high-water mark where the OS allows it (Linux).
+    Returns:
+        bool: Whether the reset happened, i.e. whether later peaks are exact.
+    """
+    try:
+        with open(_CLEAR_REFS, "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _status_kb(field, pid="self", name="status"):
+    with open(f"/proc/{pid}/{name}") as f:
+        for line in f:
+            if line.startswith(field):
+                return int(line.split()[1])
+    raise KeyError(field)
+
+
+def rss_mb():
+    """Current resident set size in MB."""
+    try:
+        return _status_kb("VmRSS:") / 1024
+    except OSError:
+        return peak_rss_mb()
+
+
+def peak_rss_mb():
+    """Peak resident set size in MB since the last reset (or process start)."""
+    try:
+        return _status_kb("VmHWM:") / 1024
+    except OSError:
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is bytes on macOS and KB on Linux
+        return maxrss / 2**20 if sys.platform == "darwin" else maxrss / 1024
+
+
+def process_memory_mb(pid="self"):
+    """
+    Resident and proportional set size of a process in MB (Linux). PSS
+    splits each page shared with other processes, such as models a forked
+    worker inherited from its parent, evenly between them, so summing it
+    over workers gives their real footprint where summing RSS would not.
+    Returns:
+        dict: 'rss_mb' and 'pss_mb', None where /proc is unavailable.
+    """
+    try:
+        rss = _status_kb("VmRSS:", pid) / 1024
+    except OSError:
+        return {"rss_mb": None, "pss_mb": None}
+    try:
+        pss = _status_kb("Pss:", pid, "smaps_rollup") / 1024
+    except (OSError, KeyError):
+        pss = None
+    return {"rss_mb": round(rss, 1), "pss_mb": None if pss is None else round(pss, 1)}
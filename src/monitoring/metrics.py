@@ -0,0 +1,79 @@
+import bisect
+import threading
+
+# Upper bounds (ms) of the latency buckets; the last bucket is open-ended
+DEFAULT_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+class LatencyHistogram:
+    """Thread-safe cumulative latency histogram with fixed millisecond buckets."""
+
+    def __init__(self, buckets_ms=DEFAULT_BUCKETS_MS):
+        self.bounds = tuple(buckets_ms)
+        self._counts = [0] * (len(self.bounds) + 1)
+        self._count = 0
+        self._sum = 0.0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, ms):
+        with self._lock:
+            self._counts[bisect.bisect_left(self.bounds, ms)] += 1
+            self._count += 1
+            self._sum += ms
+            self._max = max(self._max, ms)
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: count, sum/mean/max in ms and cumulative bucket counts keyed
+                by upper bound ("le_5" = requests taking at most 5 ms).
+        """
+        with self._lock:
+            counts, count, total, peak = list(self._counts), self._count, self._sum, self._max
+        buckets, running = {}, 0
+        for bound, n in zip(self.bounds + ("inf",), counts):
+            running += n
+            buckets[f"le_{bound}"] = running
+        return {
+            'count': count,
+            'sum_ms': round(total, 3),
+            'mean_ms': round(total / count, 3) if count else None,
+            'max_ms': round(peak, 3),
+            'buckets': buckets,
+        }
+
+
+class RequestMetrics:
+    """Per-route latency histograms and status counts for the API."""
+
+    def __init__(self, buckets_ms=DEFAULT_BUCKETS_MS):
+        self.buckets_ms = buckets_ms
+        self._routes = {}
+        self._lock = threading.Lock()
+
+    def observe(self, route, ms, status):
+        """
+        Args:
+            route (str): Method and route template, e.g. "POST /predict".
+            ms (float): Request latency in milliseconds.
+            status (int): HTTP status code of the response.
+        """
+        with self._lock:
+            if route not in self._routes:
+                self._routes[route] = {'latency': LatencyHistogram(self.buckets_ms), 'errors': 0, 'status': {}}
+            entry = self._routes[route]
+            entry['status'][status] = entry['status'].get(status, 0) + 1
+            if status >= 500:
+                entry['errors'] += 1
+        entry['latency'].observe(ms)
+
+    def snapshot(self):
+        with self._lock:
+            routes = {route: (entry['latency'], entry['errors'], dict(entry['status']))
+                      for route, entry in self._routes.items()}
+        return {
+            route: {'latency': latency.snapshot(), 'errors': errors,
+                    'status': {str(code): n for code, n in sorted(status.items())}}
+            for route, (latency, errors, status) in sorted(routes.items())
+        }
@@ -0,0 +1,192 @@
+import contextlib
+import cProfile
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from src.monitoring.memory import peak_rss_mb, reset_peak_rss, rss_mb
+
+
+class Span:
+    """One timed step. Assign `rows` inside the block to record throughput."""
+
+    __slots__ = ('path', 'depth', 'rows', 'peak', 'rss_before')
+
+    def __init__(self, path, depth, rows=None):
+        self.path = path
+        self.depth = depth
+        self.rows = rows
+        self.peak = 0.0
+        self.rss_before = 0.0
+
+
+class Tracer:
+    """
+    Records wall time, CPU time, peak RSS and rows for nested steps:
+
+        with TRACER.span("train") as s:
+            ...
+            s.rows = len(train)
+
+    Span names nest into paths such as "features/preprocess_metadata/encode".
+    Peak RSS is exact on Linux: each span resets the kernel high-water mark
+    on entry after folding the mark so far into its open ancestors. Spans
+    are meant for the pipeline's main thread; the API uses /metrics
+    histograms instead.
+
+    Disabled tracers skip all measurement, so instrumented library code costs
+    nothing unless `main.py` turns spans on. Any span whose name or path is
+    listed in `profile_stages` is also captured with cProfile or pyinstrument.
+    """
+
+    def __init__(self, enabled=False, profile_stages=(), profile_tool='cprofile', profile_dir='profiles'):
+        self.enabled = enabled
+        self.profile_stages = set(profile_stages)
+        self.profile_tool = profile_tool
+        self.profile_dir = profile_dir
+        self.records = []
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self._local = threading.local()
+        self._profiling = False
+
+    def configure(self, monitoring):
+        """Applies the `monitoring` config section."""
+        profile = monitoring['profile']
+        self.enabled = monitoring['spans']
+        self.profile_stages = set(profile['stages'] or ())
+        self.profile_tool = profile['tool']
+        self.profile_dir = profile['dir']
+        return self
+
+    def _stack(self):
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextlib.contextmanager
+    def span(self, name, rows=None):
+        if not (self.enabled or self.profile_stages):
+            yield Span(name, 0, rows)
+            return
+
+        stack = self._stack()
+        current = Span(f"{stack[-1].path}/{name}" if stack else name, len(stack), rows)
+        profiler = self._start_profiler(current.path, name)
+        measured = self.enabled
+        if measured:
+            mark = peak_rss_mb()
+            for parent in stack:
+                parent.peak = max(parent.peak, mark)
+            reset_peak_rss()
+            current.rss_before = current.peak = rss_mb()
+        stack.append(current)
+        wall, cpu = time.perf_counter(), time.process_time()
+        failed = False
+        try:
+            yield current
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            stack.pop()
+            if profiler is not None:
+                self._stop_profiler(profiler, current.path)
+            if measured:
+                self._record(current, wall, cpu, failed)
+
+    def _record(self, current, wall, cpu, failed):
+        current.peak = max(current.peak, peak_rss_mb())
+        record = {
+            'name': current.path,
+            'depth': current.depth,
+            'wall_s': round(wall, 4),
+            'cpu_s': round(cpu, 4),
+            'peak_rss_mb': round(current.peak, 1),
+            'rss_delta_mb': round(rss_mb() - current.rss_before, 1),
+            'rows': current.rows,
+            'rows_per_s': round(current.rows / wall, 1) if current.rows and wall > 0 else None,
+        }
+        if failed:
+            record['failed'] = True
+        self.records.append(record)
+
+        rows = f", {current.rows} rows" if current.rows is not None else ""
+        self.logger.info(f"{current.path}: {wall:.2f}s wall, {cpu:.2f}s cpu, "
+                         f"peak {current.peak:.0f} MB{rows}")
+
+    def _start_profiler(self, path, name):
+        if path not in self.profile_stages and name not in self.profile_stages:
+            return None
+        if self._profiling:
+            self.logger.warning(f"Not profiling {path}: an enclosing span is already being profiled")
+            return None
+        if self.profile_tool == 'pyinstrument':
+            try:
+                from pyinstrument import Profiler
+            except ImportError:
+                raise ImportError("monitoring.profile.tool 'pyinstrument' requires `pip install pyinstrument`")
+            profiler = Profiler()
+            profiler.start()
+        elif self.profile_tool == 'cprofile':
+            profiler = cProfile.Profile()
+            profiler.enable()
+        else:
+            raise ValueError(f"Unknown monitoring.profile.tool {self.profile_tool!r}; use 'cprofile' or 'pyinstrument'")
+        self._profiling = True
+        return profiler
+
+    def _stop_profiler(self, profiler, path):
+        self._profiling = False
+        os.makedirs(self.profile_dir, exist_ok=True)
+        base = os.path.join(self.profile_dir, path.replace('/', '.'))
+        if self.profile_tool == 'cprofile':
+            profiler.disable()
+            profiler.dump_stats(f"{base}.prof")
+            out = f"{base}.prof"
+        else:
+            profiler.stop()
+            out = f"{base}.html"
+            with open(out, 'w') as f:
+                f.write(profiler.output_html())
+        self.logger.info(f"Profile of {path} saved to {out}")
+
+    def save(self, path):
+        """Writes the recorded spans, in completion order, as JSON."""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump({'spans': self.records}, f, indent=2)
+        self.logger.info(f"Span report saved to {path}")
+
+    def reset(self):
+        self.records = []
+
+
+# Process-wide tracer used by the pipeline classes; disabled until configured
+TRACER = Tracer()
+
+
+def span(name, rows=None):
+    """Opens a span on the process-wide tracer."""
+    return TRACER.span(name, rows)
+
+
+def traced(name, rows=None):
+    """
+    Decorator running the wrapped function inside a span.
+    Args:
+        name (str): Span name.
+        rows (callable): Maps the function's result to the rows it processed.
+    """
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with TRACER.span(name) as current:
+                out = fn(*args, **kwargs)
+                if rows is not None and TRACER.enabled:
+                    current.rows = rows(out)
+                return out
+        return wrapper
+    return decorate
@@ -0,0 +1,9 @@
+"""
+Pipeline orchestration components.
+
+Contains the stage runner that checkpoints each pipeline stage under a
+content hash of its inputs, so unchanged stages are skipped on re-runs.
+"""
+from .stages import StageRunner
+
+__all__ = ["StageRunner"]
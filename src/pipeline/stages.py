@@ -0,0 +1,70 @@
+import hashlib
+import json
+import logging
+import os
+import time
+import joblib
+from src.data.cache import file_sha256
+from src.monitoring.spans import span
+
+
+def source_digest(*modules):
+    """Hashes the source files of `modules` so code changes invalidate their stage."""
+    return [file_sha256(module.__file__) for module in modules]
+
+
+class StageRunner:
+    """
+    Runs pipeline stages once per distinct input.
+
+    Every stage has a key: the SHA-256 of its name and the JSON of whatever it
+    depends on (upstream stage keys, config sections, input file hashes,
+    source digests). Outputs are stored at `<dir>/<stage>/<key>.pkl`, so a
+    stage whose key already exists is loaded instead of re-run, and
+    switching back to an earlier config is a hit too.
+    """
+
+    def __init__(self, cache_dir, enabled=True):
+        """
+        Args:
+            cache_dir (str): Root directory of the checkpoints.
+            enabled (bool): When False every stage runs and nothing is stored.
+        """
+        self.cache_dir = cache_dir
+        self.enabled = enabled
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    def key(self, stage, *parts):
+        """
+        Returns:
+            str: Content hash of `stage` and its JSON-serializable dependencies.
+        """
+        payload = json.dumps([stage, *parts], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def path(self, stage, key):
+        return os.path.join(self.cache_dir, stage, f"{key}.pkl")
+
+    def has(self, stage, key):
+        return self.enabled and os.path.exists(self.path(stage, key))
+
+    def run(self, stage, key, fn):
+        """
+        Returns the checkpointed output of `stage` under `key`, calling `fn()`
+        and storing its result on a miss.
+        """
+        path = self.path(stage, key)
+        if self.has(stage, key):
+            self.logger.info(f"Stage '{stage}' unchanged ({key[:12]}), loading {path}")
+            with span(f"{stage}_checkpoint"):
+                return joblib.load(path)
+
+        start = time.perf_counter()
+        output = fn()
+        self.logger.info(f"Stage '{stage}' ran in {time.perf_counter() - start:.1f}s")
+        if self.enabled:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.tmp"
+            joblib.dump(output, tmp)
+            os.replace(tmp, path)
+        return output
@@ -0,0 +1,188 @@
+"""
+Pre-forking server for the prediction API.
+
+The parent process loads the models and indexes once, eagerly, then forks
+`serving.server.workers` uvicorn workers accepting on one shared socket.
+Forked workers see the parent's memory copy-on-write and only ever read the
+model and index pages, so N workers cost little more memory than one instead
+of N copies of the ensemble. `gc.freeze()` takes the loaded objects out of the
+collector's generations, so collections in the workers do not write to (and
+thereby copy) the pages holding them.
+
+`POST /reload` in any worker sends the parent SIGHUP: it loads the published
+models once more, forks a fresh set of workers on the same socket and only
+then asks the old ones to finish their in-flight requests and exit, so no
+request is dropped. If loading fails the old workers keep serving.
+SIGTERM/SIGINT drain every worker and stop.
+
+    python -m src.serve --workers 4
+"""
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import time
+
+import uvicorn
+
+from src import api
+
+logger = logging.getLogger("PreforkServer")
+
+
+def bind(host, port, backlog=2048):
+    """A listening socket the forked workers inherit and accept on."""
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(sock, parent_pid):
+    """Serves the app on the inherited socket until uvicorn is told to exit; never returns."""
+    # uvicorn installs its own SIGINT/SIGTERM handlers for a graceful shutdown
+    for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+        signal.signal(sig, signal.SIG_DFL)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    api.SERVER_PID = parent_pid
+    code = 0
+    try:
+        uvicorn.Server(uvicorn.Config(api.app, log_level="info")).run(sockets=[sock])
+    except BaseException:
+        logger.exception(f"Worker {os.getpid()} failed")
+        code = 1
+    finally:
+        os._exit(code)
+
+
+class PreforkServer:
+    """
+    Keeps `workers` processes serving the models loaded in this process:
+    replaces workers that die, rolls all of them onto freshly loaded models
+    on SIGHUP and drains them on SIGTERM/SIGINT.
+    """
+
+    def __init__(self, sock, workers=1, graceful_timeout_s=30.0, poll_s=0.2):
+        self.sock = sock
+        self.n_workers = workers
+        self.graceful_timeout_s = graceful_timeout_s
+        self.poll_s = poll_s
+        self.workers = set()
+        self.draining = set()
+        self._reload = False
+        self._stop = False
+
+    def load(self):
+        """
+        Loads every model up front so workers inherit them instead of each
+        reading its own lazily. The parent never scores, so no model thread
+        pool exists yet when it forks.
+        """
+        gc.unfreeze()
+        api.load_artifacts(lazy=False)
+        gc.collect()
+        gc.freeze()
+
+    def spawn(self):
+        parent_pid = os.getpid()
+        pid = os.fork()
+        if pid == 0:
+            run_worker(self.sock, parent_pid)
+        self.workers.add(pid)
+        return pid
+
+    def roll(self):
+        """Forks workers serving newly loaded models, then drains the previous ones."""
+        try:
+            self.load()
+        except Exception:
+            logger.exception("Reload failed; workers keep serving the current models")
+            return
+        previous, self.workers = self.workers, set()
+        for _ in range(self.n_workers):
+            self.spawn()
+        for pid in previous:
+            self._signal(pid, signal.SIGTERM)
+        self.draining |= previous
+        logger.info(f"Serving model version {api.ARTIFACTS.version} from workers {sorted(self.workers)}")
+
+    def reap(self):
+        """Collects exited workers and replaces any that died while serving."""
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            self.draining.discard(pid)
+            if pid in self.workers:
+                self.workers.discard(pid)
+                if not self._stop:
+                    logger.warning(f"Worker {pid} exited with status {status}; replacing it")
+                    self.spawn()
+
+    def run(self):
+        self.load()
+        signal.signal(signal.SIGHUP, self._request_reload)
+        signal.signal(signal.SIGTERM, self._request_stop)
+        signal.signal(signal.SIGINT, self._request_stop)
+        for _ in range(self.n_workers):
+            self.spawn()
+        logger.info(f"Serving model version {api.ARTIFACTS.version} from workers {sorted(self.workers)}")
+        while not self._stop:
+            if self._reload:
+                self._reload = False
+                self.roll()
+            self.reap()
+            time.sleep(self.poll_s)
+        self.stop()
+
+    def stop(self):
+        """Lets every worker finish its in-flight requests, killing stragglers after the timeout."""
+        remaining = self.workers | self.draining
+        for pid in remaining:
+            self._signal(pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.graceful_timeout_s
+        while remaining and time.monotonic() < deadline:
+            self.reap()
+            remaining &= self.workers | self.draining
+            time.sleep(self.poll_s)
+        for pid in remaining:
+            self._signal(pid, signal.SIGKILL)
+        self.reap()
+
+    def _request_reload(self, signum, frame):
+        self._reload = True
+
+    def _request_stop(self, signum, frame):
+        self._stop = True
+
+    @staticmethod
+    def _signal(pid, sig):
+        try:
+            os.kill(pid, sig)
+        except ProcessLookupError:
+            pass
+
+
+def main():
+    server = api.config['serving']['server']
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=server['host'])
+    parser.add_argument("--port", type=int, default=server['port'])
+    parser.add_argument("--workers", type=int, default=server['workers'])
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    sock = bind(args.host, args.port)
+    PreforkServer(sock, workers=args.workers).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+import pandas as pd
+import numpy as np
+from fastapi.testclient import TestClient
+from src import api
+from src.features.candidates import CandidateIndex
+from src.features.engineer import FeatureEngineer, FEATURE_COLS
+from src.features.index import FeatureIndex
+from src.features.store import FeatureStore
+from src.models.predictor import ModelPredictor
+from src.models.batcher import MicroBatcher
+from src.models.cache import PredictionCache
+from tests.test_engineer import make_transactions
+from tests.test_predictor import make_config, build_pipeline
+
+TARGETS = {
+    "buy_1w_prob": "Target_purchase_next_1w",
+    "buy_2w_prob": "Target_purchase_next_2w",
+    "qty_1w": "Target_qty_next_1w",
+    "qty_2w": "Target_qty_next_2w",
+}
+
+# Features FeatureIndex.vector recomputes from supplied history
+ROLLED_COLS = ["lag1", "lag2", "roll_mean_4", "pair_buy_rate", "pair_recency", "is_new_pair",
+               "cust_lag1", "cust_roll_4", "month", "week_of_year"]
+
+
+class TestPredictAPI(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.config = make_config(cls.tmp.name)
+        cls.pipe = build_pipeline(cls.config)
+        cls.index = FeatureIndex.build(cls.pipe['test'], cls.pipe['features'], cls.pipe['cat_cols'], cls.pipe['store'])
+        api.PREDICTOR = ModelPredictor(cls.config)
+        cls.candidates = CandidateIndex.build(
+            cls.pipe['raw_train'], cls.index, cls.pipe['store'], cls.pipe['customer'], cls.pipe['sku'],
+            cls.pipe['encoder'], max_history=3, n_popular=2, popular_weeks=4,
+        )
+        api.ARTIFACTS = api.Artifacts(models=cls.pipe['models'], feature_index=cls.index,
+                                      candidate_index=cls.candidates)
+        # Every test scores for real unless it installs a cache itself
+        api.CACHE = None
+        cls.client = TestClient(api.app)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def test_predict_matches_model_predictor(self):
+        test = self.pipe['test']
+        expected = ModelPredictor(self.config).predict(self.pipe['models'], test, self.pipe['features'])
+        for i in range(len(test)):
+            row = test.iloc[i]
+            response = self.client.post("/predict", json={
+                "customer_id": int(row["customer_id"]),
+                "product_unit_variant_id": int(row["product_unit_variant_id"]),
+            })
+            self.assertEqual(response.status_code, 200)
+            for field, col in TARGETS.items():
+                self.assertAlmostEqual(response.json()[field], expected[col].iloc[i], places=12)
+
+    def pair_payloads(self):
+        return [
+            {"customer_id": int(c), "product_unit_variant_id": int(p)}
+            for c, p in zip(self.pipe['test']["customer_id"], self.pipe['test']["product_unit_variant_id"])
+        ]
+
+    def test_batch_matches_model_predictor(self):
+        expected = ModelPredictor(self.config).predict(self.pipe['models'], self.pipe['test'], self.pipe['features'])
+        items = self.pair_payloads()
+        response = self.client.post("/predict/batch", json={"items": items})
+        self.assertEqual(response.status_code, 200)
+        predictions = response.json()["predictions"]
+        self.assertEqual(len(predictions), len(items))
+        for i, (item, pred) in enumerate(zip(items, predictions)):
+            self.assertEqual(pred["customer_id"], item["customer_id"])
+            for field, col in TARGETS.items():
+                self.assertAlmostEqual(pred[field], expected[col].iloc[i], places=12)
+
+    def test_batch_with_unknown_pair_returns_404(self):
+        items = self.pair_payloads()[:2] + [{"customer_id": -1, "product_unit_variant_id": -1}]
+        self.assertEqual(self.client.post("/predict/batch", json={"items": items}).status_code, 404)
+
+    def test_micro_batched_predict_matches_direct(self):
+        items = self.pair_payloads()[:24]
+        direct = [self.client.post("/predict", json=item).json() for item in items]
+        api.BATCHER = MicroBatcher(api.score, window_ms=20.0, max_batch_size=64)
+        try:
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                batched = list(pool.map(lambda item: self.client.post("/predict", json=item).json(), items))
+            self.assertLess(api.BATCHER.batches, len(items))
+        finally:
+            api.BATCHER.close()
+            api.BATCHER = None
+        for a, b in zip(direct, batched):
+            for field in TARGETS:
+                self.assertAlmostEqual(a[field], b[field], places=12)
+
+    def test_old_history_is_ignored(self):
+        row = self.pipe['test'].iloc[0]
+        pair = (int(row["customer_id"]), int(row["product_unit_variant_id"]))
+        old = [{"week_start": "2020-01-06", "qty_this_week": 99.0}]
+        np.testing.assert_array_equal(self.index.vector(*pair, old), self.index.vector(*pair))
+
+    def test_unknown_pair_returns_404(self):
+        response = self.client.post("/predict", json={"customer_id": -1, "product_unit_variant_id": -1})
+        self.assertEqual(response.status_code, 404)
+
+    def test_invalid_history_returns_422(self):
+        row = self.pipe['test'].iloc[0]
+        response = self.client.post("/predict", json={
+            "customer_id": int(row["customer_id"]),
+            "product_unit_variant_id": int(row["product_unit_variant_id"]),
+            "historical_data": [{"qty_this_week": 3.0}],
+        })
+        self.assertEqual(response.status_code, 422)
+
+    def test_newer_history_rolls_pair_features_forward(self):
+        """Supplying the scoring week's actuals reproduces next week's pair features."""
+        raw_train, raw_test = self.pipe['raw_train'], self.pipe['raw_test']
+        last_week = raw_train["week_start"].max()
+        history, latest = raw_train[raw_train["week_start"] < last_week], raw_train[raw_train["week_start"] == last_week]
+
+        engineer = FeatureEngineer(engine="vectorized")
+        _, scoring, feature_cols = engineer.engineer_features(history, latest.drop(columns=["qty_this_week"]))
+        scoring = scoring.fillna(0)
+        index = FeatureIndex.build(scoring, feature_cols, [], FeatureStore().fit(history))
+        _, expected, _ = engineer.engineer_features(raw_train, raw_test)
+        expected = expected.fillna(0).set_index(["customer_id", "product_unit_variant_id"])
+
+        pair_cols = ["lag1", "lag2", "roll_mean_4", "pair_buy_rate", "pair_recency", "is_new_pair",
+                     "month", "week_of_year"]
+        checked = 0
+        for _, row in latest.iterrows():
+            pair = (int(row["customer_id"]), int(row["product_unit_variant_id"]))
+            if pair not in expected.index:
+                continue
+            supplied = [{"week_start": str(row["week_start"].date()), "qty_this_week": float(row["qty_this_week"])}]
+            got = pd.Series(index.vector(*pair, supplied)[0], index=FEATURE_COLS)
+            np.testing.assert_allclose(got[pair_cols].to_numpy(dtype=float),
+                                       expected.loc[pair, pair_cols].to_numpy(dtype=float), rtol=1e-9)
+            checked += 1
+        self.assertGreater(checked, 0)
+
+    def test_short_pair_customer_momentum_rolls_forward(self):
+        """Pairs with fewer than 4 weeks take the rest of cust_roll_4 from the customer's earlier products."""
+        raw_train = self.pipe['raw_train']
+        last_week = raw_train["week_start"].max()
+        history, latest = raw_train[raw_train["week_start"] < last_week], raw_train[raw_train["week_start"] == last_week]
+
+        engineer = FeatureEngineer(engine="vectorized")
+        _, scoring, feature_cols = engineer.engineer_features(history, latest.drop(columns=["qty_this_week"]))
+        index = FeatureIndex.build(scoring.fillna(0), feature_cols, [], FeatureStore().fit(history))
+
+        sizes = raw_train.groupby(["customer_id", "product_unit_variant_id"]).size()
+        momentum = ["cust_lag1", "cust_roll_4"]
+        checked = 0
+        for i, row in latest.iterrows():
+            pair = (int(row["customer_id"]), int(row["product_unit_variant_id"]))
+            if sizes[pair] >= 4:
+                continue
+            # FeatureEngineer on the same history: this pair's week observed, the other scoring rows unchanged
+            next_row = latest.loc[[i]].drop(columns=["qty_this_week"]).assign(week_start=last_week + pd.Timedelta(days=7))
+            _, expected, _ = engineer.engineer_features(
+                pd.concat([history, latest.loc[[i]]], ignore_index=True),
+                pd.concat([latest.drop(index=i).drop(columns=["qty_this_week"]), next_row], ignore_index=True),
+            )
+            expected = expected.fillna(0).iloc[-1]
+            supplied = [{"week_start": str(row["week_start"].date()), "qty_this_week": float(row["qty_this_week"])}]
+            got = pd.Series(index.vector(*pair, supplied)[0], index=FEATURE_COLS)
+            np.testing.assert_allclose(got[momentum].to_numpy(dtype=float),
+                                       expected[momentum].to_numpy(dtype=float), rtol=1e-6)
+            checked += 1
+        self.assertGreater(checked, 0)
+
+    def test_second_test_week_rolls_forward_past_earlier_scoring_weeks(self):
+        """With two Test weeks, the first one's scoring rows count as zeros before the indexed week."""
+        raw_train, raw_test = make_transactions(n_test_weeks=2)
+        engineer = FeatureEngineer(engine="vectorized")
+        _, scoring, feature_cols = engineer.engineer_features(raw_train, raw_test)
+        index = FeatureIndex.build(scoring.fillna(0), feature_cols, [], FeatureStore().fit(raw_train))
+
+        last_week = raw_test["week_start"].max()
+        earlier = raw_test.loc[raw_test["week_start"] < last_week, ["customer_id", "product_unit_variant_id"]]
+        earlier = set(map(tuple, earlier.to_numpy().tolist()))
+        checked = 0
+        for i, row in raw_test[raw_test["week_start"] == last_week].iterrows():
+            pair = (int(row["customer_id"]), int(row["product_unit_variant_id"]))
+            if pair not in earlier or checked == 10:
+                continue
+            # FeatureEngineer with this pair's last Test week observed and the week after it scored
+            observed = raw_test.loc[[i]].assign(qty_this_week=np.float32(5.0))
+            next_row = raw_test.loc[[i]].assign(week_start=last_week + pd.Timedelta(days=7))
+            _, expected, _ = engineer.engineer_features(
+                pd.concat([raw_train, observed], ignore_index=True),
+                pd.concat([raw_test.drop(index=i), next_row], ignore_index=True),
+            )
+            expected = expected.fillna(0).iloc[-1]
+            supplied = [{"week_start": str(row["week_start"].date()), "qty_this_week": 5.0}]
+            got = pd.Series(index.vector(*pair, supplied)[0], index=FEATURE_COLS)
+            np.testing.assert_allclose(got[ROLLED_COLS].to_numpy(dtype=float),
+                                       expected[ROLLED_COLS].to_numpy(dtype=float), rtol=1e-6)
+            checked += 1
+        self.assertGreater(checked, 0)
+
+    def test_recommend_ranks_scored_candidates(self):
+        customer_id = int(self.pipe['test']["customer_id"].iloc[0])
+        products, X = self.candidates.candidates(customer_id)
+        self.assertLessEqual(len(products), 3 + 2)
+        self.assertEqual(len(set(products.tolist())), len(products))
+        for product, row in zip(products.tolist(), X):
+            if (customer_id, product) in self.index:
+                np.testing.assert_array_equal(row, self.index.vector(customer_id, product)[0])
+
+        response = self.client.get(f"/recommend/{customer_id}", params={"k": 3})
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body["candidates"], len(products))
+        expected = api.score(X)
+        probs = [item["buy_1w_prob"] for item in body["recommendations"]]
+        self.assertEqual(len(probs), min(3, len(products)))
+        self.assertEqual(probs, sorted(probs, reverse=True))
+        self.assertAlmostEqual(probs[0], expected["Target_purchase_next_1w"].max(), places=12)
+
+    def test_recommend_ranks_by_unclipped_probability(self):
+        customer_id = next(c for c in self.candidates.customers if len(self.candidates.candidates(c)[0]) > 2)
+        products, X = self.candidates.candidates(customer_id)
+        raw_p1 = api.score_raw(X)[0]
+        # Every candidate scales past 1, so the served probabilities all tie
+        with mock.patch.object(api.PREDICTOR, 'scale_p1', 2 / raw_p1.min()):
+            body = self.client.get(f"/recommend/{customer_id}", params={"k": 2}).json()
+        self.assertEqual([item["buy_1w_prob"] for item in body["recommendations"]], [1.0, 1.0])
+        self.assertEqual([item["product_unit_variant_id"] for item in body["recommendations"]],
+                         products[np.argsort(-raw_p1)[:2]].tolist())
+
+    def test_new_candidates_use_metadata_categoricals(self):
+        cat_cols = self.pipe['cat_cols']
+        sku = self.pipe['sku'].set_index("product_unit_variant_id")
+        encoder = self.pipe['encoder']
+        checked = 0
+        for customer_id in self.candidates.customers:
+            products, X = self.candidates.candidates(customer_id)
+            for product, row in zip(products.tolist(), X):
+                if (customer_id, product) in self.index:
+                    continue
+                values = pd.Series(row, index=self.pipe['features'])
+                self.assertEqual(values["grade_name"],
+                                 encoder.transform_column("grade_name", pd.Series([sku.loc[product, "grade_name"]]))[0])
+                self.assertFalse(np.isnan(values[FEATURE_COLS]).any())
+                checked += 1
+        self.assertIn("grade_name", cat_cols)
+        self.assertGreater(checked, 0)
+
+    def test_recommend_rejects_unknown_customer_and_bad_k(self):
+        self.assertEqual(self.client.get("/recommend/-1").status_code, 404)
+        customer_id = int(self.pipe['test']["customer_id"].iloc[0])
+        self.assertEqual(self.client.get(f"/recommend/{customer_id}", params={"k": 0}).status_code, 422)
+
+    def test_cache_serves_repeats_until_history_or_model_changes(self):
+        item = self.pair_payloads()[0]
+        api.CACHE = PredictionCache(max_size=100)
+        try:
+            first = self.client.post("/predict", json=item).json()
+            self.assertEqual(self.client.post("/predict", json=item).json(), first)
+            self.assertEqual((api.CACHE.hits, api.CACHE.misses), (1, 1))
+
+            newer = {**item, "historical_data": [{"week_start": "2030-01-07", "qty_this_week": 5.0}]}
+            self.client.post("/predict", json=newer)
+            self.assertEqual(api.CACHE.misses, 2)
+
+            batch = self.client.post("/predict/batch", json={"items": self.pair_payloads()[:3]}).json()
+            self.assertEqual({k: batch["predictions"][0][k] for k in TARGETS}, first)
+            self.assertEqual(api.CACHE.hits, 2)
+
+            api.ARTIFACTS = api.ARTIFACTS._replace(version="republished")
+            self.client.post("/predict", json=item)
+            self.assertEqual(api.CACHE.hits, 2)
+            self.assertEqual(self.client.get("/").json()["cache"]["misses"], api.CACHE.misses)
+        finally:
+            api.CACHE = None
+            api.ARTIFACTS = api.ARTIFACTS._replace(version=None)
+
+    def test_requests_finish_on_the_snapshot_they_started_with(self):
+        item = self.pair_payloads()[0]
+        before = self.client.post("/predict", json=item).json()
+        served = api.ARTIFACTS
+        swapped = api.Artifacts(models=None, feature_index=None, candidate_index=None)
+        scored = []
+
+        def score_then_swap(X, models=None):
+            # A reload landing mid-request must not change the models it scores with
+            api.ARTIFACTS = swapped
+            scored.append(models)
+            return original(X, models)
+
+        original = api.score
+        api.score = score_then_swap
+        try:
+            self.assertEqual(self.client.post("/predict", json=item).json(), before)
+            self.assertIs(scored[0], served.models)
+            self.assertEqual(self.client.post("/predict", json=item).status_code, 503)
+        finally:
+            api.score = original
+            api.ARTIFACTS = served
+
+    def test_indexes_load_memory_mapped(self):
+        item = self.pair_payloads()[0]
+        pair = (item["customer_id"], item["product_unit_variant_id"])
+        index_path = f"{self.tmp.name}/index.pkl"
+        candidates_path = f"{self.tmp.name}/candidates.pkl"
+        self.index.save(index_path)
+        self.candidates.save(candidates_path)
+
+        mapped = FeatureIndex.load(index_path, mmap_mode="r")
+        self.assertIsInstance(mapped.matrix, np.memmap)
+        self.assertFalse(mapped.matrix.flags.writeable)
+        history = [{"week_start": "2030-01-07", "qty_this_week": 5.0}]
+        np.testing.assert_array_equal(mapped.vector(*pair, history), self.index.vector(*pair, history))
+
+        mapped = CandidateIndex.load(candidates_path, mmap_mode="r")
+        self.assertIsInstance(mapped.matrix, np.memmap)
+        np.testing.assert_array_equal(mapped.candidates(pair[0])[1], self.candidates.candidates(pair[0])[1])
+
+    def test_metrics_report_process_memory(self):
+        process = self.client.get("/metrics").json()["process"]
+        self.assertEqual(process["pid"], self.client.get("/").json()["pid"])
+        self.assertGreater(process["rss_mb"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
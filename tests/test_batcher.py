@@ -0,0 +1,70 @@
+import threading
+import unittest
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from src.models.batcher import MicroBatcher
+
+
+class TestMicroBatcher(unittest.TestCase):
+    def test_concurrent_requests_share_one_call(self):
+        calls = []
+
+        def score(X):
+            calls.append(len(X))
+            return {"double": X[:, 0] * 2, "sum": X.sum(axis=1)}
+
+        batcher = MicroBatcher(score, window_ms=50.0, max_batch_size=100)
+        barrier = threading.Barrier(10)
+
+        def submit(i):
+            barrier.wait()
+            return batcher.submit(np.array([[i, 1.0]]))
+
+        try:
+            with ThreadPoolExecutor(max_workers=10) as pool:
+                results = list(pool.map(submit, range(10)))
+        finally:
+            batcher.close()
+
+        for i, out in enumerate(results):
+            self.assertEqual(out["double"].tolist(), [2.0 * i])
+            self.assertEqual(out["sum"].tolist(), [i + 1.0])
+        self.assertEqual(sum(calls), 10)
+        self.assertLess(len(calls), 10)
+
+    def test_max_batch_size_splits_batches(self):
+        calls = []
+
+        def score(X):
+            calls.append(len(X))
+            return {"x": X[:, 0]}
+
+        batcher = MicroBatcher(score, window_ms=50.0, max_batch_size=3)
+        try:
+            with ThreadPoolExecutor(max_workers=6) as pool:
+                list(pool.map(lambda i: batcher.submit(np.array([[float(i)]])), range(6)))
+        finally:
+            batcher.close()
+        self.assertTrue(all(n <= 3 for n in calls))
+        self.assertEqual(sum(calls), 6)
+
+    def test_errors_reach_every_caller(self):
+        def score(X):
+            raise ValueError("boom")
+
+        batcher = MicroBatcher(score, window_ms=1.0)
+        try:
+            with self.assertRaises(ValueError):
+                batcher.submit(np.zeros((1, 2)))
+        finally:
+            batcher.close()
+
+    def test_closed_batcher_rejects_requests(self):
+        batcher = MicroBatcher(lambda X: {"x": X[:, 0]})
+        batcher.close()
+        with self.assertRaises(RuntimeError):
+            batcher.submit(np.zeros((1, 1)))
+
+
+if __name__ == '__main__':
+    unittest.main()
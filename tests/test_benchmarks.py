@@ -0,0 +1,66 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+import pandas as pd
+import yaml
+from benchmarks import run_benchmarks
+from benchmarks.synthetic import SCALES, TRAIN_COLUMNS, TEST_COLUMNS, write_csvs
+from src.data.loader import DataLoader
+from src.features.engineer import FeatureEngineer
+from tests.test_loader import CONFIG_PATH
+
+
+class TestSyntheticData(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        with open(CONFIG_PATH) as f:
+            config = yaml.safe_load(f)
+        self.paths = write_csvs(self.tmp.name, **SCALES['tiny'])
+        self.config = {
+            'paths': self.paths,
+            'data_cache': {'enabled': False, 'dir': None},
+            'schema': config['schema'],
+        }
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_files_follow_competition_layout(self):
+        self.assertEqual(list(pd.read_csv(self.paths['train_data'], nrows=1).columns), TRAIN_COLUMNS)
+        self.assertEqual(list(pd.read_csv(self.paths['test_data'], nrows=1).columns), TEST_COLUMNS)
+        self.assertEqual(list(pd.read_csv(self.paths['customer_data'], nrows=1).columns),
+                         list(pd.read_csv('customer_data.csv', nrows=1).columns))
+        self.assertEqual(list(pd.read_csv(self.paths['sku_data'], nrows=1).columns),
+                         list(pd.read_csv('sku_data.csv', nrows=1).columns))
+
+    def test_pipeline_prefers_denormalized_attributes(self):
+        train, test, customer, sku = DataLoader(self.config).load_all()
+        self.assertIsInstance(train['grade_name'].dtype, pd.CategoricalDtype)
+        self.assertGreater(test['week_start'].min(), train['week_start'].max())
+        engineer = FeatureEngineer(engine="vectorized")
+        train, test, feature_cols = engineer.engineer_features(train, test)
+        _, _, cat_cols = engineer.preprocess_metadata(train, test, customer, sku, feature_cols)
+        self.assertEqual(cat_cols, ['customer_category_x', 'customer_status_x', 'grade_name_x', 'unit_name_x'])
+
+
+class TestRunBenchmarks(unittest.TestCase):
+    def test_writes_json_report(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            out = os.path.join(tmp, 'result.json')
+            argv = ['run_benchmarks.py', '--scale', 'tiny', '--stages', 'load,preprocess', '--output', out,
+                    '--set', 'model.n_estimators=5']
+            with mock.patch('sys.argv', argv):
+                run_benchmarks.main()
+            with open(out) as f:
+                report = json.load(f)
+        self.assertEqual(sorted(report['stages']), ['load', 'preprocess'])
+        self.assertEqual(report['overrides']['model.n_estimators'], 5)
+        for metrics in report['stages'].values():
+            self.assertGreater(metrics['rows'], 0)
+            self.assertGreaterEqual(metrics['peak_rss_mb'], metrics['rss_before_mb'])
+
+
+if __name__ == '__main__':
+    unittest.main()
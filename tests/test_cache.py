@@ -0,0 +1,36 @@
+import time
+import unittest
+from src.models.cache import PredictionCache
+
+
+class TestPredictionCache(unittest.TestCase):
+    def test_hits_misses_and_lru_eviction(self):
+        cache = PredictionCache(max_size=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.put("c", 3)  # evicts "b", the least recently used
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), 3)
+        snapshot = cache.snapshot()
+        self.assertEqual((snapshot['hits'], snapshot['misses'], snapshot['evictions']), (2, 1, 1))
+        self.assertEqual(snapshot['size'], 2)
+
+    def test_ttl_expires_entries(self):
+        cache = PredictionCache(max_size=10, ttl_s=0.01)
+        cache.put("a", 1)
+        time.sleep(0.02)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(len(cache), 0)
+
+    def test_clear_drops_everything(self):
+        cache = PredictionCache(max_size=10)
+        for i in range(5):
+            cache.put(i, i)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+        self.assertIsNone(cache.get(0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,179 @@
+import tracemalloc
+import unittest
+import pandas as pd
+import numpy as np
+from sklearn.preprocessing import LabelEncoder
+from src.features.encoders import CategoryEncoder, UNSEEN
+from src.features import kernels
+from src.features.engineer import ENGINES, FeatureEngineer, FEATURE_COLS, customer_shards, join_metadata
+from src.monitoring.memory import peak_rss_mb, reset_peak_rss, rss_mb
+
+
+def make_transactions(n_customers=12, n_products=9, n_weeks=14, n_test_weeks=1, seed=0):
+    """Builds a small sparse transaction panel shaped like Train.csv / Test.csv."""
+    rng = np.random.default_rng(seed)
+    weeks = pd.date_range("2024-01-01", periods=n_weeks + n_test_weeks, freq="7D")
+    rows = []
+    for c in range(n_customers):
+        for p in rng.choice(n_products, size=rng.integers(1, n_products), replace=False):
+            first = rng.integers(0, n_weeks + n_test_weeks)
+            for w in weeks[first:]:
+                qty = float(rng.integers(1, 20)) if rng.random() < 0.3 else 0.0
+                rows.append((1000 + c, 500 + p, w, qty))
+    df = pd.DataFrame(rows, columns=["customer_id", "product_unit_variant_id", "week_start", "qty_this_week"])
+    df["customer_id"] = df["customer_id"].astype("int32")
+    df["product_unit_variant_id"] = df["product_unit_variant_id"].astype("int32")
+    df["qty_this_week"] = df["qty_this_week"].astype("float32")
+    df = df.sample(frac=1.0, random_state=seed).reset_index(drop=True)
+    df["ID"] = np.arange(len(df))
+
+    is_test = df["week_start"] >= weeks[n_weeks]
+    train = df[~is_test].reset_index(drop=True)
+    test = df[is_test].drop(columns=["qty_this_week"]).reset_index(drop=True)
+    return train, test
+
+
+class TestFeatureEngineer(unittest.TestCase):
+    def setUp(self):
+        self.train, self.test = make_transactions()
+
+    def test_unknown_engine_rejected(self):
+        with self.assertRaises(ValueError):
+            FeatureEngineer(engine="spark")
+
+    def test_vectorized_matches_pandas(self):
+        """The NumPy kernels must reproduce the reference groupby features."""
+        ref_train, ref_test, ref_cols = FeatureEngineer(engine="pandas").engineer_features(self.train, self.test)
+        vec_train, vec_test, vec_cols = FeatureEngineer(engine="vectorized").engineer_features(self.train, self.test)
+
+        self.assertEqual(ref_cols, FEATURE_COLS)
+        self.assertEqual(vec_cols, ref_cols)
+        for ref, vec in ((ref_train, vec_train), (ref_test, vec_test)):
+            self.assertEqual(list(vec.columns), list(ref.columns))
+            pd.testing.assert_frame_equal(vec, ref, check_dtype=False, rtol=1e-9)
+
+    def test_targets_match_sorted_groupby_shift(self):
+        """Targets found through the key order equal a per-pair shift of the sorted frame, without reordering."""
+        train, _, _ = FeatureEngineer(engine="vectorized").engineer_features(self.train, self.test)
+        got = FeatureEngineer().generate_targets(train)
+        pd.testing.assert_index_equal(got.index, train.index)
+
+        ref = train.sort_values(["customer_id", "product_unit_variant_id", "week_start"])
+        grp = ref.groupby(["customer_id", "product_unit_variant_id"])["qty_this_week"]
+        for weeks in (1, 2):
+            expected = grp.shift(-weeks).fillna(0)
+            np.testing.assert_array_equal(got.loc[ref.index, f"target_qty_{weeks}w"].to_numpy(), expected.to_numpy())
+            np.testing.assert_array_equal(got.loc[ref.index, f"target_buy_{weeks}w"].to_numpy(),
+                                          (expected > 0).astype(int).to_numpy())
+
+    def test_sharded_matches_single_process(self):
+        """Customer shards reassemble into exactly the single-process features."""
+        self.train, self.test = make_transactions(n_customers=30, n_products=9, n_weeks=14)
+        for engine in ENGINES:
+            expected = FeatureEngineer(engine=engine).engineer_features(self.train, self.test)
+            sharded = FeatureEngineer(engine=engine, shards=3).engineer_features(self.train, self.test)
+            self.assertEqual(sharded[2], expected[2])
+            for got, want in zip(sharded[:2], expected[:2]):
+                pd.testing.assert_frame_equal(got, want)
+
+    def test_customer_shards_are_contiguous_and_balanced(self):
+        customers = np.repeat(np.arange(20), 10)[::-1]
+        shard = customer_shards(customers, 4)
+        order = np.argsort(customers, kind="stable")
+        self.assertTrue((np.diff(shard[order]) >= 0).all())
+        self.assertEqual(np.bincount(shard).tolist(), [50, 50, 50, 50])
+        self.assertEqual(customer_shards(np.array([7, 7, 7]), 4).tolist(), [0, 0, 0])
+
+
+class TestKernels(unittest.TestCase):
+    def test_expanding_mean_restarts_per_segment_on_long_series(self):
+        """Huge early segments must not cost a late segment its precision."""
+        rng = np.random.default_rng(0)
+        lengths = [5000] * 40 + [300]
+        segment = np.repeat(np.arange(len(lengths)), lengths)
+        values = np.where(segment < 40, rng.uniform(1e14, 1e15, len(segment)), rng.integers(0, 20, len(segment)))
+        pos = kernels.segment_positions(kernels.segment_starts(segment))
+
+        got = kernels.segment_expanding_mean(values, pos)
+        expected = pd.Series(values).groupby(segment).transform(lambda x: x.shift(1).expanding().mean())
+        np.testing.assert_allclose(got, expected.to_numpy(), rtol=1e-9)
+
+
+class TestFeatureMemory(unittest.TestCase):
+    """Memory regression guard for feature engineering and target generation."""
+    # Budget for memory allocated on top of the inputs, per Train + Test row.
+    # Sorting, features, alignment and targets stay well under it; one more
+    # full copy of the frames (e.g. a key merge or re-sort) would not.
+    PEAK_BYTES_PER_ROW = 400
+
+    def setUp(self):
+        self.train, self.test = make_transactions(n_customers=300, n_products=30, n_weeks=30, seed=1)
+        self.rows = len(self.train) + len(self.test)
+
+    def run_pipeline(self):
+        engineer = FeatureEngineer(engine="vectorized")
+        train, test, _ = engineer.engineer_features(self.train, self.test)
+        return engineer.generate_targets(train), test
+
+    def test_peak_memory_per_row(self):
+        exact_rss = reset_peak_rss()
+        rss_before = rss_mb()
+        tracemalloc.start()
+        try:
+            train, test = self.run_pipeline()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        peak_rss_growth = (peak_rss_mb() - rss_before) * 2**20
+
+        budget = self.PEAK_BYTES_PER_ROW * self.rows
+        self.assertLess(peak, budget, f"peak {peak / self.rows:.0f} bytes/row over {self.rows} rows, "
+                                      f"peak RSS growth {peak_rss_growth / 2**20:.1f} MB")
+        if exact_rss:
+            # RSS also counts allocator and page granularity
+            self.assertLess(peak_rss_growth, budget + 32 * 2**20)
+
+    def test_input_columns_are_shared_not_copied(self):
+        train, test = self.run_pipeline()
+        for out, source in ((train, self.train), (test, self.test)):
+            pd.testing.assert_index_equal(out.index, source.index)
+            for col in source.columns:
+                self.assertTrue(np.shares_memory(out[col].to_numpy(), source[col].to_numpy()), col)
+        self.assertNotIn("lag1", self.train.columns)
+        self.assertEqual(train["lag1"].dtype, np.float32)
+
+
+class TestCategoryEncoder(unittest.TestCase):
+    def setUp(self):
+        self.train = pd.DataFrame({"grade": pd.Categorical(["B", "A", None, "B"]), "unit": ["kg", "box", "kg", np.nan]})
+        self.test = pd.DataFrame({"grade": pd.Categorical(["C", "A"]), "unit": ["bag", "kg"]})
+
+    def test_codes_match_label_encoder(self):
+        encoder = CategoryEncoder().fit([self.train, self.test], ["grade", "unit"])
+        for col in ("grade", "unit"):
+            # Missing values labelled 'nan', as astype(str) did before pandas 3
+            labels = [frame[col].astype(object).fillna('nan').astype(str) for frame in (self.train, self.test)]
+            expected = LabelEncoder().fit(pd.concat(labels))
+            self.assertEqual(encoder.classes[col].tolist(), expected.classes_.tolist())
+            for frame, frame_labels in zip((self.train, self.test), labels):
+                np.testing.assert_array_equal(encoder.transform_column(col, frame[col]),
+                                              expected.transform(frame_labels))
+
+    def test_unseen_labels_and_round_trip(self):
+        encoder = CategoryEncoder.from_dict(CategoryEncoder().fit([self.train], ["grade", "unit"]).to_dict())
+        np.testing.assert_array_equal(encoder.transform_column("grade", self.test["grade"]), [UNSEEN, 0])
+        np.testing.assert_array_equal(encoder.transform_column("unit", self.test["unit"]), [UNSEEN, 1])
+
+
+class TestJoinMetadata(unittest.TestCase):
+    def test_matches_left_merge(self):
+        frame = pd.DataFrame({"customer_id": [3, 1, 9, 1], "status": ["a", "b", "c", "d"], "qty": [1.0, 2.0, 3.0, 4.0]})
+        meta = pd.DataFrame({"customer_id": [1, 3], "status": ["x", "y"],
+                             "created": pd.to_datetime(["2024-01-01", "2024-02-01"])})
+        joined = join_metadata(frame, meta, "customer_id")
+        pd.testing.assert_frame_equal(joined, frame.merge(meta, on="customer_id", how="left"))
+        self.assertEqual(list(frame.columns), ["customer_id", "status", "qty"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,15 @@
+import json
+import os
+import tempfile
 import unittest
 import pandas as pd
 import numpy as np
+import yaml
 from src.data.loader import DataLoader
 
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'config', 'config.yaml')
+
+
 class TestDataLoader(unittest.TestCase):
     def setUp(self):
         # Dummy configuration for testing
@@ -12,7 +19,9 @@ class TestDataLoader(unittest.TestCase):
                 'test_data': 'dummy_test.csv',
                 'customer_data': 'dummy_cust.csv',
                 'sku_data': 'dummy_sku.csv'
-            }
+            },
+            'data_cache': {'enabled': False, 'dir': None},
+            'schema': {},
         }
         self.loader = DataLoader(self.config)
 
@@ -22,11 +31,119 @@ class TestDataLoader(unittest.TestCase):
             'float_col': np.array([1.1, 2.2, 3.3], dtype='float64'),
             'int_col': np.array([1, 2, 3], dtype='int64')
         })
-        
+
         downcasted_df = self.loader._downcast_memory(df)
-        
+
         self.assertEqual(downcasted_df['float_col'].dtype, 'float32')
         self.assertEqual(downcasted_df['int_col'].dtype, 'int32')
 
+
+def write_tables(tmp):
+    """Small CSVs in the competition layout, with one extra unused Train column."""
+    paths = {name: os.path.join(tmp, f"{name}.csv") for name in ('train_data', 'test_data', 'customer_data', 'sku_data')}
+    pd.DataFrame({
+        'customer_id': [1, 1, 2, 3, 2], 'product_unit_variant_id': [7, 8, 7, 8, 8],
+        'week_start': ['2024-01-01', '2024-01-08', '2024-01-01', '2024-01-08', '2024-01-08'],
+        'qty_this_week': [1.5, 0.0, 3.0, 2.0, 1.0], 'unused': ['a', 'b', 'c', 'd', 'e'],
+    }).to_csv(paths['train_data'], index=False)
+    pd.DataFrame({
+        'ID': ['1_7_2024-01-15', '2_8_2024-01-15'], 'customer_id': [1, 2], 'product_unit_variant_id': [7, 8],
+        'week_start': ['2024-01-15', '2024-01-15'],
+    }).to_csv(paths['test_data'], index=False)
+    pd.DataFrame({
+        'customer_id': [1, 2, 3], 'customer_category': ['A', None, 'B'], 'customer_status': ['S1', 'S2', 'S1'],
+        'customer_created_at': ['2023-01-01 10:00:00', '2023-02-01 11:30:00', '2023-03-01 00:00:00'],
+    }).to_csv(paths['customer_data'], index=False)
+    pd.DataFrame({
+        'product_name': ['N1', 'N2'], 'product_grade_variant_sku': ['B01', 'B02'], 'product_unit_variant_id': [7, 8],
+        'unit_name': ['kg', 'box'], 'grade_name': ['G1', 'G2'], 'grade_active_status': [True, False],
+    }).to_csv(paths['sku_data'], index=False)
+    return paths
+
+
+class TestDataLoaderSchema(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        with open(CONFIG_PATH) as f:
+            self.schema = yaml.safe_load(f)['schema']
+        self.config = {
+            'paths': write_tables(self.tmp.name),
+            'data_cache': {'enabled': False, 'dir': None},
+            'schema': self.schema,
+        }
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_schema_types_columns_on_read(self):
+        train, test, customer, sku = DataLoader(self.config).load_all()
+        # Listed columns the file lacks (the denormalized attributes) are skipped
+        self.assertEqual(list(train.columns), ['customer_id', 'product_unit_variant_id', 'week_start', 'qty_this_week'])
+        self.assertEqual(train['customer_id'].dtype, 'int32')
+        self.assertEqual(train['qty_this_week'].dtype, 'float32')
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(test['week_start']))
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(customer['customer_created_at']))
+        self.assertIsInstance(customer['customer_category'].dtype, pd.CategoricalDtype)
+        self.assertTrue(customer['customer_category'].isna().iloc[1])
+        self.assertIsInstance(sku['grade_name'].dtype, pd.CategoricalDtype)
+        self.assertEqual(sku['grade_active_status'].dtype, bool)
+
+    def test_chunked_read_matches_single_pass(self):
+        whole = DataLoader(self.config).load_all()
+        schema = {name: {**table, 'chunksize': 2} for name, table in self.schema.items()}
+        chunked = DataLoader({**self.config, 'schema': schema}).load_all()
+        for got, want in zip(chunked, whole):
+            pd.testing.assert_frame_equal(got, want)
+
+    def test_table_without_schema_is_downcast(self):
+        train = DataLoader({**self.config, 'schema': {**self.schema, 'train': {}}}).load_all()[0]
+        self.assertIn('unused', train.columns)
+        self.assertEqual(train['qty_this_week'].dtype, 'float32')
+
+
+class TestDataLoaderCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.paths = write_tables(self.tmp.name)
+        with open(CONFIG_PATH) as f:
+            self.schema = yaml.safe_load(f)['schema']
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def loader(self, enabled=True, schema=None):
+        return DataLoader({
+            'paths': self.paths,
+            'data_cache': {'enabled': enabled, 'dir': os.path.join(self.tmp.name, 'cache')},
+            'schema': schema or self.schema,
+        })
+
+    def test_cache_hit_matches_csv_parse(self):
+        expected = self.loader(enabled=False).load_all()
+        self.loader().load_all()
+        self.assertTrue(os.path.exists(os.path.join(self.tmp.name, 'cache', 'train.feather')))
+        for got, want in zip(self.loader().load_all(), expected):
+            pd.testing.assert_frame_equal(got, want)
+
+    def test_changed_csv_invalidates_cache(self):
+        self.loader().load_all()
+        train = pd.read_csv(self.paths['train_data'])
+        train.loc[0, 'qty_this_week'] = 9.0
+        train.to_csv(self.paths['train_data'], index=False)
+        self.assertEqual(self.loader().load_all()[0]['qty_this_week'].iloc[0], 9.0)
+
+    def test_touched_csv_still_hits(self):
+        self.loader().load_all()
+        stat = os.stat(self.paths['sku_data'])
+        os.utime(self.paths['sku_data'], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        loader = self.loader()
+        self.assertIsNotNone(loader.cache.get('sku', self.paths['sku_data'], json.dumps(self.schema['sku'], sort_keys=True)))
+
+    def test_changed_schema_invalidates_cache(self):
+        self.loader().load_all()
+        schema = {**self.schema, 'train': {**self.schema['train'], 'usecols': None}}
+        self.assertIn('unused', self.loader(schema=schema).load_all()[0].columns)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,122 @@
+import tempfile
+import tracemalloc
+import unittest
+import numpy as np
+import pandas as pd
+from src.features.engineer import FeatureEngineer
+from src.models.matrix import FeatureMatrix
+from src.models.trainer import ModelTrainer
+from tests.test_engineer import make_transactions
+from tests.test_predictor import make_config, make_metadata
+
+
+def make_frame(n_rows=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'lag1': rng.gamma(2.0, 2.0, n_rows).astype(np.float32),
+        'month': rng.integers(1, 13, n_rows),
+        'grade': rng.integers(-1, 3, n_rows),
+        'unit': rng.integers(0, 5, n_rows),
+    })
+
+
+def peak_bytes(fn):
+    """Peak bytes traced while running `fn`, and its result."""
+    tracemalloc.start()
+    try:
+        result = fn()
+        return tracemalloc.get_traced_memory()[1], result
+    finally:
+        tracemalloc.stop()
+
+
+class TestFeatureMatrix(unittest.TestCase):
+    def setUp(self):
+        self.frame = make_frame()
+        self.features = ['lag1', 'month', 'grade', 'unit']
+        self.matrix = FeatureMatrix.from_frame(self.frame, self.features, ['grade', 'unit'])
+
+    def test_one_float32_array_and_integer_codes(self):
+        values = self.matrix.values
+        self.assertEqual(values.dtype, np.float32)
+        self.assertTrue(values.flags.c_contiguous)
+        np.testing.assert_array_equal(values, self.frame[self.features].to_numpy(dtype=np.float32))
+        self.assertEqual(self.matrix.codes.dtype, np.int32)
+        np.testing.assert_array_equal(self.matrix.codes, self.frame[['grade', 'unit']].to_numpy())
+        with self.assertRaises(ValueError):
+            FeatureMatrix.from_frame(self.frame, self.features, ['month'])
+
+    def test_contiguous_rows_are_views(self):
+        mask = np.zeros(len(self.frame), dtype=bool)
+        mask[100:700] = True
+        view = self.matrix.rows(mask)
+        self.assertTrue(np.shares_memory(view.values, self.matrix.values))
+        self.assertTrue(np.shares_memory(view.codes, self.matrix.codes))
+        self.assertEqual(view.nbytes, 0)
+        np.testing.assert_array_equal(view.values, self.matrix.values[mask])
+
+        mask[800] = True
+        gathered = self.matrix.rows(mask)
+        self.assertFalse(np.shares_memory(gathered.values, self.matrix.values))
+        np.testing.assert_array_equal(gathered.values, self.matrix.values[mask])
+        self.assertEqual(len(self.matrix.rows(np.zeros(len(self.frame), dtype=bool))), 0)
+
+    def test_pool_reads_codes_as_categories(self):
+        pool = self.matrix.pool(label=np.arange(len(self.frame)) % 2)
+        self.assertEqual(pool.num_row(), len(self.frame))
+        self.assertEqual(pool.get_cat_feature_indices(), [2, 3])
+        self.assertEqual(pool.get_feature_names(), self.features)
+
+    def test_allocations(self):
+        """Building copies the features once; row views allocate no feature data."""
+        peak, matrix = peak_bytes(lambda: FeatureMatrix.from_frame(self.frame, self.features, ['grade', 'unit']))
+        column = len(self.frame) * 8
+        self.assertLessEqual(peak, matrix.nbytes + column + 4096)
+        self.assertLess(matrix.nbytes, self.frame[self.features].to_numpy(dtype=np.float64).nbytes)
+
+        mask = np.zeros(len(self.frame), dtype=bool)
+        mask[:500] = True
+        peak, _ = peak_bytes(lambda: matrix.rows(mask))
+        self.assertLess(peak, 500 * (matrix.values.shape[1] + matrix.codes.shape[1]) * 4)
+
+
+class TestTrainingMatrices(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        raw_train, raw_test = make_transactions()
+        customer, sku = make_metadata(raw_train, raw_test)
+        engineer = FeatureEngineer(engine="vectorized")
+        train, test, feature_cols = engineer.engineer_features(raw_train, raw_test)
+        train, _, cls.cat_cols = engineer.preprocess_metadata(train, test, customer, sku, feature_cols)
+        cls.train = engineer.generate_targets(train)
+        cls.features = feature_cols + cls.cat_cols
+
+    def test_regressor_rows_are_views_of_the_classifier_matrix(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            data = ModelTrainer(make_config(tmp))._training_data(self.train, self.features, self.cat_cols, None)
+        matrices, labels = data['matrices'], data['labels']
+        # The two horizons' purchases only overlap, so neither set contains the other
+        buy_1w, buy_2w = labels['buy_1w'] == 1, labels['buy_2w'] == 1
+        self.assertTrue((buy_1w & ~buy_2w).any() and (buy_2w & ~buy_1w).any() and (buy_1w & buy_2w).any())
+        for horizon in ('1w', '2w'):
+            pos = matrices[f'pos_{horizon}']
+            self.assertTrue(np.shares_memory(pos.values, matrices['all'].values))
+            self.assertEqual(len(pos), int((self.train[f"target_buy_{horizon}"] == 1).sum()))
+            self.assertEqual(len(labels[f'qty_{horizon}_pos']), len(pos))
+            self.assertTrue((labels[f'qty_{horizon}_pos'] > 0).all())
+            np.testing.assert_array_equal(pos.values, matrices['all'].values[labels[f'buy_{horizon}'] == 1])
+
+    def test_labels_follow_the_row_order(self):
+        train = self.train.assign(row_id=np.arange(len(self.train)))
+        n_num = len(self.features) - len(self.cat_cols)
+        features = self.features[:n_num] + ['row_id'] + self.cat_cols
+        with tempfile.TemporaryDirectory() as tmp:
+            data = ModelTrainer(make_config(tmp))._training_data(train, features, self.cat_cols, None)
+        rows = data['matrices']['all'].values[:, n_num].astype(np.int64)
+        self.assertEqual(sorted(rows), list(range(len(train))))
+        for target in ('buy_1w', 'buy_2w', 'qty_1w', 'qty_2w'):
+            np.testing.assert_array_equal(data['labels'][target], train[f"target_{target}"].to_numpy()[rows])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import json
+import os
+import tempfile
+import unittest
+import numpy as np
+from fastapi.testclient import TestClient
+from src import api
+from src.features.index import FeatureIndex
+from src.models.predictor import ModelPredictor
+from src.monitoring.metrics import LatencyHistogram, RequestMetrics
+from src.monitoring.spans import Tracer
+from tests.test_predictor import make_config, build_pipeline
+
+
+class TestTracer(unittest.TestCase):
+    def test_nested_spans_record_paths_and_rows(self):
+        tracer = Tracer(enabled=True)
+        with tracer.span("features", rows=10):
+            with tracer.span("encode") as current:
+                np.ones(1_000_000).sum()
+                current.rows = 4
+        by_name = {record['name']: record for record in tracer.records}
+        self.assertEqual([record['name'] for record in tracer.records], ["features/encode", "features"])
+        self.assertEqual(by_name["features/encode"]['depth'], 1)
+        self.assertEqual(by_name["features/encode"]['rows'], 4)
+        self.assertEqual(by_name["features"]['rows'], 10)
+        self.assertGreaterEqual(by_name["features"]['wall_s'], by_name["features/encode"]['wall_s'])
+        self.assertGreaterEqual(by_name["features"]['peak_rss_mb'], by_name["features/encode"]['peak_rss_mb'])
+
+    def test_failed_span_is_recorded(self):
+        tracer = Tracer(enabled=True)
+        with self.assertRaises(RuntimeError):
+            with tracer.span("train"):
+                raise RuntimeError("boom")
+        self.assertTrue(tracer.records[0]['failed'])
+
+    def test_disabled_tracer_records_nothing(self):
+        tracer = Tracer(enabled=False)
+        with tracer.span("train") as current:
+            current.rows = 5
+        self.assertEqual(tracer.records, [])
+
+    def test_profile_toggle_writes_cprofile_stats(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            tracer = Tracer(profile_stages=["full/train"], profile_dir=tmp)
+            with tracer.span("full"):
+                with tracer.span("train"):
+                    sum(range(1000))
+                with tracer.span("predict"):
+                    pass
+            self.assertEqual(os.listdir(tmp), ["full.train.prof"])
+            self.assertEqual(tracer.records, [])
+
+    def test_save_writes_json_report(self):
+        tracer = Tracer(enabled=True)
+        with tracer.span("load", rows=3):
+            pass
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'out', 'spans.json')
+            tracer.save(path)
+            with open(path) as f:
+                self.assertEqual(json.load(f)['spans'][0]['name'], "load")
+
+
+class TestMetrics(unittest.TestCase):
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = LatencyHistogram(buckets_ms=(1, 10))
+        for ms in (0.5, 1.0, 5.0, 50.0):
+            histogram.observe(ms)
+        snapshot = histogram.snapshot()
+        self.assertEqual(snapshot['buckets'], {'le_1': 2, 'le_10': 3, 'le_inf': 4})
+        self.assertEqual(snapshot['count'], 4)
+        self.assertEqual(snapshot['max_ms'], 50.0)
+
+    def test_request_metrics_count_server_errors(self):
+        metrics = RequestMetrics()
+        metrics.observe("POST /predict", 3.0, 200)
+        metrics.observe("POST /predict", 4.0, 500)
+        metrics.observe("POST /predict", 1.0, 404)
+        entry = metrics.snapshot()["POST /predict"]
+        self.assertEqual(entry['errors'], 1)
+        self.assertEqual(entry['status'], {'200': 1, '404': 1, '500': 1})
+        self.assertEqual(entry['latency']['count'], 3)
+
+
+class TestMetricsEndpoint(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.config = make_config(cls.tmp.name)
+        cls.pipe = build_pipeline(cls.config)
+        api.PREDICTOR = ModelPredictor(cls.config)
+        api.ARTIFACTS = api.Artifacts(
+            models=cls.pipe['models'],
+            feature_index=FeatureIndex.build(cls.pipe['test'], cls.pipe['features'], cls.pipe['cat_cols'],
+                                             cls.pipe['store']),
+        )
+        api.REQUEST_METRICS = RequestMetrics()
+        cls.client = TestClient(api.app)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def test_metrics_report_route_latency_and_scored_rows(self):
+        row = self.pipe['test'].iloc[0]
+        payload = {"customer_id": int(row["customer_id"]), "product_unit_variant_id": int(row["product_unit_variant_id"])}
+        rows_before = api.SCORED_ROWS
+        self.assertEqual(self.client.post("/predict", json=payload).status_code, 200)
+        self.assertEqual(self.client.post("/predict/batch", json={"items": [payload, payload]}).status_code, 200)
+        self.assertEqual(self.client.post("/predict", json={**payload, "customer_id": -1}).status_code, 404)
+
+        metrics = self.client.get("/metrics").json()
+        predict = metrics['endpoints']["POST /predict"]
+        self.assertEqual(predict['latency']['count'], 2)
+        self.assertEqual(predict['status'], {'200': 1, '404': 1})
+        self.assertEqual(metrics['endpoints']["POST /predict/batch"]['latency']['count'], 1)
+        self.assertEqual(metrics['scoring']['rows'] - rows_before, 3)
+        self.assertGreaterEqual(metrics['scoring']['latency']['count'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
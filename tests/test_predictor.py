@@ -0,0 +1,173 @@
+import os
+import tempfile
+import unittest
+import pandas as pd
+import numpy as np
+from src.features.engineer import FeatureEngineer
+from src.features.store import FeatureStore
+from src.models.trainer import ModelTrainer, MODEL_NAMES
+from src.models.predictor import ModelPredictor, _booster
+from tests.test_engineer import make_transactions
+
+
+def make_config(tmp):
+    """Small-model configuration writing every artifact under `tmp`."""
+    return {
+        'paths': {
+            'output_dir': os.path.join(tmp, 'output'),
+            'model_dir': os.path.join(tmp, 'models'),
+            'submission_file': os.path.join(tmp, 'output', 'submission.csv'),
+            'feature_store': os.path.join(tmp, 'models', 'feature_store.pkl'),
+            'feature_index': os.path.join(tmp, 'models', 'feature_index.pkl'),
+            'candidate_index': os.path.join(tmp, 'models', 'candidate_index.pkl'),
+        },
+        'environment': {'deterministic': True},
+        'features': {'engine': 'vectorized', 'shards': 1},
+        'model': {
+            'seeds': [42, 202], 'n_estimators': 10, 'learning_rate': 0.1, 'num_leaves': 8,
+            'feature_fraction': 0.8, 'bagging_fraction': 0.8, 'bagging_freq': 1,
+        },
+        'catboost': {'iterations': 10, 'learning_rate': 0.1, 'depth': 3},
+        'training': {
+            'cores': None, 'n_jobs': 1, 'threads_per_job': 1,
+            'reuse_datasets': True, 'dataset_dir': None,
+        },
+        'validation': {'holdout_weeks': 0, 'early_stopping_rounds': None, 'refit': True},
+        'retraining': {'mode': 'full', 'extra_rounds': 5, 'max_drift': 0.25, 'max_updates': 8},
+        'scaling': {
+            'purchase_1w_scale': 1.15, 'purchase_2w_scale': 1.20,
+            'qty_1w_threshold': 0.015, 'qty_2w_threshold': 0.02,
+        },
+        'ensemble': {'lgbm_weight': 0.5, 'catboost_weight': 0.5},
+        'tuning': {
+            'auc_weight': 0.5, 'weight_grid': [0.0, 1.0, 0.25], 'scale_grid': [0.8, 1.6, 0.05],
+            'threshold_grid': [0.0, 0.1, 0.005], 'overlay': os.path.join(tmp, 'tuned.yaml'),
+        },
+        'selection': {'latency_budget_ms': 5.0, 'batch_rows': 1, 'repeats': 3, 'round_fractions': [0.5, 1.0]},
+        'inference': {'chunk_size': None},
+        'serving': {'recommend': {'top_k': 10, 'max_history': 3, 'n_popular': 2, 'popular_weeks': 4}},
+    }
+
+
+def make_metadata(train, test):
+    """Customer and SKU tables shaped like customer_data.csv / sku_data.csv."""
+    customers = np.union1d(train["customer_id"].unique(), test["customer_id"].unique())
+    products = np.union1d(train["product_unit_variant_id"].unique(), test["product_unit_variant_id"].unique())
+    customer = pd.DataFrame({
+        "customer_id": customers,
+        "customer_category": [f"CUST_CAT_{i % 3:03d}" for i in range(len(customers))],
+        "customer_status": [f"CUST_STAT_{i % 2:03d}" for i in range(len(customers))],
+        "customer_created_at": pd.Timestamp("2023-06-01"),
+    })
+    sku = pd.DataFrame({
+        "product_name": [f"SKU_NAME_{i:04d}" for i in range(len(products))],
+        "product_grade_variant_sku": "B01",
+        "product_unit_variant_id": products,
+        "unit_name": [f"UNIT_{i % 4:03d}" for i in range(len(products))],
+        "grade_name": [f"GRADE_{i % 2:02d}" for i in range(len(products))],
+        "grade_active_status": True,
+    })
+    return customer, sku
+
+
+def build_pipeline(config, **data_kwargs):
+    """
+    Runs feature engineering and training on synthetic data.
+    Returns:
+        dict: train, test, customer, sku, features, cat_cols, store, models and encoder.
+    """
+    raw_train, raw_test = make_transactions(**data_kwargs)
+    customer, sku = make_metadata(raw_train, raw_test)
+    engineer = FeatureEngineer(engine=config['features']['engine'])
+    train, test, feature_cols = engineer.engineer_features(raw_train, raw_test)
+    store = FeatureStore().fit(raw_train)
+    train, test, cat_cols = engineer.preprocess_metadata(train, test, customer, sku, feature_cols)
+    train = engineer.generate_targets(train)
+    features = feature_cols + cat_cols
+    models = ModelTrainer(config).train_hybrid_ensemble(train, features, cat_cols)
+    return {
+        'raw_train': raw_train, 'raw_test': raw_test, 'train': train, 'test': test,
+        'customer': customer, 'sku': sku, 'feature_cols': feature_cols,
+        'features': features, 'cat_cols': cat_cols, 'store': store, 'models': models,
+        'encoder': engineer.encoder,
+    }
+
+
+class TestModelPredictor(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.config = make_config(cls.tmp.name)
+        cls.pipe = build_pipeline(cls.config)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def test_native_inputs_match_dataframe_inputs(self):
+        """Booster/Pool inference equals calling each model on the DataFrame."""
+        models, X = self.pipe['models'], self.pipe['test'][self.pipe['features']]
+        predictor = ModelPredictor(self.config)
+        X_lgb, cb_pool = predictor.ensemble_inputs(models, X)
+        for name in MODEL_NAMES:
+            for model in models[name]:
+                if name.startswith('lgb'):
+                    got, expected = _booster(model).predict(X_lgb), model.predict(X)
+                elif 'clf' in name:
+                    got, expected = model.predict_proba(cb_pool)[:, 1], model.predict_proba(X)[:, 1]
+                else:
+                    got, expected = model.predict(cb_pool), model.predict(X)
+                np.testing.assert_array_equal(got, expected)
+
+    def test_array_inputs_match_dataframe_inputs(self):
+        models, X = self.pipe['models'], self.pipe['test'][self.pipe['features']]
+        predictor = ModelPredictor(self.config)
+        from_frame = predictor.predict_raw(models, *predictor.ensemble_inputs(models, X))
+        from_array = predictor.predict_raw(models, *predictor.ensemble_inputs(models, X.to_numpy(dtype=np.float64)))
+        for a, b in zip(from_frame, from_array):
+            np.testing.assert_array_equal(a, b)
+
+    def test_predict_writes_submission(self):
+        submission = ModelPredictor(self.config).predict(self.pipe['models'], self.pipe['test'], self.pipe['features'])
+        self.assertEqual(len(submission), len(self.pipe['test']))
+        saved = pd.read_csv(self.config['paths']['submission_file'])
+        pd.testing.assert_frame_equal(saved, submission, check_dtype=False)
+
+    def test_streaming_writes_identical_submission(self):
+        predictor = ModelPredictor(self.config)
+        path = self.config['paths']['submission_file']
+        predictor.predict(self.pipe['models'], self.pipe['test'], self.pipe['features'])
+        with open(path, 'rb') as f:
+            expected = f.read()
+        for chunk_size in (1, 7, len(self.pipe['test']) + 5):
+            n = predictor.predict_streaming(self.pipe['models'], self.pipe['test'], self.pipe['features'], chunk_size)
+            self.assertEqual(n, len(self.pipe['test']))
+            with open(path, 'rb') as f:
+                self.assertEqual(f.read(), expected)
+
+    def test_cached_means_write_identical_submission(self):
+        predictor = ModelPredictor(self.config)
+        models, test, features = self.pipe['models'], self.pipe['test'], self.pipe['features']
+        path = self.config['paths']['submission_file']
+        predictor.predict(models, test, features)
+        with open(path, 'rb') as f:
+            expected = f.read()
+        means = predictor.predict_means(models, test, features)
+        for chunk_size in (None, 7):
+            predictor.chunk_size = chunk_size
+            self.assertEqual(predictor.write_submission(test['ID'], means), len(test))
+            with open(path, 'rb') as f:
+                self.assertEqual(f.read(), expected)
+
+    def test_running_seed_means_match_stacked_mean(self):
+        models, X = self.pipe['models'], self.pipe['test'][self.pipe['features']]
+        predictor = ModelPredictor(self.config)
+        X_lgb, cb_pool = predictor.ensemble_inputs(models, X)
+        raw_p1 = predictor.predict_raw(models, X_lgb, cb_pool)[0]
+        lgb_p1 = np.mean([_booster(m).predict(X_lgb) for m in models['lgb_clf1']], axis=0)
+        cb_p1 = np.mean([m.predict_proba(cb_pool)[:, 1] for m in models['cb_clf1']], axis=0)
+        np.testing.assert_array_equal(raw_p1, lgb_p1 * predictor.w_lgb + cb_p1 * predictor.w_cb)
+
+
+if __name__ == '__main__':
+    unittest.main()
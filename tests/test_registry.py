@@ -0,0 +1,91 @@
+import json
+import os
+import tempfile
+import unittest
+import numpy as np
+from src.models.predictor import ModelPredictor
+from src.models.registry import ModelRegistry, config_hash, n_rounds
+from src.models.trainer import ModelTrainer, MODEL_NAMES
+from tests.test_predictor import make_config, build_pipeline
+
+
+class TestModelRegistry(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.config = make_config(cls.tmp.name)
+        cls.pipe = build_pipeline(cls.config)
+        cls.registry = ModelRegistry.for_config(cls.config)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def means(self, models):
+        return ModelPredictor(self.config).predict_means(models, self.pipe['test'], self.pipe['features'])
+
+    def assert_same_means(self, a, b):
+        for name in MODEL_NAMES:
+            np.testing.assert_array_equal(a[name], b[name])
+
+    def test_trainer_publishes_native_files_and_manifest(self):
+        manifest = self.registry.manifest()
+        self.assertEqual(manifest['features'], self.pipe['features'])
+        self.assertEqual(manifest['cat_cols'], self.pipe['cat_cols'])
+        self.assertEqual(manifest['seeds'], self.config['model']['seeds'])
+        self.assertEqual(manifest['config_hash'], config_hash(self.config))
+        self.assertEqual(manifest['encoders'], {})
+        self.assertEqual(manifest['models']['lgb_clf1'], ['lgb_clf1_seed42.txt', 'lgb_clf1_seed202.txt'])
+        self.assertEqual(manifest['models']['cb_reg2'], ['cb_reg2_seed42.cbm', 'cb_reg2_seed202.cbm'])
+        self.assertFalse(os.path.exists(f"{self.registry.directory}.tmp"))
+
+    def test_lazy_load_predicts_like_trained_models(self):
+        models = self.registry.load()
+        self.assertEqual(sum(models[name].n_loaded for name in MODEL_NAMES), 0)
+        self.assert_same_means(self.means(models), self.means(self.pipe['models']))
+        self.assertEqual(models['cb_clf1'].n_loaded, 2)
+
+    def test_loaded_models_report_their_rounds(self):
+        models = self.registry.load(lazy=False)
+        for name in MODEL_NAMES:
+            rounds = [n_rounds(name, model) for model in models[name]]
+            self.assertTrue(all(r > 0 for r in rounds), (name, rounds))
+            self.assertEqual(rounds, [n_rounds(name, model) for model in self.pipe['models'][name]])
+            self.assertEqual(rounds, self.registry.manifest()['rounds'][name])
+
+    def test_parallel_eager_load(self):
+        models = self.registry.load(lazy=False, max_workers=4)
+        for name in MODEL_NAMES:
+            self.assertEqual(models[name].n_loaded, 2)
+        self.assert_same_means(self.means(models), self.means(self.pipe['models']))
+
+    def test_seed_subset_averages_loaded_seeds(self):
+        models = self.registry.load(seeds=[202])
+        first_only = {name: self.pipe['models'][name][1:] for name in MODEL_NAMES}
+        self.assert_same_means(self.means(models), self.means(first_only))
+        with self.assertRaises(ValueError):
+            self.registry.load(seeds=[7])
+
+    def test_sklearn_estimators_round_trip(self):
+        config = make_config(os.path.join(self.tmp.name, 'per_fit'))
+        config['training']['reuse_datasets'] = False
+        models = ModelTrainer(config).train_hybrid_ensemble(
+            self.pipe['train'], self.pipe['features'], self.pipe['cat_cols'], run_key='abc',
+            encoders={'grade_name': ['GRADE_00', 'GRADE_01']},
+        )
+        registry = ModelRegistry.for_config(config)
+        self.assertEqual(registry.run_key(), 'abc')
+        self.assertEqual(registry.encoders(), {'grade_name': ['GRADE_00', 'GRADE_01']})
+        self.assert_same_means(self.means(registry.load()), self.means(models))
+
+    def test_unknown_version_rejected(self):
+        directory = os.path.join(self.tmp.name, 'future')
+        os.makedirs(directory)
+        with open(os.path.join(directory, 'manifest.json'), 'w') as f:
+            json.dump({'version': 99}, f)
+        with self.assertRaises(ValueError):
+            ModelRegistry(directory).load()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from src.models.predictor import ModelPredictor, predict_model
+from src.models.registry import ModelRegistry, _booster
+from src.models.selection import EnsembleSelector
+from src.models.trainer import MODEL_NAMES, holdout_split
+from tests.test_predictor import make_config, build_pipeline
+
+
+class TestEnsembleSelector(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.config = make_config(cls.tmp.name)
+        cls.pipe = build_pipeline(cls.config)
+        cls.registry = ModelRegistry.for_config(cls.config)
+        train = cls.pipe['train']
+        start, unlabelled = holdout_split(train["week_start"], 3)
+        cls.holdout = train[(train["week_start"] >= start) & (train["week_start"] < unlabelled)]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def means(self, models):
+        return ModelPredictor(self.config).predict_means(models, self.pipe['test'], self.pipe['features'])
+
+    def select(self, budget_ms):
+        config = {**self.config, 'selection': {**self.config['selection'], 'latency_budget_ms': budget_ms}}
+        return EnsembleSelector(config).select(self.registry, self.holdout, self.pipe['features'], self.pipe['test'])
+
+    def test_selection_loads_per_family_seeds_and_truncated_trees(self):
+        selection = {'seeds': {'lgb': [202], 'cb': [42, 202]}, 'round_fraction': {'lgb': 0.5, 'cb': 1.0}}
+        models = self.registry.load(selection=selection)
+        self.assertEqual((len(models['lgb_reg1']), len(models['cb_reg1'])), (1, 2))
+
+        means = self.means(models)
+        X = self.pipe['test'][self.pipe['features']]
+        trained = self.pipe['models']
+        np.testing.assert_allclose(means['lgb_clf1'], _booster(trained['lgb_clf1'][1]).predict(X, num_iteration=5))
+        self.assertFalse(np.allclose(means['lgb_clf1'], _booster(trained['lgb_clf1'][1]).predict(X)))
+        full = self.means(self.registry.load())
+        np.testing.assert_allclose(means['cb_clf2'], full['cb_clf2'])
+
+    def test_full_selection_predicts_like_the_full_ensemble(self):
+        seeds = self.config['model']['seeds']
+        selection = {'seeds': {'lgb': seeds, 'cb': seeds}, 'round_fraction': {'lgb': 1.0, 'cb': 1.0}}
+        full, selected = self.means(self.registry.load()), self.means(self.registry.load(selection=selection))
+        for name in MODEL_NAMES:
+            np.testing.assert_allclose(selected[name], full[name])
+
+    def test_budget_bounds_the_selected_ensemble(self):
+        generous = self.select(budget_ms=1e9)
+        self.assertGreaterEqual(generous['holdout']['selected']['objective'],
+                                generous['holdout']['full']['objective'] - 1e-12)
+
+        tight = self.select(budget_ms=0.0)
+        self.assertEqual({f: len(s) for f, s in tight['seeds'].items()}, {'lgb': 1, 'cb': 1})
+        self.assertEqual(len(tight['seed_gains']['lgb']), 2)
+
+        self.registry.save_selection(tight)
+        saved = self.registry.selection()
+        self.assertEqual(saved['seeds'], tight['seeds'])
+        models = self.registry.load(selection=saved)
+        self.assertEqual(models['lgb_clf1'].round_fraction, tight['round_fraction']['lgb'])
+        self.assertNotEqual(self.registry.model_version(saved), self.registry.model_version())
+
+    def test_selection_of_another_ensemble_is_ignored(self):
+        config = make_config(os.path.join(self.tmp.name, 'republished'))
+        registry = ModelRegistry.for_config(config)
+        registry.save(self.pipe['models'], config)
+        registry.save_selection({'seeds': {'lgb': [42], 'cb': [42]}, 'round_fraction': {'lgb': 1.0, 'cb': 1.0}})
+        self.assertIsNotNone(registry.selection())
+        registry.save(self.pipe['models'], config, run_key='next')
+        self.assertIsNone(registry.selection())
+
+    def test_predict_model_matches_untruncated_predictions(self):
+        X = self.pipe['test'][self.pipe['features']]
+        X_lgb, cb_pool = ModelPredictor(self.config).ensemble_inputs(self.pipe['models'], X)
+        for name in MODEL_NAMES:
+            model = self.pipe['models'][name][0]
+            np.testing.assert_allclose(predict_model(name, model, X_lgb, cb_pool, 1.0),
+                                       predict_model(name, model, X_lgb, cb_pool))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+import pandas as pd
+import yaml
+import main
+from src.models.predictor import ModelPredictor
+from src.models.registry import ModelRegistry
+from src.models.trainer import ModelTrainer
+from src.pipeline.stages import StageRunner
+from tests.test_engineer import make_transactions
+from tests.test_loader import CONFIG_PATH
+from tests.test_predictor import make_config, make_metadata
+
+
+class TestStageRunner(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.runner = StageRunner(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_key_depends_on_every_part(self):
+        key = self.runner.key('train', 'upstream', {'a': 1, 'b': 2})
+        self.assertEqual(key, self.runner.key('train', 'upstream', {'b': 2, 'a': 1}))
+        self.assertNotEqual(key, self.runner.key('train', 'upstream', {'a': 1, 'b': 3}))
+        self.assertNotEqual(key, self.runner.key('predict', 'upstream', {'a': 1, 'b': 2}))
+
+    def test_stored_stage_is_not_rerun(self):
+        fn = mock.Mock(return_value={'x': [1, 2]})
+        key = self.runner.key('stage', 1)
+        self.assertEqual(self.runner.run('stage', key, fn), {'x': [1, 2]})
+        self.assertEqual(self.runner.run('stage', key, fn), {'x': [1, 2]})
+        self.assertEqual(fn.call_count, 1)
+        self.runner.run('stage', self.runner.key('stage', 2), fn)
+        self.assertEqual(fn.call_count, 2)
+
+    def test_disabled_runner_always_runs(self):
+        runner = StageRunner(self.tmp.name, enabled=False)
+        fn = mock.Mock(return_value=1)
+        key = runner.key('stage')
+        runner.run('stage', key, fn)
+        runner.run('stage', key, fn)
+        self.assertEqual(fn.call_count, 2)
+        self.assertFalse(os.path.exists(runner.path('stage', key)))
+
+
+class TestRunFull(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        tmp = self.tmp.name
+        train, test = make_transactions()
+        customer, sku = make_metadata(train, test)
+        self.config = make_config(tmp)
+        self.config['paths'].update({
+            name: os.path.join(tmp, f"{name}.csv") for name in ('train_data', 'test_data', 'customer_data', 'sku_data')
+        })
+        for df, name in ((train, 'train_data'), (test, 'test_data'), (customer, 'customer_data'), (sku, 'sku_data')):
+            df.to_csv(self.config['paths'][name], index=False)
+        with open(CONFIG_PATH) as f:
+            self.config['schema'] = yaml.safe_load(f)['schema']
+        self.config['data_cache'] = {'enabled': False, 'dir': None}
+        self.config['checkpoints'] = {'enabled': True, 'dir': os.path.join(tmp, 'checkpoints')}
+        self.logger = logging.getLogger("PipelineRunner")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read_submission(self):
+        return pd.read_csv(self.config['paths']['submission_file'])
+
+    def test_scaling_change_only_reruns_post_processing(self):
+        main.run_full(self.config, self.logger)
+        first = self.read_submission()
+
+        self.config['scaling']['purchase_1w_scale'] = 1.5
+        with mock.patch.object(ModelTrainer, 'train_hybrid_ensemble') as train, \
+                mock.patch.object(ModelPredictor, 'predict_means') as predict, \
+                mock.patch('main.DataLoader') as loader, \
+                mock.patch('main.save_serving_state') as save, \
+                mock.patch.object(StageRunner, 'run', autospec=True, side_effect=StageRunner.run) as run:
+            main.run_full(self.config, self.logger)
+        train.assert_not_called()
+        predict.assert_not_called()
+        loader.assert_not_called()
+        # Only the predictions checkpoint is read; the serving state is already current
+        save.assert_not_called()
+        self.assertEqual([call.args[1] for call in run.call_args_list], ['predict'])
+
+        rescaled = self.read_submission()
+        pd.testing.assert_series_equal(rescaled["Target_purchase_next_2w"], first["Target_purchase_next_2w"])
+        self.assertFalse(rescaled["Target_purchase_next_1w"].equals(first["Target_purchase_next_1w"]))
+
+    def test_checkpointed_run_matches_uncheckpointed(self):
+        main.run_full(self.config, self.logger)
+        main.run_full(self.config, self.logger)
+        checkpointed = self.read_submission()
+        self.config['checkpoints']['enabled'] = False
+        main.run_full(self.config, self.logger)
+        pd.testing.assert_frame_equal(self.read_submission(), checkpointed)
+
+    def test_model_change_reuses_features(self):
+        main.run_full(self.config, self.logger)
+        self.config['model']['n_estimators'] = 5
+        with mock.patch('main.DataLoader') as loader:
+            main.run_full(self.config, self.logger)
+        loader.assert_not_called()
+        self.assertEqual(len(os.listdir(os.path.join(self.config['checkpoints']['dir'], 'train'))), 2)
+
+    def test_checkpoint_hit_rewrites_serving_state(self):
+        main.run_full(self.config, self.logger)
+        paths = self.config['paths']
+        written = {}
+        for name in ('feature_store', 'feature_index', 'candidate_index'):
+            with open(paths[name], 'rb') as f:
+                written[name] = f.read()
+            # As if an incremental run had replaced them since
+            os.remove(paths[name])
+        with mock.patch('main.DataLoader') as loader:
+            main.run_full(self.config, self.logger)
+        loader.assert_not_called()
+        for name, content in written.items():
+            with open(paths[name], 'rb') as f:
+                self.assertEqual(f.read(), content)
+
+    def test_checkpoint_hit_republishes_everything_saved_with_the_models(self):
+        self.config['validation']['holdout_weeks'] = 1
+        main.run_full(self.config, self.logger)
+        registry = ModelRegistry.for_config(self.config)
+        published, holdout = registry.manifest(), registry.holdout_predictions()
+        # As if another run had published its models since
+        shutil.rmtree(self.config['paths']['model_dir'])
+        with mock.patch.object(ModelTrainer, 'train_hybrid_ensemble') as train:
+            main.run_full(self.config, self.logger)
+        train.assert_not_called()
+        manifest = registry.manifest()
+        for key in ('run_key', 'rounds', 'validation', 'lineage', 'feature_profile'):
+            self.assertEqual(manifest[key], published[key])
+        self.assertIsNotNone(manifest['validation'])
+        for group in ('means', 'labels'):
+            for name, values in holdout[group].items():
+                np.testing.assert_array_equal(registry.holdout_predictions()[group][name], values)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import tempfile
+import unittest
+import pandas as pd
+import numpy as np
+from src.features.engineer import FeatureEngineer, FEATURE_COLS
+from src.features.store import FeatureStore, KEY_COLS
+from tests.test_engineer import make_transactions
+
+
+class TestFeatureStore(unittest.TestCase):
+    def setUp(self):
+        self.train, self.test = make_transactions(n_weeks=12, n_test_weeks=1)
+        _, self.full_test, _ = FeatureEngineer(engine="vectorized").engineer_features(self.train, self.test)
+        self.weeks = np.sort(self.train["week_start"].unique())
+
+    def assert_matches_full(self, features):
+        expected = self.full_test[KEY_COLS + FEATURE_COLS]
+        pd.testing.assert_frame_equal(features, expected, check_dtype=False, rtol=1e-9)
+
+    def test_fit_then_transform_matches_full_recompute(self):
+        store = FeatureStore().fit(self.train)
+        self.assert_matches_full(store.transform(self.test))
+
+    def test_weekly_appends_match_full_recompute(self):
+        history = self.train[self.train["week_start"] < self.weeks[6]]
+        store = FeatureStore().fit(history)
+        for week in self.weeks[6:]:
+            store.append(self.train[self.train["week_start"] == week])
+        self.assert_matches_full(store.transform(self.test))
+
+    def test_appended_rows_match_full_recompute(self):
+        """Features returned by append() equal the full recompute for those rows."""
+        last = self.train["week_start"] == self.weeks[-1]
+        store = FeatureStore().fit(self.train[~last])
+        appended = store.append(self.train[last])
+
+        # Recompute over the same weeks only: customer and product features of
+        # a pair's first row can reach into later weeks of other pairs.
+        full_train, _, _ = FeatureEngineer(engine="vectorized").engineer_features(self.train, self.test.iloc[:0])
+        expected = full_train.loc[last.to_numpy(), KEY_COLS + FEATURE_COLS]
+        pd.testing.assert_frame_equal(appended, expected, check_dtype=False, rtol=1e-9)
+
+    def test_multi_week_append_matches_full_recompute(self):
+        history = self.train[self.train["week_start"] < self.weeks[8]]
+        store = FeatureStore().fit(history)
+        store.append(self.train[self.train["week_start"] >= self.weeks[8]])
+        self.assert_matches_full(store.transform(self.test))
+
+    def test_rejects_stale_weeks(self):
+        store = FeatureStore().fit(self.train)
+        with self.assertRaises(ValueError):
+            store.append(self.train[self.train["week_start"] == self.weeks[-1]])
+
+    def test_save_and_load_roundtrip(self):
+        store = FeatureStore().fit(self.train)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "feature_store.pkl")
+            store.save(path)
+            self.assert_matches_full(FeatureStore.load(path).transform(self.test))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,223 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from src.models.drift import feature_profile, population_stability
+from src.models.registry import ModelRegistry, n_rounds
+from src.models.trainer import ModelTrainer, MODEL_NAMES, holdout_split
+from src.models.predictor import _booster
+from tests.test_predictor import make_config, build_pipeline
+
+
+class TestModelTrainer(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.config = make_config(cls.tmp.name)
+        cls.pipe = build_pipeline(cls.config)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def test_core_budget_split(self):
+        config = make_config(self.tmp.name)
+        config['training'].update(cores=8, n_jobs=4, threads_per_job=None)
+        trainer = ModelTrainer(config)
+        self.assertEqual((trainer.n_jobs, trainer.threads_per_job), (4, 2))
+        self.assertEqual(trainer.lgb_params['n_jobs'], 2)
+        self.assertEqual(trainer.cb_params['thread_count'], 2)
+
+    def test_oversubscription_rejected(self):
+        config = make_config(self.tmp.name)
+        config['training'].update(cores=4, n_jobs=4, threads_per_job=2)
+        with self.assertRaises(ValueError):
+            ModelTrainer(config)
+
+    def test_parallel_matches_sequential(self):
+        """Process-pool training yields the same models as the sequential path."""
+        config = make_config(self.tmp.name)
+        config['training'].update(cores=2, n_jobs=2, threads_per_job=1)
+        parallel = ModelTrainer(config).train_hybrid_ensemble(
+            self.pipe['train'], self.pipe['features'], self.pipe['cat_cols']
+        )
+        for name in MODEL_NAMES:
+            self.assertEqual(len(parallel[name]), len(self.config['model']['seeds']))
+        self.assert_same_models(parallel, self.pipe['models'])
+
+    def assert_same_models(self, a, b):
+        X = self.pipe['test'][self.pipe['features']]
+        for name in MODEL_NAMES:
+            for model_a, model_b in zip(a[name], b[name]):
+                if name.startswith('lgb'):
+                    np.testing.assert_array_equal(_booster(model_a).predict(X), _booster(model_b).predict(X))
+                else:
+                    np.testing.assert_array_equal(model_a.predict(X), model_b.predict(X))
+
+    def test_shared_datasets_match_per_fit_training(self):
+        """Reusing binned Datasets and quantized Pools leaves the models unchanged."""
+        config = make_config(self.tmp.name)
+        config['training']['reuse_datasets'] = False
+        per_fit = ModelTrainer(config).train_hybrid_ensemble(
+            self.pipe['train'], self.pipe['features'], self.pipe['cat_cols']
+        )
+        self.assertTrue(hasattr(per_fit['lgb_clf1'][0], 'predict_proba'))
+        self.assert_same_models(per_fit, self.pipe['models'])
+
+    def test_saved_binaries_feed_parallel_workers(self):
+        config = make_config(self.tmp.name)
+        config['training'].update(cores=2, n_jobs=2, threads_per_job=1,
+                                  dataset_dir=os.path.join(self.tmp.name, 'datasets'))
+        parallel = ModelTrainer(config).train_hybrid_ensemble(
+            self.pipe['train'], self.pipe['features'], self.pipe['cat_cols']
+        )
+        files = sorted(os.listdir(config['training']['dataset_dir']))
+        self.assertEqual(files, ['lgb_all.bin', 'lgb_pos_1w.bin', 'lgb_pos_2w.bin'])
+        self.assert_same_models(parallel, self.pipe['models'])
+
+    def test_holdout_skips_unlabelled_weeks(self):
+        weeks = pd.date_range("2024-01-01", periods=8, freq="7D")
+        start, unlabelled = holdout_split(np.repeat(weeks, 3), 2)
+        self.assertEqual((pd.Timestamp(start), pd.Timestamp(unlabelled)), (weeks[4], weeks[6]))
+        with self.assertRaises(ValueError):
+            holdout_split(weeks, 6)
+
+    def train_with_holdout(self, reuse_datasets, **validation):
+        config = make_config(os.path.join(self.tmp.name, f"holdout_{reuse_datasets}_{len(validation)}"))
+        config['training']['reuse_datasets'] = reuse_datasets
+        config['validation'].update(holdout_weeks=3, **validation)
+        trainer = ModelTrainer(config)
+        models = trainer.train_hybrid_ensemble(self.pipe['train'], self.pipe['features'], self.pipe['cat_cols'])
+        return trainer, models, ModelRegistry.for_config(config).manifest()
+
+    def test_early_stopping_records_rounds_and_holdout_scores(self):
+        for reuse_datasets in (True, False):
+            trainer, models, manifest = self.train_with_holdout(reuse_datasets, early_stopping_rounds=2, refit=False)
+            report = trainer.validation_report
+            self.assertEqual(manifest['validation'], report)
+            for name in MODEL_NAMES:
+                rounds = [n_rounds(name, model) for model in models[name]]
+                self.assertEqual(manifest['rounds'][name], rounds)
+                self.assertTrue(all(1 <= r <= 10 for r in rounds))
+                self.assertIn('auc' if '_clf' in name else 'mae', report['models'][name])
+            self.assertIsNone(report['refit_seconds'])
+
+    def test_holdout_predictions_saved_with_the_ensemble(self):
+        trainer, _, manifest = self.train_with_holdout(True, early_stopping_rounds=2, refit=True)
+        self.assertEqual(manifest['holdout'], 'holdout.npz')
+        saved = ModelRegistry.for_config(make_config(os.path.join(self.tmp.name, "holdout_True_2"))).holdout_predictions()
+        n_rows = len(trainer.holdout_predictions['labels']['buy_1w'])
+        self.assertGreater(n_rows, 0)
+        for group in ('means', 'labels'):
+            self.assertEqual(saved[group].keys(), trainer.holdout_predictions[group].keys())
+            for name, values in saved[group].items():
+                self.assertEqual(len(values), n_rows)
+                np.testing.assert_array_equal(values, trainer.holdout_predictions[group][name])
+
+    def test_refit_keeps_stopped_round_counts(self):
+        trainer, models, manifest = self.train_with_holdout(True, early_stopping_rounds=2, refit=True)
+        for name in MODEL_NAMES:
+            self.assertEqual(manifest['rounds'][name], [n_rounds(name, model) for model in models[name]])
+            self.assertAlmostEqual(np.mean(manifest['rounds'][name]), trainer.validation_report['models'][name]['rounds'])
+        self.assertIsNotNone(trainer.validation_report['refit_seconds'])
+
+    def test_score_only_holdout_keeps_every_round(self):
+        _, models, manifest = self.train_with_holdout(True, early_stopping_rounds=None, refit=False)
+        self.assertEqual(manifest['rounds']['lgb_clf1'], [10, 10])
+        self.assertEqual(manifest['rounds']['cb_clf1'], [10, 10])
+
+
+class TestIncrementalRetraining(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.pipe = build_pipeline(make_config(cls.tmp.name))
+        train = cls.pipe['train']
+        weeks = np.sort(train["week_start"].unique())
+        cls.earlier = train[train["week_start"] <= weeks[-3]]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def setUp(self):
+        self.config = make_config(os.path.join(self.tmp.name, self.id().rsplit('.', 1)[-1]))
+        self.config['retraining'].update(mode='incremental', max_drift=1e9)
+        self.registry = ModelRegistry.for_config(self.config)
+
+    def train(self, train, features=None):
+        trainer = ModelTrainer(self.config)
+        features = self.pipe['features'] if features is None else features
+        models = trainer.train_hybrid_ensemble(train, features, self.pipe['cat_cols'])
+        return trainer, models
+
+    def test_update_continues_every_model_and_extends_lineage(self):
+        first, _ = self.train(self.earlier)
+        self.assertEqual(first.lineage['history'][0]['reason'], "no published ensemble")
+        version = self.registry.model_version()
+
+        trainer, models = self.train(self.pipe['train'])
+        lineage = self.registry.manifest()['lineage']
+        self.assertEqual(lineage, trainer.lineage)
+        self.assertEqual(lineage['updates'], 1)
+        self.assertEqual(lineage['parent_version'], version)
+        self.assertEqual([entry['mode'] for entry in lineage['history']], ['full', 'incremental'])
+        self.assertEqual(lineage['trained_through'], str(pd.Timestamp(self.pipe['train']["week_start"].max()).date()))
+        # The refreshed rows start LABEL_HORIZON weeks before the new ones
+        self.assertLess(lineage['history'][1]['from'], first.lineage['trained_through'])
+        # Too few new purchases to split on keep the 2-week LightGBM regressor as it was
+        self.assertEqual(lineage['history'][1]['kept'], ['lgb_reg2'])
+        for name in MODEL_NAMES:
+            rounds = [n_rounds(name, model) for model in models[name]]
+            self.assertEqual(lineage['history'][1]['rounds_added'][name], [r - 10 for r in rounds])
+            if not name.startswith('lgb_reg'):
+                self.assertEqual(rounds, [15, 15])
+
+    def test_update_after_an_unrefitted_holdout_fits_the_held_out_weeks(self):
+        self.config['validation'].update(holdout_weeks=1, early_stopping_rounds=None, refit=False)
+        train = self.pipe['train']
+        start, _ = holdout_split(train["week_start"], 1)
+        first, _ = self.train(train)
+        fitted_through = pd.Timestamp(train.loc[train["week_start"] < start, "week_start"].max())
+        self.assertEqual(first.lineage['trained_through'], str(fitted_through.date()))
+
+        trainer, _ = self.train(train)
+        update = trainer.lineage['history'][-1]
+        self.assertEqual((trainer.lineage['updates'], update['mode']), (1, 'incremental'))
+        self.assertLessEqual(pd.Timestamp(update['from']), pd.Timestamp(start))
+        self.assertEqual(trainer.lineage['trained_through'], str(pd.Timestamp(train["week_start"].max()).date()))
+
+    def test_no_new_weeks_keeps_the_published_ensemble(self):
+        self.train(self.pipe['train'])
+        version = self.registry.model_version()
+        trainer, models = self.train(self.pipe['train'])
+        self.assertEqual(self.registry.model_version(), version)
+        self.assertEqual(trainer.lineage['updates'], 0)
+        self.assertEqual([n_rounds('lgb_clf1', model) for model in models['lgb_clf1']], [10, 10])
+
+    def test_schema_change_drift_and_update_limit_force_a_full_retrain(self):
+        self.train(self.earlier)
+        trainer, _ = self.train(self.pipe['train'], features=self.pipe['features'][1:])
+        self.assertEqual(trainer.lineage['history'][-1]['reason'], "the feature columns changed")
+
+        self.train(self.earlier)
+        self.config['retraining']['max_drift'] = 0.0
+        trainer, _ = self.train(self.pipe['train'])
+        self.assertIn("drifted", trainer.lineage['history'][-1]['reason'])
+
+        self.config['retraining'].update(max_drift=1e9, max_updates=0)
+        self.train(self.earlier)
+        trainer, _ = self.train(self.pipe['train'])
+        self.assertEqual(trainer.lineage['updates'], 0)
+        self.assertIn("incremental updates", trainer.lineage['history'][-1]['reason'])
+
+    def test_stability_index_flags_shifted_features(self):
+        frame = pd.DataFrame({'x': np.random.default_rng(0).normal(size=5000)})
+        profile = feature_profile(frame, ['x'])
+        self.assertLess(population_stability(profile, frame)['x'], 1e-9)
+        self.assertGreater(population_stability(profile, frame + 1.0)['x'], 0.25)
+
+
+if __name__ == '__main__':
+    unittest.main()
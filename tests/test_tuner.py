@@ -0,0 +1,88 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import yaml
+from sklearn.metrics import mean_absolute_error, roc_auc_score
+from src.models.predictor import ModelPredictor
+from src.models.trainer import MODEL_NAMES
+from src.models.tuner import PostprocessTuner, apply_overlay, auc_by_scale, grid, mae_by_threshold, write_overlay
+from tests.test_predictor import make_config
+
+
+def make_holdout(n_rows=3000, seed=0):
+    """Holdout predictions shaped like ModelTrainer.holdout_predictions, with LightGBM the sharper family."""
+    rng = np.random.default_rng(seed)
+    labels, means = {}, {}
+    for horizon, rate in (('1w', 0.2), ('2w', 0.35)):
+        buy = (rng.random(n_rows) < rate).astype(np.float64)
+        labels[f'buy_{horizon}'] = buy
+        labels[f'qty_{horizon}'] = buy * rng.gamma(2.0, 2.0, n_rows)
+        head = 'clf1' if horizon == '1w' else 'clf2'
+        # Rounded so that many rows tie
+        means[f'lgb_{head}'] = np.round(np.clip(0.5 * buy + rng.normal(0.25, 0.2, n_rows), 0, 1), 2)
+        means[f'cb_{head}'] = np.round(np.clip(0.3 * buy + rng.normal(0.3, 0.25, n_rows), 0, 1), 2)
+        reg = 'reg1' if horizon == '1w' else 'reg2'
+        means[f'lgb_{reg}'] = rng.gamma(2.0, 2.0, n_rows)
+        means[f'cb_{reg}'] = rng.gamma(2.0, 2.0, n_rows)
+    return {'means': means, 'labels': labels}
+
+
+class TestPostprocessTuner(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.config = make_config(self.tmp.name)
+        self.holdout = make_holdout()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_grid_includes_both_ends(self):
+        np.testing.assert_allclose(grid([0.8, 1.6, 0.01])[[0, -1]], [0.8, 1.6])
+        self.assertEqual(len(grid([0.0, 0.1, 0.0005])), 201)
+
+    def test_auc_matches_sklearn_for_every_scale(self):
+        p = self.holdout['means']['lgb_clf1'] * 0.9
+        y = self.holdout['labels']['buy_1w']
+        scales = np.array([0.8, 1.0, 1.3, 1.7, 2.5, 10.0])
+        expected = [roc_auc_score(y, np.clip(p * s, 0, 1)) for s in scales]
+        np.testing.assert_allclose(auc_by_scale(p, y, scales), expected, rtol=1e-12)
+        self.assertTrue(np.isnan(auc_by_scale(p, np.zeros_like(y), scales)).all())
+
+    def test_mae_matches_postprocess_for_every_threshold(self):
+        p, q = self.holdout['means']['lgb_clf1'], self.holdout['means']['lgb_reg1']
+        y = self.holdout['labels']['qty_1w']
+        thresholds = np.array([0.0, 0.1, 0.25, 0.3, 0.9, 1.1])
+        expected = [mean_absolute_error(y, np.clip(np.where(p < t, 0, p * q), 0, None)) for t in thresholds]
+        np.testing.assert_allclose(mae_by_threshold(p, q, y, thresholds), expected, rtol=1e-12)
+
+    def test_search_scores_its_overlay_as_the_predictor_does(self):
+        result = PostprocessTuner(self.config).search(self.holdout)
+        self.assertGreaterEqual(result['objective'], result['current']['objective'])
+        self.assertGreater(result['overlay']['ensemble']['lgbm_weight'], result['overlay']['ensemble']['catboost_weight'])
+
+        predictor = ModelPredictor(apply_overlay(self.config, result['overlay']))
+        out = predictor.postprocess(*predictor.blend({name: self.holdout['means'][name] for name in MODEL_NAMES}))
+        labels = self.holdout['labels']
+        for horizon in ('1w', '2w'):
+            self.assertAlmostEqual(result['auc'][horizon],
+                                   roc_auc_score(labels[f'buy_{horizon}'], out[f"Target_purchase_next_{horizon}"]))
+            self.assertAlmostEqual(result['mae'][horizon],
+                                   mean_absolute_error(labels[f'qty_{horizon}'], out[f"Target_qty_next_{horizon}"]))
+
+    def test_overlay_replaces_only_its_keys(self):
+        path = self.config['tuning']['overlay']
+        overlay = {'ensemble': {'lgbm_weight': 0.75, 'catboost_weight': 0.25}, 'scaling': {'qty_1w_threshold': 0.03}}
+        write_overlay(overlay, path)
+        with open(path) as f:
+            merged = apply_overlay(self.config, yaml.safe_load(f))
+        self.assertEqual(merged['ensemble'], overlay['ensemble'])
+        self.assertEqual(merged['scaling']['qty_1w_threshold'], 0.03)
+        self.assertEqual(merged['scaling']['purchase_1w_scale'], self.config['scaling']['purchase_1w_scale'])
+        self.assertEqual(merged['model'], self.config['model'])
+        self.assertEqual(self.config['ensemble']['lgbm_weight'], 0.5)
+        self.assertTrue(os.path.exists(path))
+
+
+if __name__ == '__main__':
+    unittest.main()